@@ -0,0 +1,66 @@
+"""
+Runs the whole benchmark suite with small, fixed parameters and saves the outputs of every
+benchmark in a JSON report, so that runs can be compared over time. Every benchmark runs
+offline, against the local fixture server and the fake backends.
+
+Usage: python -m benchmarks [benchmark ...]   (default: all benchmarks)
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPORTS_DIR = os.path.join('output', 'reports')
+
+# Benchmarks, by stage, with the arguments of a quick run
+SUITE = [
+    ('bench_url_extractor', ['20', '0.1']),
+    ('bench_link_extraction', ['20', '1500']),
+    ('bench_article_extractor', ['10', '10', '0.1']),
+    ('bench_http_cache', ['10', '10', '0.1']),
+    ('bench_cleaners', ['10000', '100000']),
+    ('bench_chunked_cleaning', ['100000', '10000']),
+    ('bench_storage', []),
+    ('bench_llm_engine', ['10', '0.1']),
+    ('bench_backends', ['40', '0.1']),
+    ('bench_token_budget', ['10', '0.05']),
+    ('bench_self_consistency', ['10', '0.05']),
+    ('bench_output_parser', ['10', '0.3']),
+    ('bench_packing', []),
+    ('bench_batch', []),
+    ('bench_local_model', ['fake', '2', '1', '2']),
+    ('bench_pipeline', ['20', '0.1', '0.2']),
+]
+
+def run(benchmark, args):
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-m', f'benchmarks.{benchmark}'] + args,
+                             capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    
+    # Keep the summary lines, not the progress lines printed by the stages
+    lines = [line for line in process.stdout.splitlines() if line and not line.startswith(('http', '['))]
+    return {'args': args, 'elapsed': elapsed, 'returncode': process.returncode,
+            'output': lines, 'errors': process.stderr.splitlines()[-5:] if process.returncode else []}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or [benchmark for benchmark, _ in SUITE]
+    
+    results = {}
+    for benchmark, args in SUITE:
+        if benchmark not in selected:
+            continue
+        print(f"== {benchmark} {' '.join(args)}")
+        results[benchmark] = run(benchmark, args)
+        for line in results[benchmark]['output'][-10:]:
+            print(line)
+        if results[benchmark]['returncode']:
+            print('\n'.join(results[benchmark]['errors']))
+    
+    os.makedirs(REPORTS_DIR, exist_ok=True)
+    report_path = os.path.join(REPORTS_DIR, f"{datetime.now().strftime('%Y-%m-%dT%H%M%S')}_benchmarks.json")
+    with open(report_path, 'w') as report_file:
+        json.dump(results, report_file, indent=4)
+    print(f"Benchmark report: {report_path}")
@@ -0,0 +1,42 @@
+"""
+Measures the speedup of the staged download and parse pipeline of the article extractor
+against the sequential loop, using the local stand-in HTTP server.
+
+Usage: python -m benchmarks.bench_article_extractor [n_sites] [articles_per_site] [latency]
+"""
+import sys
+import time
+from src.NewsContentExtractor import NewsContentExtractor
+from src.ArticleIndex import ArticleIndex
+from benchmarks.fixture_server import FixtureServer
+
+def article_urls(homepages, articles_per_site):
+    return [(homepage, f'{homepage}2024/05/{i}/article-{i}')
+            for homepage in homepages for i in range(articles_per_site)]
+
+def bench_sequential(rows):
+    start = time.perf_counter()
+    texts = [NewsContentExtractor.extract_article_from_url(url) for _, url in rows]
+    return time.perf_counter() - start, texts
+
+def bench_staged(rows, download_workers):
+    # Use an empty in-memory index so that every run downloads all articles
+    extractor = NewsContentExtractor(download_workers=download_workers, index=ArticleIndex(':memory:'))
+    start = time.perf_counter()
+    texts = [text for _, _, text in extractor.extract_articles(rows)]
+    return time.perf_counter() - start, texts
+
+if __name__ == "__main__":
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    articles_per_site = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+    
+    with FixtureServer(n_sites=n_sites, latency=latency) as server:
+        rows = article_urls(server.homepages(), articles_per_site)
+        sequential, expected = bench_sequential(rows)
+        print(f"sequential: {sequential:.2f}s, {len(rows) / sequential:.1f} articles/s")
+        for download_workers in (4, 16):
+            elapsed, texts = bench_staged(rows, download_workers)
+            assert texts == expected, "the staged extraction parsed different texts"
+            print(f"staged ({download_workers} download threads): {elapsed:.2f}s, "
+                  f"{len(rows) / elapsed:.1f} articles/s, speedup x{sequential / elapsed:.1f}")
@@ -0,0 +1,49 @@
+"""
+Measures the evaluation throughput and call latency through the real OpenAI and Gemini model
+classes, against simulated providers with latency, server errors and a quota, instead of
+the paid APIs.
+
+Usage: python -m benchmarks.bench_backends [n_newspapers] [latency]
+"""
+import sys
+import time
+from src.LLMManager import LLMManager
+from src.Metrics import Metrics
+from src.ResponseCache import ResponseCache
+from benchmarks.bench_llm_engine import synthetic_articles
+from benchmarks.fake_backends import FakeService, FakeGPT, FakeGemini
+
+# Scenarios as (name, server error rate, provider quota in requests per second)
+SCENARIOS = [
+    ('clean', 0.0, None),
+    ('errors', 0.05, None),
+    ('quota', 0.0, 20),
+]
+
+def bench(df, model):
+    # Use an empty in-memory cache and fresh metrics so that every run starts cold
+    metrics = Metrics.shared()
+    metrics.reset()
+    manager = LLMManager(model, max_in_flight=16, cache=ResponseCache(':memory:'))
+    start = time.perf_counter()
+    evals = manager.engine.run(df)
+    return time.perf_counter() - start, evals, metrics.report()
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    
+    df = synthetic_articles(n_newspapers)
+    for backend in (FakeGPT, FakeGemini):
+        for scenario, error_rate, quota in SCENARIOS:
+            service = FakeService(latency=latency, error_rate=error_rate, quota=quota, window=1)
+            # One name per scenario, so that every scenario gets its own rate limiter
+            name = f'{backend.__name__.lower()}-{scenario}'
+            model = backend(service, name, requests_per_minute=6000)
+            
+            elapsed, evals, report = bench(df, model)
+            calls = report['histograms'][f'llm.{name}']
+            counters = report['counters']
+            print(f"{backend.__name__:10} {scenario:7} {elapsed:6.2f}s  {len(evals) / elapsed * 60:6.0f} articles/min  "
+                  f"p50 {calls['p50']:.3f}s  p90 {calls['p90']:.3f}s  "
+                  f"retries {counters.get(f'llm.{name}.retries', 0)}  failures {counters.get(f'llm.{name}.failures', 0)}")
@@ -0,0 +1,58 @@
+"""
+Runs the batch submission mode of the GPT and Gemini backends against a local mock
+batch server, checking that the batch results select the same articles and marks as
+synchronous evaluation, and reporting the number of jobs and requests needed. A fraction
+of the requests fail within the jobs as rate limited, and are queried again one by one.
+
+Usage: python -m benchmarks.bench_batch [n_newspapers] [failure_rate]   (default: 10 0.1)
+"""
+import sys
+import time
+from types import SimpleNamespace
+import openai
+import src.GeminiModel as GeminiModel
+from src.LLMManager import LLMManager
+from src.FakeModel import FakeModel
+from src.Metrics import Metrics
+from src.ResponseCache import ResponseCache
+from benchmarks.bench_llm_engine import synthetic_articles
+from benchmarks.fake_backends import FakeService, FakeGPT, FakeGemini
+from benchmarks.mock_batch_server import MockBatchServer
+
+class CountingManager(LLMManager):
+    def query_batch(self, articles):
+        self.rounds = getattr(self, 'rounds', 0) + 1
+        self.requests = getattr(self, 'requests', 0) + len(articles)
+        return super().query_batch(articles)
+
+def batch_models(malformed_rate):
+    # Batch jobs go to the mock server, the calls made one by one to simulated providers
+    service = FakeService(latency=0, malformed_rate=malformed_rate)
+    gemini = FakeGemini(service, 'gemini-1.5')
+    gemini.model = SimpleNamespace(model_name='models/gemini-1.5-flash-latest')
+    return [FakeGPT(service, 'gpt-4'), gemini]
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    failure_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    malformed_rate = 0.2
+    df = synthetic_articles(n_newspapers)
+    
+    expected = LLMManager(FakeModel(latency=0, malformed_rate=malformed_rate), cache=ResponseCache(':memory:')).engine.run(df)
+    
+    with MockBatchServer(polls_until_done=2, malformed_rate=malformed_rate, failure_rate=failure_rate) as server:
+        openai.base_url = server.openai_url
+        GeminiModel.API_URL = server.gemini_url
+        
+        for model in batch_models(malformed_rate):
+            Metrics.shared().reset()
+            manager = CountingManager(model, cache=ResponseCache(':memory:'), batch=True, batch_poll_interval=0.01)
+            start = time.perf_counter()
+            evals = manager.engine.run_rounds(df, manager.query_batch)
+            elapsed = time.perf_counter() - start
+            
+            assert [row[:2] + row[3:] for row in evals] == [row[:2] + row[3:] for row in expected], \
+                f"{model.name()}: batch results differ from synchronous evaluation"
+            requeried = Metrics.shared().report()['counters'].get(f'llm.{model.name()}.batch_requeried', 0)
+            print(f"{model.name()}: {len(evals)} articles scored with {manager.rounds} batch jobs, "
+                  f"{manager.requests} requests, {requeried} failed requests queried again, {elapsed:.2f}s")
@@ -0,0 +1,43 @@
+"""
+Compares the peak memory of cleaning a large articles file in memory and in chunks, to a CSV
+file and to a Parquet file.
+
+Usage: python -m benchmarks.bench_chunked_cleaning [n_rows] [chunksize]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from src.ArticlesCleaner import ArticlesCleaner
+from src.FileManager import FileManager
+from benchmarks.bench_cleaners import synthetic_articles
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    function(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def clean_in_memory(filepath, output_filepath):
+    FileManager.write_file(output_filepath, ArticlesCleaner.filter_articles(FileManager.read_file(filepath)))
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    chunksize = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        filepath = os.path.join(tmp, 'articles.csv')
+        synthetic_articles(n_rows).to_csv(filepath, index=False)
+        print(f"input: {os.path.getsize(filepath) / 2 ** 20:.0f} MB")
+        
+        elapsed, peak = measure(clean_in_memory, filepath, os.path.join(tmp, 'full.csv'))
+        print(f"in memory: {elapsed:.2f}s, peak {peak / 2 ** 20:.0f} MB")
+        
+        for extension in ('csv', 'parquet'):
+            elapsed, peak = measure(ArticlesCleaner.clean_file_chunked, filepath,
+                                    os.path.join(tmp, f'chunked.{extension}'), 1000, 5000, chunksize)
+            print(f"chunks of {chunksize} to {extension}: {elapsed:.2f}s, peak {peak / 2 ** 20:.0f} MB")
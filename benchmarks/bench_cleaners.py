@@ -0,0 +1,102 @@
+"""
+Checks the vectorized UrlsCleaner and ArticlesCleaner filters against the original
+per-group implementations on synthetic tables, and reports the speedup.
+
+Usage: python -m benchmarks.bench_cleaners [n_rows ...]   (default: 10000 100000 1000000)
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from src.UrlsCleaner import UrlsCleaner
+from src.ArticlesCleaner import ArticlesCleaner
+
+def synthetic_urls(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_newspapers = max(1, n_rows // 100)
+    newspapers = rng.integers(0, n_newspapers, n_rows)
+    lengths = rng.integers(20, 200, n_rows)
+    urls = [f'https://newspaper{p}.example/{"a" * l}/{i}' for i, (p, l) in enumerate(zip(newspapers, lengths))]
+    return pd.DataFrame({'newspaper': [f'https://newspaper{p}.example' for p in newspapers], 'articles': urls})
+
+def synthetic_articles(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    n_newspapers = max(1, n_rows // 8)
+    newspapers = rng.integers(0, n_newspapers, n_rows)
+    lengths = rng.integers(0, 7000, n_rows)
+    # Share one buffer between the contents so that large tables fit in memory
+    text = 'x' * 7000
+    contents = pd.Series([text[:l] for l in lengths], dtype=object)
+    contents[rng.random(n_rows) < 0.02] = np.nan
+    return pd.DataFrame({'newspaper': [f'n{p}' for p in newspapers],
+                         'article_url': [f'u{i}' for i in range(n_rows)],
+                         'article_content': contents})
+
+def legacy_top20(df):
+    # Original UrlsCleaner implementation
+    df_count = df.groupby('newspaper').count().sort_values(by='articles').reset_index()
+    eliminate_names = df_count[df_count['articles'] < 30]['newspaper'].tolist()
+    df = df[~df['newspaper'].isin(eliminate_names)].copy()
+    df['length'] = df['articles'].apply(len)
+    top = df.groupby('newspaper', group_keys=False)[['newspaper', 'articles', 'length']].apply(
+        lambda group: group.sort_values('length', ascending=False).head(20))
+    top.reset_index(drop=True, inplace=True)
+    return top.drop('length', axis=1)
+
+def vectorized_top20(df):
+    cleaner = UrlsCleaner()
+    df = df[df.groupby('newspaper')['articles'].transform('count') >= 30]
+    top = cleaner.top_articles(df.assign(length=df['articles'].str.len()))
+    return top.reset_index(drop=True).drop('length', axis=1)
+
+def legacy_clean(df, min_length=1000, max_length=5000):
+    # Original ArticlesCleaner implementation
+    df = df[df['article_content'].apply(lambda x: isinstance(x, str))].copy()
+    df['content_length'] = df['article_content'].apply(len)
+    filtered_df = df[(df['content_length'] >= min_length) & (df['content_length'] <= max_length)]
+    result_df = filtered_df.groupby('newspaper').filter(lambda x: len(x) >= 5)
+    return result_df[['newspaper', 'article_url', 'article_content']]
+
+def missing_contents():
+    # A day where every download failed: read back as a float column of NaN
+    empty = pd.DataFrame({'newspaper': ['n0', 'n1'], 'article_url': ['u0', 'u1'], 'article_content': [np.nan, np.nan]})
+    # Contents mixing text, missing values and numbers
+    mixed = synthetic_articles(1000, seed=1)
+    mixed['article_content'] = mixed['article_content'].astype(object)
+    mixed.loc[mixed.index[::50], 'article_content'] = 1234
+    return [empty, mixed]
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def canonical(df):
+    # Ties in length may be ordered differently by the original unstable per-group sort
+    keyed = df.assign(length=df['articles'].str.len())
+    return keyed.sort_values(['newspaper', 'length', 'articles'], ascending=[True, False, True]).reset_index(drop=True)
+
+if __name__ == "__main__":
+    sizes = [int(size) for size in sys.argv[1:]] or [10000, 100000, 1000000]
+    
+    for articles in missing_contents():
+        assert legacy_clean(articles).equals(ArticlesCleaner.filter_articles(articles)), \
+            "ArticlesCleaner output differs on missing contents"
+    print("ArticlesCleaner: same output on missing and non-string contents")
+    
+    for n_rows in sizes:
+        urls = synthetic_urls(n_rows)
+        legacy_time, expected = timed(legacy_top20, urls)
+        new_time, result = timed(vectorized_top20, urls)
+        expected, result = canonical(expected), canonical(result)
+        assert expected[['newspaper', 'length']].equals(result[['newspaper', 'length']]), "UrlsCleaner output differs"
+        ties = (expected['articles'] != result['articles']).sum()
+        print(f"UrlsCleaner     {n_rows:>9} rows: legacy {legacy_time:.3f}s, vectorized {new_time:.3f}s, "
+              f"speedup x{legacy_time / new_time:.1f} ({ties} URLs differ only by tie order)")
+        
+        articles = synthetic_articles(n_rows)
+        legacy_time, expected = timed(legacy_clean, articles)
+        new_time, result = timed(ArticlesCleaner.filter_articles, articles)
+        assert expected.equals(result), "ArticlesCleaner output differs"
+        print(f"ArticlesCleaner {n_rows:>9} rows: legacy {legacy_time:.3f}s, vectorized {new_time:.3f}s, "
+              f"speedup x{legacy_time / new_time:.1f}")
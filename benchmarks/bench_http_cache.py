@@ -0,0 +1,63 @@
+"""
+Measures the HTTP cache on a rerun of the crawl and article download stages against the
+local stand-in HTTP server: without cache, with a cold cache, with a warm cache sending
+conditional requests, and in replay mode without any request. Then checks that replay mode
+never downloads pages missing from the cache, and that the size cap holds during a run.
+
+Usage: python -m benchmarks.bench_http_cache [n_sites] [articles_per_site] [latency]
+"""
+import os
+import sys
+import tempfile
+import time
+from src.UrlExtractor import UrlExtractor
+from src.NewsContentExtractor import NewsContentExtractor
+from src.ArticleIndex import ArticleIndex
+from src.HttpCache import HttpCache
+from benchmarks.fixture_server import FixtureServer
+
+def rerun(server, articles_per_site, http_cache):
+    url_extractor = UrlExtractor(http_cache=http_cache)
+    # Refetch every article, as when rerunning the download stage after a parse bug
+    content_extractor = NewsContentExtractor(index=ArticleIndex(':memory:'), refetch=True, http_cache=http_cache)
+    requests, bytes_sent = server.requests, server.bytes_sent
+
+    start = time.perf_counter()
+    rows = []
+    for homepage in server.homepages():
+        rows += [(homepage, url) for url in url_extractor.fetch_article_urls(homepage)[:articles_per_site]]
+    texts = [text for _, _, text in content_extractor.extract_articles(rows)]
+    elapsed = time.perf_counter() - start
+
+    return elapsed, texts, server.requests - requests, server.bytes_sent - bytes_sent
+
+if __name__ == "__main__":
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    articles_per_site = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.1
+
+    with FixtureServer(n_sites=n_sites, latency=latency) as server, tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'http.sqlite')
+        runs = [('no cache', None), ('cold cache', HttpCache(path)), ('conditional', HttpCache(path)),
+                ('replay', HttpCache(path, replay=True))]
+
+        expected = None
+        for name, http_cache in runs:
+            elapsed, texts, requests, bytes_sent = rerun(server, articles_per_site, http_cache)
+            if expected is None:
+                expected = texts
+            assert texts == expected, f"the {name} run parsed different texts"
+            print(f"{name:<12} {elapsed:.2f}s, {requests} requests, {bytes_sent / 1024:.0f} KiB transferred")
+
+        # Articles beyond those cached fail in replay mode instead of being downloaded
+        _, texts, requests, _ = rerun(server, articles_per_site + 5, HttpCache(path, replay=True))
+        failed = sum(isinstance(text, Exception) for text in texts)
+        assert requests == 0, "replay mode sent requests"
+        print(f"{'replay more':<12} {failed} uncached articles failed, {requests} requests")
+
+        # Evict every 10 pages stored, with a cap of a quarter of the cached size
+        max_bytes = HttpCache(path).stats()['bytes'] // 4
+        capped = HttpCache(os.path.join(directory, 'capped.sqlite'), max_bytes=max_bytes, evict_interval=10)
+        rerun(server, articles_per_site, capped)
+        size = capped.stats()['bytes']
+        print(f"{'size cap':<12} {size / 1024:.0f} KiB cached for a cap of {max_bytes / 1024:.0f} KiB")
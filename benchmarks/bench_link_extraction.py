@@ -0,0 +1,104 @@
+"""
+Compares the streaming lxml link extraction of UrlExtractor with the original BeautifulSoup
+parsing on homepage fixtures saved to disk, and reports the time per page and the links kept.
+
+The fixtures mimic large newspaper homepages: inline scripts, navigation and social links,
+relative article links, duplicated links with tracking parameters, and many more than 200
+article links.
+
+Usage: python -m benchmarks.bench_link_extraction [n_pages] [links_per_page]   (default: 50 1500)
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from bs4 import BeautifulSoup
+from src.UrlExtractor import UrlExtractor, CHUNK_SIZE
+
+WORDS = ['government', 'election', 'economy', 'market', 'minister', 'reform', 'budget', 'court',
+         'climate', 'health', 'school', 'strike', 'trade', 'energy', 'housing', 'police']
+
+NAVIGATION = ['/', '/world', '/politics', '/business', '/sport', '/about', '/contact', '/login',
+              '/subscribe', '/privacy-policy', '/tag/economy', '/author/jane-doe', '/feed/rss.xml',
+              'https://facebook.com/newspaper', 'https://twitter.com/newspaper', 'mailto:desk@newspaper.example',
+              'javascript:void(0)', '#top']
+
+def homepage_html(host, n_links, rng):
+    parts = ['<!DOCTYPE html><html><head><meta charset="utf-8"><title>Newspaper</title>',
+             '<script>' + 'var config = {"ads": true, "slots": [1, 2, 3]};' * 200 + '</script>',
+             '<style>' + '.teaser { margin: 0 auto; }' * 200 + '</style></head><body><nav><ul>']
+    parts += [f'<li><a href="{href}">menu</a></li>' for href in NAVIGATION]
+    parts.append('</ul></nav><main>')
+    for i in range(n_links):
+        slug = '-'.join(rng.choice(WORDS) for _ in range(rng.randint(3, 8)))
+        path = f'/2024/05/{i}/{slug}'
+        # Mix absolute, relative and tracked forms of the article links
+        href = rng.choice([f'https://{host}{path}', path, f'{path}?utm_source=home&utm_medium=teaser',
+                           f'https://{host}{path}#comments'])
+        parts.append(f'<article class="teaser"><a href="{href}"><img src="/img/{i}.jpg"></a>'
+                     f'<h2><a href="{href}">{slug.replace("-", " ")}</a></h2>'
+                     f'<p>{" ".join(rng.choice(WORDS) for _ in range(30))}</p></article>')
+    parts.append('</main><footer>' + ''.join(f'<a href="{href}">footer</a>' for href in NAVIGATION) + '</footer>')
+    parts.append('</body></html>')
+    return '\n'.join(parts).encode('utf-8')
+
+def save_fixtures(directory, n_pages, n_links, seed=0):
+    rng = random.Random(seed)
+    fixtures = []
+    for page in range(n_pages):
+        host = f'newspaper{page}.example'
+        filepath = os.path.join(directory, f'{host}.html')
+        with open(filepath, 'wb') as fixture_file:
+            fixture_file.write(homepage_html(host, n_links, rng))
+        fixtures.append((f'https://{host}/', filepath))
+    return fixtures
+
+def legacy_links(html):
+    # Original fetch_article_urls parsing
+    soup = BeautifulSoup(html, 'html.parser')
+    links = soup.find_all('a', href=True)
+    article_urls = []
+    for link in links:
+        url = link['href']
+        if url.startswith('http'):
+            if url not in article_urls:
+                article_urls.append(url)
+                if len(article_urls) == 200:
+                    break
+    return article_urls
+
+def streamed_links(html, base_url):
+    chunks = (html[i:i + CHUNK_SIZE] for i in range(0, len(html), CHUNK_SIZE))
+    return UrlExtractor.extract_links(chunks, base_url)
+
+def timed(function, fixtures):
+    results = []
+    start = time.perf_counter()
+    for base_url, filepath in fixtures:
+        with open(filepath, 'rb') as fixture_file:
+            html = fixture_file.read()
+        results.append(function(html, base_url))
+    return time.perf_counter() - start, results
+
+if __name__ == "__main__":
+    n_pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    n_links = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+
+    with tempfile.TemporaryDirectory() as directory:
+        fixtures = save_fixtures(directory, n_pages, n_links)
+        size = sum(os.path.getsize(filepath) for _, filepath in fixtures) / n_pages / 1024
+
+        legacy_time, legacy = timed(lambda html, base_url: legacy_links(html), fixtures)
+        new_time, streamed = timed(streamed_links, fixtures)
+
+    for urls in streamed:
+        assert len(urls) == len(set(urls)) <= 200, "Duplicated or too many links"
+        assert all(UrlExtractor.is_article_like(url) and '#' not in url and 'utm_' not in url for url in urls)
+
+    print(f"{n_pages} homepages of {size:.0f} KiB with {n_links} article links each")
+    print(f"legacy BeautifulSoup: {legacy_time / n_pages * 1000:.1f}ms per page, "
+          f"{sum(map(len, legacy)) / n_pages:.0f} links kept, "
+          f"{sum(1 for urls in legacy for url in urls if not UrlExtractor.is_article_like(url)) / n_pages:.1f} not article-like")
+    print(f"streaming lxml:       {new_time / n_pages * 1000:.1f}ms per page, "
+          f"{sum(map(len, streamed)) / n_pages:.0f} links kept, speedup x{legacy_time / new_time:.1f}")
@@ -0,0 +1,40 @@
+"""
+Measures the throughput of the concurrent evaluation engine against sequential
+evaluation, using the local fake model instead of the paid APIs.
+
+Usage: python -m benchmarks.bench_llm_engine [n_newspapers] [latency]
+"""
+import sys
+import time
+import pandas as pd
+from src.LLMManager import LLMManager
+from src.FakeModel import FakeModel
+from src.ResponseCache import ResponseCache
+
+def synthetic_articles(n_newspapers, articles_per_newspaper=20):
+    rows = [[f'https://newspaper{i}.example', f'https://newspaper{i}.example/article-{j}',
+             f'Article {j} of newspaper {i}. ' * 100]
+            for i in range(n_newspapers) for j in range(articles_per_newspaper)]
+    return pd.DataFrame(rows, columns=['newspaper', 'article_url', 'article_content'])
+
+def bench(df, model, max_in_flight):
+    # Use an empty in-memory cache so that every run queries the model
+    manager = LLMManager(model, max_in_flight=max_in_flight, cache=ResponseCache(':memory:'))
+    start = time.perf_counter()
+    evals = manager.engine.run(df)
+    return time.perf_counter() - start, evals
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    
+    df = synthetic_articles(n_newspapers)
+    model = FakeModel(latency=latency, malformed_rate=0.2, requests_per_minute=60000)
+    
+    sequential, expected = bench(df, model, 1)
+    print(f"sequential: {sequential:.2f}s, {len(expected) / sequential * 60:.0f} articles/min")
+    for max_in_flight in (8, 32):
+        elapsed, evals = bench(df, model, max_in_flight)
+        assert evals == expected, "concurrent evaluation selected different articles"
+        print(f"{max_in_flight} in flight: {elapsed:.2f}s, {len(evals) / elapsed * 60:.0f} articles/min, "
+              f"speedup x{sequential / elapsed:.1f}")
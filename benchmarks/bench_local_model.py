@@ -0,0 +1,80 @@
+"""
+Measures the scoring throughput of the local llama.cpp model on CPU, for several thread
+counts, article by article and as batch jobs. A real run needs llama-cpp-python and a GGUF
+model file. Given 'fake' instead of a model file, it runs offline against a stand-in for
+llama.cpp, one article overflowing the context window, to exercise the local code paths.
+
+Usage: python -m benchmarks.bench_local_model [model.gguf|fake] [n_newspapers] [threads ...]   (default: fake 2 1 2 4)
+"""
+import importlib.util
+import os
+import sys
+import threading
+import time
+from src.FakeModel import FakeModel
+from src.LocalModel import LocalModel
+from src.LLMManager import LLMManager
+from src.ResponseCache import ResponseCache
+from benchmarks.bench_llm_engine import synthetic_articles
+
+class FakeLlama:
+    """
+    A stand-in for llama.cpp, answering chat completions with the marks of the fake model and
+    failing as llama.cpp does on prompts exceeding the context window.
+    """
+
+    def __init__(self, n_ctx):
+        self.n_ctx = n_ctx
+
+    def create_chat_completion(self, messages, max_tokens, temperature):
+        prompt = ''.join(message['content'] for message in messages)
+        prompt_tokens = len(prompt) // 4
+        if prompt_tokens > self.n_ctx:
+            raise ValueError(f"Requested tokens ({prompt_tokens}) exceed context window of {self.n_ctx}")
+        marks = FakeModel.marks_for(messages[-1]['content'])
+        return {'choices': [{'message': {'content': f'[{marks[0]}, {marks[1]}]'}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': 6}}
+
+def fake_model(n_threads):
+    # Register the stand-in as the loaded model, so that no model file is read
+    model = LocalModel('fake.gguf', n_threads=n_threads)
+    LocalModel._models[(model.model_path, model.n_threads, model.n_ctx)] = (FakeLlama(model.n_ctx), threading.Lock())
+    return model
+
+def bench(df, model, batch):
+    # Use an empty in-memory cache so that every run queries the model
+    manager = LLMManager(model, cache=ResponseCache(':memory:'), batch=batch, batch_poll_interval=0)
+    start = time.perf_counter()
+    if batch:
+        evals = manager.engine.run_rounds(df, manager.query_batch)
+    else:
+        evals = manager.engine.run(df)
+    return time.perf_counter() - start, evals
+
+if __name__ == "__main__":
+    model_path = sys.argv[1] if len(sys.argv) > 1 else 'fake'
+    fake = model_path == 'fake'
+    if not fake and not os.path.exists(model_path):
+        sys.exit("Usage: python -m benchmarks.bench_local_model [model.gguf|fake] [n_newspapers] [threads ...]")
+    if not fake and importlib.util.find_spec('llama_cpp') is None:
+        sys.exit("The local model requires the llama-cpp-python package")
+
+    n_newspapers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    thread_counts = [int(threads) for threads in sys.argv[3:]] or [1, 2, 4]
+
+    df = synthetic_articles(n_newspapers)
+    if fake:
+        # One article too long for the context window, failing alone in per-article and batch runs
+        df.loc[0, 'article_content'] *= 20
+    for n_threads in thread_counts:
+        model = fake_model(n_threads) if fake else LocalModel(model_path, n_threads=n_threads)
+        start = time.perf_counter()
+        model.load()
+        print(f"{n_threads} threads: model loaded in {time.perf_counter() - start:.2f}s")
+        for batch in (False, True):
+            elapsed, evals = bench(df, model, batch)
+            mode = 'batch jobs' if batch else 'per article'
+            print(f"{n_threads} threads, {mode:11}: {elapsed:6.2f}s, {len(evals) / elapsed * 60:6.1f} articles/min, "
+                  f"{len(evals)} articles scored")
+            if fake:
+                assert all(row[1] != df.loc[0, 'article_url'] for row in evals), "the overflowing article was scored"
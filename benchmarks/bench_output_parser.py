@@ -0,0 +1,126 @@
+"""
+Measures how many model outputs yield marks, on a corpus of outputs written in the formats
+models drift to: the former strict extraction against the tolerant output parser, then end
+to end against a fake model answering part of the articles sloppily, with and without re-asks
+of the malformed answers.
+
+Usage: python -m benchmarks.bench_output_parser [n_newspapers] [sloppy_rate]   (default: 10 0.3)
+"""
+import re
+import sys
+import time
+from src.FakeModel import FakeModel
+from src.LLMManager import LLMManager, REASK_TASK
+from src.Metrics import Metrics
+from src.OutputParser import OutputParser
+from src.ResponseCache import ResponseCache
+from benchmarks.bench_llm_engine import synthetic_articles
+
+# Outputs as written by the models, with the marks expected from them (None when none are valid)
+CORPUS = [
+    ('[3, -2]', [3, -2]),
+    ('[3,-2]', [3, -2]),
+    ('[ 3 , -2 ]', [3, -2]),
+    ('[-7, 10]', [-7, 10]),
+    ('Result: [4, 6]', [4, 6]),
+    ('[4.0, -6.5]', [4, -6]),
+    ('[2.5, 0.5]', [3, 1]),
+    ('[−3, 2]', [-3, 2]),
+    ('(5, -1)', [5, -1]),
+    ('{"economic": 2, "democracy": -8}', [2, -8]),
+    ('```json\n{"economic": -4, "democracy": 3}\n```', [-4, 3]),
+    ('{"Economic Scale": 1, "Democracy Scale": 0}', [1, 0]),
+    ('Economic Scale: 6, Democracy Scale: -3', [6, -3]),
+    ('Economic: -2\nDemocracy: 5', [-2, 5]),
+    ('Economic: 5, Democracy: -3 (on a scale [-10, 10])', [5, -3]),
+    ('On the scale [-10, 10], I would say [4, -2]', [4, -2]),
+    ('I rate it (2, 3) at first, then revise it. Final: [6, -1]', [6, -1]),
+    ('[-10, 10]', [-10, 10]),
+    ('[15, -2]', None),
+    ('[mark for Economic Scale, mark for Democracy Scale]', None),
+    ('I am not able to evaluate this article.', None),
+    ('The author leans 3 on the economic axis and -2 on democracy.', None),
+]
+
+# Former extraction, kept to compare against
+LEGACY = re.compile(r'\[(-?\d+), (-?\d+)\]')
+
+def legacy_parse(text):
+    matches = LEGACY.findall(text)
+    return [int(matches[0][0]), int(matches[0][1])] if matches else None
+
+def tolerant_parse(text):
+    try:
+        return OutputParser.parse(text)
+    except ValueError:
+        return None
+
+def score_corpus(parse):
+    # Outputs giving the expected marks, and outputs giving wrong marks
+    correct = sum(parse(text) == expected for text, expected in CORPUS)
+    wrong = sum(parse(text) not in (None, expected) for text, expected in CORPUS)
+    return correct, wrong
+
+class SloppyModel(FakeModel):
+    """
+    A fake model answering a fraction of the articles in prose or other formats, and
+    answering re-asks in the expected format.
+    """
+
+    FORMATS = [
+        '[{0},{1}]',
+        'Economic Scale: {0}, Democracy Scale: {1}',
+        '{{"economic": {0}, "democracy": {1}}}',
+        'The author would be {0} on the economic scale and {1} on the democracy scale.',
+    ]
+
+    def __init__(self, sloppy_rate, **kwargs):
+        super().__init__(**kwargs)
+        self.sloppy_rate = sloppy_rate
+
+    def query_model(self, query, check_output=True):
+        if query.startswith(REASK_TASK):
+            marks = re.findall(r'-?\d+', query[len(REASK_TASK):])
+            return f'[{marks[0]}, {marks[1]}]'
+
+        output = super().query_model(query, check_output)
+        digest = FakeModel.marks_for(output + 'format')
+        if (digest[0] + 10) / 21 >= self.sloppy_rate or not output.startswith('['):
+            return output
+        marks = LEGACY.findall(output)[0]
+        return self.FORMATS[digest[1] % len(self.FORMATS)].format(*marks)
+
+def bench(df, sloppy_rate, reask):
+    metrics = Metrics.shared()
+    metrics.reset()
+    manager = LLMManager(SloppyModel(sloppy_rate, latency=0.001, malformed_rate=0.05), max_in_flight=16,
+                         cache=ResponseCache(':memory:'), reask=reask)
+    start = time.perf_counter()
+    evals = manager.engine.run(df)
+    elapsed = time.perf_counter() - start
+    report = metrics.report()
+    calls = report['histograms'].get('llm.fake', {}).get('count', 0)
+    queried = report['counters'].get('evaluation.articles', 0)
+    return elapsed, evals, queried, calls, manager.parser.stats()
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    sloppy_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.3
+
+    for name, parse in (('strict regex', legacy_parse), ('output parser', tolerant_parse)):
+        correct, wrong = score_corpus(parse)
+        start = time.perf_counter()
+        for _ in range(1000):
+            for text, _ in CORPUS:
+                parse(text)
+        per_output = (time.perf_counter() - start) / (1000 * len(CORPUS)) * 1e6
+        print(f"{name:13}: {correct}/{len(CORPUS)} outputs read correctly, {wrong} misread, "
+              f"{per_output:.1f}us per output")
+
+    df = synthetic_articles(n_newspapers)
+    df['article_content'] = [f'{content} {i}' for i, content in enumerate(df['article_content'])]
+    for reask in (False, True):
+        elapsed, evals, queried, calls, stats = bench(df, sloppy_rate, reask)
+        mode = 'with re-asks' if reask else 'no re-asks'
+        print(f"{mode:12}: {len(evals)} articles scored out of {queried} queried, {calls} calls, {elapsed:.2f}s, "
+              f"{stats['repaired']} repaired, {stats['failure_rate']:.1%} unparseable")
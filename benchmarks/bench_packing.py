@@ -0,0 +1,47 @@
+"""
+Compares single-article queries with multi-article packing on the local fake model:
+number of model calls, input tokens per scored article, wall-clock time, and whether
+both modes select the same articles and marks.
+
+Usage: python -m benchmarks.bench_packing [n_newspapers] [pack_size]
+"""
+import sys
+import threading
+import time
+from src.LLMManager import LLMManager
+from src.FakeModel import FakeModel
+from src.ResponseCache import ResponseCache
+from benchmarks.bench_llm_engine import synthetic_articles
+
+class CountingFakeModel(FakeModel):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = 0
+        self.input_tokens = 0
+        self.lock = threading.Lock()
+
+    def query_model(self, query, check_output=True):
+        with self.lock:
+            self.calls += 1
+            self.input_tokens += LLMManager.estimate_tokens(query)
+        return super().query_model(query, check_output)
+
+def bench(df, pack_size):
+    model = CountingFakeModel(latency=0.1, malformed_rate=0.1, requests_per_minute=60000)
+    manager = LLMManager(model, cache=ResponseCache(':memory:'), pack_size=pack_size)
+    start = time.perf_counter()
+    evals = manager.engine.run(df)
+    elapsed = time.perf_counter() - start
+    print(f"pack size {pack_size}: {model.calls} calls, "
+          f"{model.input_tokens / len(evals):.0f} input tokens per scored article, {elapsed:.2f}s")
+    return evals
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    pack_size = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    df = synthetic_articles(n_newspapers)
+    
+    single = bench(df, 1)
+    packed = bench(df, pack_size)
+    assert single == packed, "packed evaluation selected different articles or marks"
+    print("same articles and marks in both modes")
@@ -0,0 +1,70 @@
+"""
+Compares the time to the first score and the total latency of a day run as separate stages
+and as one streaming pipeline, against the local stand-in server and the fake model.
+
+Usage: python -m benchmarks.bench_pipeline [n_sites] [latency] [model_latency]
+"""
+import os
+import sys
+import tempfile
+import time
+from src.UrlExtractor import UrlExtractor
+from src.UrlsCleaner import UrlsCleaner
+from src.NewsContentExtractor import NewsContentExtractor
+from src.ArticlesCleaner import ArticlesCleaner
+from src.LLMManager import LLMManager
+from src.FakeModel import FakeModel
+from src.Pipeline import Pipeline
+from benchmarks.fixture_server import FixtureServer
+
+class TimedFakeModel(FakeModel):
+    """
+    The fake model, remembering when it answered its first query.
+    """
+
+    def __init__(self, start, latency):
+        super().__init__(latency=latency)
+        self.start = start
+        self.first_answer = None
+
+    def query_model(self, query, check_output=True):
+        output = super().query_model(query, check_output)
+        if self.first_answer is None:
+            self.first_answer = time.perf_counter() - self.start
+        return output
+
+def run_stages(homepages, model):
+    UrlExtractor().fetch_all_article_urls(homepages)
+    UrlsCleaner().top20_articles()
+    NewsContentExtractor().extract_all_articles()
+    ArticlesCleaner.clean(500, 5000)
+    LLMManager(model).query_models_on_articles()
+
+def run_pipeline(homepages, model):
+    Pipeline([LLMManager(model)], min_length=500, max_length=5000).run(homepages)
+
+def measure(run, homepages, model_latency):
+    # Run in a scratch directory so the outputs and caches start empty
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        try:
+            start = time.perf_counter()
+            model = TimedFakeModel(start, model_latency)
+            run(homepages, model)
+            return model.first_answer, time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+if __name__ == "__main__":
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    model_latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    
+    with FixtureServer(n_sites=n_sites, latency=latency) as server:
+        results = {}
+        for name, run in (('stages', run_stages), ('pipeline', run_pipeline)):
+            results[name] = measure(run, server.homepages(), model_latency)
+        
+        for name, (first_score, total) in results.items():
+            print(f"{name}: first score after {first_score:.2f}s, total {total:.2f}s")
@@ -0,0 +1,63 @@
+"""
+Measures self-consistency scoring against simulated providers whose sampled marks are noisy:
+the error of the median marks against the true marks, and the wall-clock time, for several
+numbers of samples per article. The OpenAI backend draws the samples of an article with one
+call (the n parameter), the Gemini backend with parallel calls. Raising the number of samples
+afterwards only draws the missing samples.
+
+Usage: python -m benchmarks.bench_self_consistency [n_newspapers] [latency] [noise]   (default: 10 0.05 3)
+"""
+import sys
+import time
+from src.FakeModel import FakeModel
+from src.LLMManager import LLMManager
+from src.Metrics import Metrics
+from src.ResponseCache import ResponseCache
+from benchmarks.bench_llm_engine import synthetic_articles
+from benchmarks.fake_backends import FakeService, FakeGPT, FakeGemini
+
+def mean_error(evals):
+    # Mean absolute distance of the aggregated marks to the marks without noise
+    errors = []
+    for _, _, content, economic, democracy, *_ in evals:
+        truth = FakeModel.marks_for(content)
+        errors.append((abs(economic - truth[0]) + abs(democracy - truth[1])) / 2)
+    return sum(errors) / len(errors)
+
+def bench(df, model, samples, cache):
+    metrics = Metrics.shared()
+    metrics.reset()
+    manager = LLMManager(model, max_in_flight=16, cache=cache, samples=samples)
+    start = time.perf_counter()
+    evals = manager.engine.run(df)
+    elapsed = time.perf_counter() - start
+    calls = metrics.report()['histograms'].get(f'llm.{model.name()}', {}).get('count', 0)
+    return elapsed, evals, calls
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    noise = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    # Distinct article texts, so that the true marks vary
+    df = synthetic_articles(n_newspapers)
+    df['article_content'] = [f'{content} {i}' for i, content in enumerate(df['article_content'])]
+
+    for backend in (FakeGPT, FakeGemini):
+        for samples in (1, 3, 5, 9):
+            name = f'{backend.__name__.lower()}-k{samples}'
+            model = backend(FakeService(latency=latency, noise=noise), name, requests_per_minute=60000)
+            elapsed, evals, calls = bench(df, model, samples, ResponseCache(':memory:'))
+            print(f"{backend.__name__:10} K={samples}: {elapsed:5.2f}s, {calls:4} calls, "
+                  f"mean error {mean_error(evals):.2f}")
+
+        # Raise the number of samples over a cache filled with fewer samples per article
+        for before, after in ((1, 2), (3, 5)):
+            name = f'{backend.__name__.lower()}-raise-{before}'
+            model = backend(FakeService(latency=latency, noise=noise), name, requests_per_minute=60000)
+            cache = ResponseCache(':memory:')
+            bench(df, model, before, cache)
+            elapsed, evals, calls = bench(df, model, after, cache)
+            assert all(row[-1] == after for row in evals), "some cached samples were lost"
+            print(f"{backend.__name__:10} K={before} then {after}: {elapsed:5.2f}s, {calls:4} calls for the "
+                  f"{after - before} extra samples, mean error {mean_error(evals):.2f}")
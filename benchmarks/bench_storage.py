@@ -0,0 +1,36 @@
+"""
+Compares CSV with the compressed columnar formats on the shipped evaluation data:
+size on disk, write time, full read time, and read time of the marks alone
+(without the article bodies).
+
+Usage: python -m benchmarks.bench_storage [evaluations_dir]
+"""
+import os
+import sys
+import tempfile
+import time
+from src.FileManager import FileManager, FORMATS
+
+MARKS_COLUMNS = ['newspaper', 'article_url', 'mark_socioeconomic', 'mark_democracy']
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+if __name__ == "__main__":
+    evaluations_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join('output', 'evaluations')
+    files = sorted(f for f in FileManager.list_files(evaluations_dir) if f.endswith('.csv'))
+    frames = {f: FileManager.read_file(os.path.join(evaluations_dir, f)) for f in files}
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage_format in FORMATS:
+            paths = [os.path.join(tmp, f"{os.path.splitext(f)[0]}.{storage_format}") for f in files]
+            
+            write_time = sum(timed(FileManager.write_file, path, frames[f])[0] for f, path in zip(files, paths))
+            size = sum(os.path.getsize(path) for path in paths)
+            read_time = sum(timed(FileManager.read_file, path)[0] for path in paths)
+            marks_time = sum(timed(FileManager.read_file, path, columns=MARKS_COLUMNS)[0] for path in paths)
+            
+            print(f"{storage_format:8} {size / 2 ** 20:6.2f} MB  write {write_time:.3f}s  "
+                  f"read {read_time:.3f}s  read marks only {marks_time:.3f}s")
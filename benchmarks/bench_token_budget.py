@@ -0,0 +1,74 @@
+"""
+Measures the effect of the article token budget on articles of widely varying length,
+through the real OpenAI model class against a simulated provider, under a client-side
+tokens-per-minute quota: query tokens, throughput and the token distribution report. Then checks that requests
+larger than the burst capacity of the rate limiter are charged in full.
+
+Usage: python -m benchmarks.bench_token_budget [n_newspapers] [latency] [budget ...]   (default: 20 0.05 none 1000 500)
+"""
+import random
+import sys
+import time
+import pandas as pd
+from src.LLMManager import LLMManager
+from src.Metrics import Metrics
+from src.RateLimiter import RateLimiter
+from src.ResponseCache import ResponseCache
+from benchmarks.fake_backends import FakeService, FakeGPT
+from benchmarks.fixture_server import WORDS
+
+def synthetic_articles(n_newspapers, articles_per_newspaper=10, seed=0):
+    # Articles of 2 to 40 paragraphs, one paragraph per line as extracted by newspaper
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_newspapers):
+        for j in range(articles_per_newspaper):
+            paragraphs = []
+            for _ in range(rng.randint(2, 40)):
+                sentences = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+                             for _ in range(rng.randint(2, 6))]
+                paragraphs.append(' '.join(sentences))
+            rows.append([f'https://newspaper{i}.example', f'https://newspaper{i}.example/article-{j}',
+                         f'Article {j} of newspaper {i}.\n' + '\n'.join(paragraphs)])
+    return pd.DataFrame(rows, columns=['newspaper', 'article_url', 'article_content'])
+
+def bench(df, budget, latency):
+    metrics = Metrics.shared()
+    metrics.reset()
+    # One model name per budget, so that every run gets its own rate limiter
+    name = f'fakegpt-budget-{budget}'
+    model = FakeGPT(FakeService(latency=latency), name, requests_per_minute=6000, tokens_per_minute=300000)
+    manager = LLMManager(model, max_in_flight=16, cache=ResponseCache(':memory:'), token_budget=budget)
+    report = manager.token_report(df['article_content'])
+
+    start = time.perf_counter()
+    evals = manager.engine.run(df)
+    elapsed = time.perf_counter() - start
+    counters = metrics.report()['counters']
+    return elapsed, evals, report, counters[f'llm.{name}.prompt_tokens'], counters[f'llm.{name}.estimated_tokens']
+
+def oversized_rate(tokens_per_minute, tokens, n_requests):
+    # Requests of 10 times the burst capacity, whose first one is free
+    limiter = RateLimiter(60000, tokens_per_minute, burst_seconds=0.1)
+    limiter.acquire(tokens)
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        limiter.acquire(tokens)
+    return n_requests * tokens / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    n_newspapers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    budgets = [None if budget == 'none' else int(budget) for budget in sys.argv[3:]] or [None, 1000, 500]
+
+    df = synthetic_articles(n_newspapers)
+    for budget in budgets:
+        elapsed, evals, report, billed, estimated = bench(df, budget, latency)
+        print(f"budget {str(budget):>5}: {elapsed:6.2f}s, {len(evals) / elapsed * 60:6.0f} articles/min, "
+              f"{billed} prompt tokens billed, {estimated} tokens estimated")
+
+    # The tokens let through must stay within the quota, however large the requests
+    quota = 600000 / 60
+    rate = oversized_rate(600000, 10000, 5)
+    print(f"oversized requests: {rate:.0f} tokens/s let through for a quota of {quota:.0f} tokens/s")
+    assert rate <= quota * 1.05, "requests larger than the bucket are under-charged"
@@ -0,0 +1,37 @@
+"""
+Measures the speedup of concurrent homepage crawling against the sequential loop,
+using a local stand-in HTTP server instead of real newspaper websites.
+
+Usage: python -m benchmarks.bench_url_extractor [n_sites] [latency]
+"""
+import sys
+import time
+from src.UrlExtractor import UrlExtractor
+from benchmarks.fixture_server import FixtureServer
+
+def bench_sequential(urls):
+    scraper = UrlExtractor()
+    start = time.perf_counter()
+    for url in urls:
+        scraper.fetch_article_urls(url)
+    return time.perf_counter() - start
+
+def bench_concurrent(urls, max_workers):
+    scraper = UrlExtractor()
+    # Avoid writing the benchmark results into the output directory
+    scraper.save_urls_to_json = lambda url, article_urls: None
+    start = time.perf_counter()
+    scraper.fetch_all_article_urls(urls, max_workers=max_workers)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+    
+    with FixtureServer(n_sites=n_sites, latency=latency) as server:
+        urls = server.homepages()
+        sequential = bench_sequential(urls)
+        print(f"sequential: {sequential:.2f}s")
+        for max_workers in (4, 16, 32):
+            concurrent = bench_concurrent(urls, max_workers)
+            print(f"concurrent ({max_workers} workers): {concurrent:.2f}s, speedup x{sequential / concurrent:.1f}")
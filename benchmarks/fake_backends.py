@@ -0,0 +1,156 @@
+"""
+Offline stand-ins for the OpenAI and Gemini backends. They replace only the SDK call of the
+real model classes, so the error handling, token accounting and output checks of the real
+classes are exercised, against a simulated provider with latency, errors and a quota.
+"""
+import random
+import re
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+import openai
+from google.api_core.exceptions import InternalServerError, ResourceExhausted
+from src.FakeModel import FakeModel
+from src.GPTModel import AbstractGPT
+from src.GeminiModel import AbstractGemini
+
+class FakeService:
+    """
+    A simulated provider answering like the fake model, after a fixed latency. A fraction of
+    the calls fail with a server error, and calls beyond the quota of the provider are rejected
+    as rate limited.
+    """
+
+    def __init__(self, latency=0.2, error_rate=0.0, quota=None, window=60, malformed_rate=0.0, noise=0, seed=0):
+        """
+        Initializes the provider.
+        
+        Parameters:
+        latency (float): Seconds spent on every accepted call.
+        error_rate (float): Fraction of accepted calls failing with a server error.
+        quota (int): Number of calls accepted by the provider per window. Unlimited by default.
+        window (float): Length in seconds of the sliding quota window, shortened to keep
+        benchmarks quick.
+        malformed_rate (float): Fraction of articles answered with unparseable text.
+        noise (int): Largest random deviation of a sampled mark from the article's true mark.
+        seed (int): Seed of the error injection, for reproducible runs.
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota = quota
+        self.window = window
+        self.noise = noise
+        self.answers = FakeModel(latency=0, malformed_rate=malformed_rate)
+        self.random = random.Random(seed)
+        self.calls = deque()
+        self.lock = threading.Lock()
+
+    def sample(self, text):
+        """
+        Adds the sampling noise to the marks of an answer.
+        
+        Parameters:
+        text (str): The answer, in the format [economic, democracy].
+        
+        Returns:
+        str: The answer with every mark moved by up to noise, within -10 to 10.
+        """
+        def jitter(match):
+            with self.lock:
+                delta = self.random.randint(-self.noise, self.noise)
+            return str(max(-10, min(10, int(match.group()) + delta)))
+        return re.sub(r'-?\d+', jitter, text) if self.noise else text
+
+    def answer(self, query, n=1):
+        """
+        Serves a call.
+        
+        Parameters:
+        query (str): The query of the call.
+        n (int): Number of answers sampled for the query.
+        
+        Returns:
+        tuple: The HTTP status of the call (200, 429 or 500) and the answer texts.
+        """
+        with self.lock:
+            now = time.monotonic()
+            while self.calls and self.calls[0] <= now - self.window:
+                self.calls.popleft()
+            if self.quota and len(self.calls) >= self.quota:
+                return 429, None
+            self.calls.append(now)
+            failed = self.random.random() < self.error_rate
+        
+        time.sleep(self.latency)
+        if failed:
+            return 500, None
+        text = self.answers.query_model(query, check_output=False)
+        return 200, [self.sample(text) for _ in range(n)]
+
+def status_error(error_class, status, message):
+    # Build an OpenAI status error without a real HTTP response
+    response = SimpleNamespace(request=None, status_code=status, headers={})
+    return error_class(message, response=response, body=None)
+
+class FakeGPT(AbstractGPT):
+    """
+    The OpenAI backend, answered by a simulated provider instead of the API.
+    """
+
+    def __init__(self, service=None, model='fake-gpt', requests_per_minute=None, tokens_per_minute=None):
+        """
+        Initializes the backend.
+        
+        Parameters:
+        service (FakeService): The simulated provider.
+        model (str): Name of the model, used in file names and metrics.
+        requests_per_minute (float): Requests-per-minute quota used by the rate limiter.
+        tokens_per_minute (float): Tokens-per-minute quota used by the rate limiter.
+        """
+        self.model = model
+        self.service = service or FakeService()
+        self.requests_per_minute = requests_per_minute or self.requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    def create_completion(self, messages, n=1):
+        query = messages[-1]['content']
+        status, texts = self.service.answer(query, n)
+        if status == 429:
+            raise status_error(openai.RateLimitError, 429, "Rate limit reached")
+        if status == 500:
+            raise status_error(openai.InternalServerError, 500, "The server had an error")
+        
+        usage = SimpleNamespace(prompt_tokens=len(query) // 4, completion_tokens=sum(len(text) // 4 for text in texts))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text)) for text in texts],
+                               usage=usage)
+
+class FakeGemini(AbstractGemini):
+    """
+    The Gemini backend, answered by a simulated provider instead of the API.
+    """
+
+    def __init__(self, service=None, model_name='fake-gemini', requests_per_minute=None, tokens_per_minute=None):
+        """
+        Initializes the backend.
+        
+        Parameters:
+        service (FakeService): The simulated provider.
+        model_name (str): Name of the model, used in file names and metrics.
+        requests_per_minute (float): Requests-per-minute quota used by the rate limiter.
+        tokens_per_minute (float): Tokens-per-minute quota used by the rate limiter.
+        """
+        self.model_name = model_name
+        self.service = service or FakeService()
+        self.requests_per_minute = requests_per_minute or self.requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    def generate_content(self, query):
+        status, texts = self.service.answer(query)
+        if status == 429:
+            raise ResourceExhausted("Quota exceeded")
+        if status == 500:
+            raise InternalServerError("Internal error encountered")
+        
+        usage = SimpleNamespace(prompt_token_count=len(query) // 4, candidates_token_count=len(texts[0]) // 4)
+        return SimpleNamespace(text=texts[0], usage_metadata=usage)
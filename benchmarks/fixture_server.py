@@ -0,0 +1,139 @@
+import hashlib
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Number of links placed on each synthetic homepage
+LINKS_PER_HOMEPAGE = 120
+
+# Words used to generate the synthetic article texts
+WORDS = ['government', 'market', 'reform', 'tax', 'vote', 'parliament', 'union', 'wages', 'police',
+         'freedom', 'court', 'budget', 'minister', 'protest', 'trade', 'the', 'of', 'and', 'a', 'to']
+
+class FixtureServer:
+    """
+    A local stand-in HTTP server serving synthetic newspaper homepages, and an article page
+    for any other path. Pages carry an ETag, and conditional requests for an unchanged page
+    are answered with 304 Not Modified.
+    
+    Every site is reachable on its own loopback address (127.0.0.1, 127.0.0.2, ...) so that
+    per-host limits behave as they would against real newspapers.
+    """
+
+    def __init__(self, n_sites=40, latency=0.2, seed=0):
+        """
+        Initializes the server.
+        
+        Parameters:
+        n_sites (int): Number of synthetic newspaper sites.
+        latency (float): Delay in seconds added before every response.
+        seed (int): Seed used to generate the synthetic pages.
+        """
+        self.n_sites = n_sites
+        self.latency = latency
+        self.seed = seed
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('', 0), self.handler_class())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def homepages(self):
+        """
+        Returns the homepage URLs of all synthetic sites.
+        
+        Returns:
+        list: The homepage URLs.
+        """
+        return [f'http://127.0.0.{i + 1}:{self.port}/' for i in range(self.n_sites)]
+
+    def homepage_html(self, host):
+        """
+        Generates the HTML of the homepage served for a given host.
+        
+        Parameters:
+        host (str): The value of the Host header.
+        
+        Returns:
+        str: The homepage HTML.
+        """
+        rng = random.Random(f'{self.seed}-{host}')
+        links = []
+        for i in range(LINKS_PER_HOMEPAGE):
+            slug = '-'.join(rng.choice(['economy', 'election', 'court', 'climate', 'trade', 'health'])
+                            for _ in range(rng.randint(2, 8)))
+            links.append(f'<li><a href="http://{host}/2024/05/{i}/{slug}">{slug}</a></li>')
+        return f'<html><head><title>{host}</title></head><body><ul>{"".join(links)}</ul></body></html>'
+
+    def article_html(self, host, path):
+        """
+        Generates the HTML of the article page served for a given host and path.
+        
+        Parameters:
+        host (str): The value of the Host header.
+        path (str): The requested path.
+        
+        Returns:
+        str: The article HTML, with a text of 500 to 6000 characters.
+        """
+        rng = random.Random(f'{self.seed}-{host}-{path}')
+        length = rng.randint(500, 6000)
+        paragraphs = []
+        size = 0
+        while size < length:
+            sentence = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + '.'
+            paragraph = ' '.join(sentence for _ in range(rng.randint(3, 6)))
+            paragraphs.append(f'<p>{paragraph}</p>')
+            size += len(paragraph)
+        title = path.rstrip('/').rsplit('/', 1)[-1].replace('-', ' ').capitalize()
+        return (f'<html><head><title>{title}</title></head><body><article><h1>{title}</h1>'
+                f'{"".join(paragraphs)}</article></body></html>')
+
+    def handler_class(self):
+        """
+        Builds the request handler bound to this server's configuration.
+        
+        Returns:
+        type: The request handler class.
+        """
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(fixture.latency)
+                host = self.headers.get('Host', 'localhost')
+                if self.path == '/':
+                    body = fixture.homepage_html(host).encode('utf-8')
+                else:
+                    body = fixture.article_html(host, self.path).encode('utf-8')
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                
+                if self.headers.get('If-None-Match') == etag:
+                    body = b''
+                    self.send_response(304)
+                else:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/html; charset=utf-8')
+                    self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+                with fixture.lock:
+                    fixture.requests += 1
+                    fixture.bytes_sent += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
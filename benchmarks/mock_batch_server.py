@@ -0,0 +1,210 @@
+import email.parser
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.FakeModel import FakeModel
+
+class MockBatchServer:
+    """
+    A local mock of the OpenAI and Gemini batch endpoints.
+    
+    Jobs complete after a configurable number of status checks, and every request is
+    answered like FakeModel would answer it, unless it fails as rate limited.
+    """
+
+    def __init__(self, polls_until_done=2, malformed_rate=0.0, failure_rate=0.0, seed=0):
+        """
+        Initializes the server.
+        
+        Parameters:
+        polls_until_done (int): Number of status checks a job stays running for.
+        malformed_rate (float): Fraction of articles answered with unparseable text.
+        failure_rate (float): Fraction of requests failing within a job as rate limited.
+        seed (int): Seed of the failure injection, for reproducible runs.
+        """
+        self.polls_until_done = polls_until_done
+        self.fake_model = FakeModel(latency=0, malformed_rate=malformed_rate)
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.failed = 0
+        self.files = {}
+        self.batches = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def openai_url(self):
+        return f'http://127.0.0.1:{self.port}/v1/'
+
+    @property
+    def gemini_url(self):
+        return f'http://127.0.0.1:{self.port}/v1beta'
+
+    def answer(self, prompt):
+        """
+        Answers a prompt like FakeModel.
+        
+        Parameters:
+        prompt (str): The prompt of a batch request.
+        
+        Returns:
+        str: The model output.
+        """
+        return self.fake_model.query_model(prompt)
+
+    def fails(self):
+        """
+        Decides whether a batch request fails as rate limited.
+        
+        Returns:
+        bool: True for the configured fraction of requests.
+        """
+        if self.random.random() < self.failure_rate:
+            self.failed += 1
+            return True
+        return False
+
+    def openai_file(self, file_id, content, purpose):
+        self.files[file_id] = content
+        return {'id': file_id, 'object': 'file', 'bytes': len(content), 'created_at': int(time.time()),
+                'filename': f'{file_id}.jsonl', 'purpose': purpose, 'status': 'processed'}
+
+    def openai_batch(self, batch):
+        status = 'completed' if batch['polls'] >= self.polls_until_done else 'in_progress'
+        return {'id': batch['id'], 'object': 'batch', 'endpoint': '/v1/chat/completions',
+                'input_file_id': batch['input_file_id'], 'completion_window': '24h',
+                'created_at': batch['created_at'], 'status': status,
+                'output_file_id': batch['output_file_id'] if status == 'completed' else None}
+
+    def create_openai_batch(self, body):
+        batch_id = f'batch_{next(self.ids)}'
+        output_id = f'file-{next(self.ids)}'
+        
+        lines = []
+        for line in self.files[body['input_file_id']].decode('utf-8').splitlines():
+            request = json.loads(line)
+            if self.fails():
+                lines.append(json.dumps({'id': f'req_{next(self.ids)}', 'custom_id': request['custom_id'],
+                                         'response': {'status_code': 429, 'body': {}},
+                                         'error': None}))
+                continue
+            output = self.answer(request['body']['messages'][-1]['content'])
+            lines.append(json.dumps({'id': f'req_{next(self.ids)}', 'custom_id': request['custom_id'],
+                                     'response': {'status_code': 200, 'body': {
+                                         'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': output}}]}},
+                                     'error': None}))
+        self.openai_file(output_id, '\n'.join(lines).encode('utf-8'), 'batch_output')
+        
+        batch = {'id': batch_id, 'input_file_id': body['input_file_id'], 'output_file_id': output_id,
+                 'created_at': int(time.time()), 'polls': 0}
+        self.batches[batch_id] = batch
+        return self.openai_batch(batch)
+
+    def create_gemini_batch(self, body):
+        batch_id = f'batches/{next(self.ids)}'
+        responses = []
+        for item in body['batch']['input_config']['requests']['requests']:
+            if self.fails():
+                responses.append({'metadata': item['metadata'],
+                                  'error': {'code': 429, 'message': 'Resource has been exhausted'}})
+                continue
+            output = self.answer(item['request']['contents'][0]['parts'][0]['text'])
+            responses.append({'metadata': item['metadata'],
+                              'response': {'candidates': [{'content': {'parts': [{'text': output}]}}]}})
+        
+        batch = {'id': batch_id, 'responses': responses, 'polls': 0}
+        self.batches[batch_id] = batch
+        return self.gemini_batch(batch)
+
+    def gemini_batch(self, batch):
+        if batch['polls'] < self.polls_until_done:
+            return {'name': batch['id'], 'metadata': {'state': 'BATCH_STATE_RUNNING'}}
+        return {'name': batch['id'], 'done': True, 'metadata': {'state': 'BATCH_STATE_SUCCEEDED'},
+                'response': {'inlinedResponses': {'inlinedResponses': batch['responses']}}}
+
+    def handler_class(self):
+        """
+        Builds the request handler bound to this server's state.
+        
+        Returns:
+        type: The request handler class.
+        """
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def send_json(self, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def do_POST(self):
+                body = self.read_body()
+                with mock.lock:
+                    if self.path == '/v1/files':
+                        # Parse the multipart upload with the email parser
+                        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8')
+                        message = email.parser.BytesParser().parsebytes(header + body)
+                        fields = {part.get_param('name', header='content-disposition'): part.get_payload(decode=True)
+                                  for part in message.get_payload()}
+                        self.send_json(mock.openai_file(f'file-{next(mock.ids)}', fields['file'],
+                                                        fields['purpose'].decode('utf-8')))
+                    elif self.path == '/v1/batches':
+                        self.send_json(mock.create_openai_batch(json.loads(body)))
+                    elif re.match(r'/v1beta/models/.+:batchGenerateContent', self.path):
+                        self.send_json(mock.create_gemini_batch(json.loads(body)))
+                    else:
+                        self.send_error(404)
+
+            def do_GET(self):
+                with mock.lock:
+                    match = re.match(r'/v1/files/(.+)/content', self.path)
+                    if match:
+                        content = mock.files[match.group(1)]
+                        self.send_response(200)
+                        self.send_header('Content-Length', str(len(content)))
+                        self.end_headers()
+                        self.wfile.write(content)
+                        return
+                    
+                    match = re.match(r'/v1/batches/(batch_\d+)$', self.path)
+                    if match:
+                        batch = mock.batches[match.group(1)]
+                        batch['polls'] += 1
+                        self.send_json(mock.openai_batch(batch))
+                        return
+                    
+                    match = re.match(r'/v1beta/(batches/\d+)$', self.path)
+                    if match:
+                        batch = mock.batches[match.group(1)]
+                        batch['polls'] += 1
+                        self.send_json(mock.gemini_batch(batch))
+                        return
+                    
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
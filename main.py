@@ -8,11 +8,90 @@ from src.LLMManager import LLMManager
 from src.ArticlesCleaner import ArticlesCleaner
 from src.GPTModel import GPT35, GPT4
 from src.GeminiModel import Gemini, Gemini15
+from src.FakeModel import FakeModel
+from src.LocalModel import LocalModel
+from src.ResponseCache import ResponseCache, MAX_ENTRIES
+from src.HttpCache import HttpCache
+from src.FileManager import FileManager
+from src.Pipeline import Pipeline
+from src.Metrics import Metrics
+from src.MarksAnalyzer import MarksAnalyzer
 
 # Define input directory and filename constants
 INPUT_DIR = 'input'
 NEWSPAPERS_FILENAME = 'selected_newspapers.csv'
 
+def pop_flag(flag):
+    """
+    Removes an optional flag from the command line arguments.
+    
+    Parameters:
+    flag (str): The flag, e.g. '--no-cache'.
+    
+    Returns:
+    bool: True if the flag was given.
+    """
+    if flag in sys.argv:
+        sys.argv.remove(flag)
+        return True
+    return False
+
+def pop_option(option, default):
+    """
+    Removes an optional option and its value from the command line arguments.
+    
+    Parameters:
+    option (str): The option, e.g. '--pack'.
+    default: Value returned if the option is not given.
+    
+    Returns:
+    str: The value of the option, or the default.
+    """
+    if option in sys.argv:
+        index = sys.argv.index(option)
+        value = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+        return value
+    return default
+
+def open_http_cache():
+    """
+    Opens the HTTP cache shared by the homepage and article downloads, unless disabled.
+    
+    Returns:
+    HttpCache: The cache, replaying cached pages without any request if '--replay' is given,
+    or None if '--no-http-cache' is given.
+    """
+    replay = pop_flag('--replay')
+    if pop_flag('--no-http-cache'):
+        return None
+    return HttpCache(replay=replay)
+
+def open_response_cache():
+    """
+    Opens the cache of model responses, evicting its oldest entries.
+    
+    Returns:
+    ResponseCache: The cache, keeping at most '--cache-max-entries' responses no older than
+    '--cache-max-age' days, and skipping cached responses if '--no-cache' is given.
+    """
+    max_entries = int(pop_option('--cache-max-entries', MAX_ENTRIES))
+    max_age_days = pop_option('--cache-max-age', None)
+    max_age_days = float(max_age_days) if max_age_days is not None else None
+    return ResponseCache(max_entries=max_entries, max_age_days=max_age_days, bypass=pop_flag('--no-cache'))
+
+def print_http_cache_stats(http_cache):
+    """
+    Prints the usage statistics of the HTTP cache.
+    
+    Parameters:
+    http_cache (HttpCache): The cache, or None if disabled.
+    """
+    if http_cache is not None:
+        stats = http_cache.stats()
+        print(f"HTTP cache: {stats['hits']} pages replayed, {stats['revalidated']} not modified, "
+              f"{stats['misses']} downloaded")
+
 def scrape_urls():
     """
     Scrapes article URLs from a list of newspaper homepages.
@@ -21,91 +100,259 @@ def scrape_urls():
     news_df = pd.read_csv(os.path.join(INPUT_DIR, NEWSPAPERS_FILENAME))
     urls = news_df['homepage']
     
+    # Number of daily URL files cleaned in parallel processes
+    jobs = int(pop_option('--jobs', 1))
+    
+    try:
+        # Get the number of concurrent homepage fetches from command line arguments
+        max_workers = int(sys.argv[2])
+    except IndexError:
+        max_workers = 16
+    
     # Initialize the URL scraper
-    scraper = UrlExtractor()
-    
-    for url in urls:
-        print(url)
-        try:
-            # Fetch and save article URLs for each newspaper homepage
-            article_urls = scraper.fetch_article_urls(url)
-            scraper.save_urls_to_json(url, article_urls)
-        except Exception as e:
-            # Log faulty URLs that cannot be processed
-            print(f"Error processing {url}: {e}")
-            scraper.log_faulty_url(url)
+    http_cache = open_http_cache()
+    scraper = UrlExtractor(http_cache=http_cache)
+    
+    # Fetch and save article URLs for each newspaper homepage concurrently,
+    # logging faulty URLs that cannot be processed
+    with Metrics.shared().stage('crawl'):
+        scraper.fetch_all_article_urls(urls, max_workers=max_workers)
+    print_http_cache_stats(http_cache)
     
     # Clean the extracted URLs
     articles_cleaner = UrlsCleaner()
-    articles_cleaner.top20_articles()
+    with Metrics.shared().stage('clean_urls'):
+        articles_cleaner.top20_articles(jobs=jobs)
 
 def scrape_articles():
     """
     Scrapes the content of articles from previously extracted URLs.
     """
-    # Initialize and run the article content extractor
-    article_extractor = NewsContentExtractor()
-    article_extractor.extract_all_articles()
+    # Download again the articles already downloaded on previous days, if requested
+    refetch = pop_flag('--refetch')
+    http_cache = open_http_cache()
+    
+    try:
+        # Get the number of download threads and parse processes from command line arguments
+        download_workers = int(sys.argv[2])
+        parse_workers = int(sys.argv[3])
+        article_extractor = NewsContentExtractor(download_workers=download_workers, parse_workers=parse_workers,
+                                                 refetch=refetch, http_cache=http_cache)
+    except IndexError:
+        # Default worker counts
+        article_extractor = NewsContentExtractor(refetch=refetch, http_cache=http_cache)
+    
+    # Run the article content extractor
+    with Metrics.shared().stage('extract_articles'):
+        article_extractor.extract_all_articles()
+    print_http_cache_stats(http_cache)
 
 def clean_articles():
     """
     Cleans the scraped articles based on optional length constraints.
     """
+    # Process the files in chunks of this many articles, if requested
+    chunksize = pop_option('--chunksize', None)
+    chunksize = int(chunksize) if chunksize else None
+    
+    # Number of daily files cleaned in parallel processes
+    jobs = int(pop_option('--jobs', 1))
+    
     try:
         # Get minimum and maximum length from command line arguments
         min_length = int(sys.argv[2])
         max_length = int(sys.argv[3])
         articles_cleaner = ArticlesCleaner()
-        articles_cleaner.clean(min_length=min_length, max_length=max_length)
+        with Metrics.shared().stage('clean_articles'):
+            articles_cleaner.clean(min_length=min_length, max_length=max_length, chunksize=chunksize, jobs=jobs)
     except IndexError:
         # Default cleaning without length constraints
         articles_cleaner = ArticlesCleaner()
-        articles_cleaner.clean()
+        with Metrics.shared().stage('clean_articles'):
+            articles_cleaner.clean(chunksize=chunksize, jobs=jobs)
 
-def evaluate_articles():
+def select_model(model_name):
     """
-    Evaluates articles using the specified language model.
-    """
-    # Get the model name from command line arguments
-    model_name = sys.argv[2]
+    Creates the language model with the given name.
+    
+    Parameters:
+    model_name (str): One of 'gpt3', 'gpt4', 'gemini', 'gemini1.5', 'local' or 'fake'.
     
-    # Select the appropriate model based on the provided name
+    Returns:
+    The language model.
+    """
     if model_name == 'gpt3':
-        model = GPT35()
+        return GPT35()
     elif model_name == 'gpt4':
-        model = GPT4()
+        return GPT4()
     elif model_name == 'gemini':
-        model = Gemini()
+        return Gemini()
     elif model_name == 'gemini1.5':
-        model = Gemini15()
+        return Gemini15()
+    elif model_name == 'local':
+        return LocalModel()
+    elif model_name == 'fake':
+        return FakeModel()
     else:
         raise Exception("No model selected")
+
+def evaluate_articles():
+    """
+    Evaluates articles using the specified language models.
+    """
+    # Skip cached responses if requested, while still caching the fresh ones
+    cache = open_response_cache()
+    
+    # Submit the articles to the provider's batch endpoint if requested
+    batch = pop_flag('--batch')
+    
+    # Number of articles packed into one query, if requested
+    pack_size = int(pop_option('--pack', 1))
+    
+    # Truncate articles to this many tokens, if requested
+    token_budget = pop_option('--token-budget', None)
+    token_budget = int(token_budget) if token_budget is not None else None
+    
+    # Number of answers sampled per article, if requested
+    samples = int(pop_option('--samples', 1))
+    
+    # Ask for the marks as JSON, and do not re-ask models for malformed answers, if requested
+    json_mode = pop_flag('--json')
+    reask = not pop_flag('--no-reask')
+    
+    # Get the comma-separated model names from command line arguments
+    models = [select_model(model_name) for model_name in sys.argv[2].split(',')]
     
     try:
         # Get input directory from command line arguments, if provided
         input_dir = sys.argv[3]
-        llm_manager = LLMManager(model, input_dir=input_dir)
     except IndexError:
-        # Initialize LLMManager without input directory
-        llm_manager = LLMManager(model)
+        # Use the default input directory
+        input_dir = ''
+    
+    llm_managers = [LLMManager(model, input_dir=input_dir, cache=cache, batch=batch, pack_size=pack_size,
+                               token_budget=token_budget, samples=samples, json_mode=json_mode,
+                               reask=reask)
+                    for model in models]
+    
+    # Query the selected models on the articles
+    with Metrics.shared().stage('evaluate'):
+        if len(llm_managers) == 1:
+            llm_managers[0].query_models_on_articles()
+        else:
+            LLMManager.query_several_models_on_articles(llm_managers)
+
+def run_pipeline():
+    """
+    Runs all stages of the day as one streaming pipeline, from the newspaper homepages to the
+    evaluations of the specified language models.
+    """
+    # Skip cached responses if requested, while still caching the fresh ones
+    cache = open_response_cache()
+    
+    # Number of articles packed into one query, if requested
+    pack_size = int(pop_option('--pack', 1))
+    
+    # Truncate articles to this many tokens, if requested
+    token_budget = pop_option('--token-budget', None)
+    token_budget = int(token_budget) if token_budget is not None else None
+    
+    # Number of answers sampled per article, if requested
+    samples = int(pop_option('--samples', 1))
+    
+    # Ask for the marks as JSON, and do not re-ask models for malformed answers, if requested
+    json_mode = pop_flag('--json')
+    reask = not pop_flag('--no-reask')
+    
+    # Number of newspapers filtered and scored concurrently
+    score_workers = int(pop_option('--score-workers', 4))
+    
+    # Download again the articles already downloaded on previous days, if requested
+    http_cache = open_http_cache()
+    url_extractor = UrlExtractor(http_cache=http_cache)
+    content_extractor = NewsContentExtractor(refetch=pop_flag('--refetch'), http_cache=http_cache)
+    
+    # Load the list of newspaper URLs from a CSV file
+    news_df = pd.read_csv(os.path.join(INPUT_DIR, NEWSPAPERS_FILENAME))
+    
+    # Get the comma-separated model names from command line arguments
+    models = [select_model(model_name) for model_name in sys.argv[2].split(',')]
+    llm_managers = [LLMManager(model, cache=cache, pack_size=pack_size, token_budget=token_budget,
+                               samples=samples, json_mode=json_mode, reask=reask)
+                    for model in models]
+    
+    try:
+        # Get minimum and maximum length from command line arguments
+        min_length = int(sys.argv[3])
+        max_length = int(sys.argv[4])
+        pipeline = Pipeline(llm_managers, url_extractor=url_extractor, content_extractor=content_extractor,
+                            score_workers=score_workers, min_length=min_length, max_length=max_length)
+    except IndexError:
+        # Default length constraints
+        pipeline = Pipeline(llm_managers, url_extractor=url_extractor, content_extractor=content_extractor,
+                            score_workers=score_workers)
+    
+    # The stages overlap, so the whole run is timed as one stage
+    with Metrics.shared().stage('run'):
+        pipeline.run(news_df['homepage'])
+    print_http_cache_stats(http_cache)
+
+def analyze_evaluations():
+    """
+    Analyzes the marks of all evaluations: centroids, model correlations, bootstrap
+    confidence intervals and day-over-day drift.
+    """
+    try:
+        # Get the evaluations directory from command line arguments, if provided
+        analyzer = MarksAnalyzer(evaluations_dir=sys.argv[2])
+    except IndexError:
+        # Use the default evaluations directory
+        analyzer = MarksAnalyzer()
     
-    # Query the selected model on the articles
-    llm_manager.query_models_on_articles()
+    with Metrics.shared().stage('analyze'):
+        analyzer.analyze()
+
+def convert_files():
+    """
+    Converts the data files of a directory to another storage format.
+    """
+    # Get the directory and the target format from command line arguments
+    directory = sys.argv[2]
+    storage_format = sys.argv[3]
+    with Metrics.shared().stage('convert'):
+        FileManager.convert_directory(directory, storage_format)
 
 if __name__ == "__main__":
+    # Save the outputs in another storage format, if requested
+    FileManager.set_storage_format(pop_option('--format', 'csv'))
+    
+    # Profile every stage with 'cprofile' or 'pyinstrument', if requested
+    Metrics.shared().set_profiler(pop_option('--profile', None))
+    
+    # Run the local model from another GGUF file, or on a given number of CPU threads, if requested
+    local_threads = pop_option('--threads', None)
+    LocalModel.configure(pop_option('--local-model', None), int(local_threads) if local_threads else None)
+    
     # Get the action from the command line arguments
     try:
         action = sys.argv[1]
     except IndexError:
         raise Exception("No action selected")
 
-    if action == 'scrape_urls':
-        scrape_urls()
-    elif action == 'scrape_articles':
-        scrape_articles()
-    elif action == 'clean_articles':
-        clean_articles()
-    elif action == 'evaluate':
-        evaluate_articles()
-    else:
+    actions = {
+        'scrape_urls': scrape_urls,
+        'scrape_articles': scrape_articles,
+        'clean_articles': clean_articles,
+        'evaluate': evaluate_articles,
+        'run': run_pipeline,
+        'analyze': analyze_evaluations,
+        'convert': convert_files,
+    }
+    if action not in actions:
         raise Exception("Invalid action selected")
+    
+    # Write the run report even if the action fails
+    try:
+        actions[action]()
+    finally:
+        print(f"Run report: {Metrics.shared().save_report(action)}")
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# Define root and index paths
+ROOT = 'output'
+INDEX_PATH = os.path.join(ROOT, 'cache', 'articles.sqlite')
+
+class ArticleIndex:
+    """
+    A persistent index of the articles downloaded on previous days, mapping every article URL
+    to the hash of its content. Contents are stored once per hash, compressed, so an article
+    appearing again on a later day is not downloaded again, and identical contents under
+    several URLs are stored once.
+    """
+
+    def __init__(self, path=INDEX_PATH, max_age_days=None):
+        """
+        Opens the index.
+
+        Parameters:
+        path (str): Path of the SQLite database holding the index.
+        max_age_days (float): If given, articles fetched longer ago are downloaded again,
+        e.g. to pick up edits of live articles.
+        """
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                '''CREATE TABLE IF NOT EXISTS urls (
+                       url TEXT PRIMARY KEY,
+                       content_hash TEXT,
+                       fetched REAL,
+                       seen REAL)'''
+            )
+            self.connection.execute(
+                '''CREATE TABLE IF NOT EXISTS contents (
+                       content_hash TEXT PRIMARY KEY,
+                       content BLOB)'''
+            )
+
+    @staticmethod
+    def content_hash(text):
+        """
+        Computes the hash identifying an article content.
+
+        Parameters:
+        text (str): The article text.
+
+        Returns:
+        str: The hexadecimal SHA-256 digest of the text.
+        """
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, url):
+        """
+        Looks up the content of an already downloaded article.
+
+        Parameters:
+        url (str): The URL of the article.
+
+        Returns:
+        str: The article text, or None if the URL is unknown or its content expired.
+        """
+        with self.lock, self.connection:
+            row = self.connection.execute(
+                '''SELECT contents.content, urls.fetched FROM urls
+                   JOIN contents ON contents.content_hash = urls.content_hash
+                   WHERE urls.url = ?''', (url,)).fetchone()
+
+            if row is None or (self.max_age_days is not None
+                               and time.time() - row[1] > self.max_age_days * 86400):
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.connection.execute('UPDATE urls SET seen = ? WHERE url = ?', (time.time(), url))
+
+        return zlib.decompress(row[0]).decode('utf-8')
+
+    def put(self, url, text):
+        """
+        Records the content of a downloaded article.
+
+        Parameters:
+        url (str): The URL of the article.
+        text (str): The article text.
+        """
+        content_hash = self.content_hash(text)
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR IGNORE INTO contents (content_hash, content) VALUES (?, ?)',
+                                    (content_hash, zlib.compress(text.encode('utf-8'))))
+            self.connection.execute('INSERT OR REPLACE INTO urls (url, content_hash, fetched, seen) VALUES (?, ?, ?, ?)',
+                                    (url, content_hash, now, now))
+
+    def stats(self):
+        """
+        Returns the usage statistics of the index.
+
+        Returns:
+        dict: Lookup hits and misses since opening, and the number of URLs and distinct contents.
+        """
+        with self.lock:
+            urls = self.connection.execute('SELECT COUNT(*) FROM urls').fetchone()[0]
+            contents = self.connection.execute('SELECT COUNT(*) FROM contents').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'urls': urls, 'contents': contents}
@@ -1,6 +1,11 @@
-import pandas as pd
 import os
+import pandas as pd
+from functools import partial
 from .FileManager import FileManager
+from .JobRunner import JobRunner
+from .Manifest import Manifest
+from .Metrics import Metrics
+from .StreamingCsvWriter import StreamingCsvWriter
 
 # Define the root directory and subdirectories for input and output files
 ROOT = 'output'
@@ -10,7 +15,123 @@ OUTPUT_DIR = os.path.join(ROOT, 'cleaned_articles')
 class ArticlesCleaner:
     
     @staticmethod
-    def clean(min_length=1000, max_length=5000):
+    def content_length(contents):
+        """
+        Computes the length of article contents.
+        
+        Parameters:
+        contents (pd.Series): The article contents.
+        
+        Returns:
+        pd.Series: The length of every string content, NaN for missing or non-string contents.
+        """
+        # Columns read as numbers, e.g. when every download of a day failed, hold no text
+        if contents.dtype == object or pd.api.types.is_string_dtype(contents.dtype):
+            try:
+                # Float lengths, so that nullable string columns give NaN rather than NA
+                return contents.str.len().astype('float64')
+            except AttributeError:
+                pass
+        return pd.Series(float('nan'), index=contents.index)
+    
+    @staticmethod
+    def filter_articles(df, min_length=1000, max_length=5000):
+        """
+        Keeps the articles whose content length is within the desired range, from newspapers
+        that still have at least 5 such articles. Fully vectorized.
+        
+        Parameters:
+        df (pd.DataFrame): DataFrame with 'newspaper', 'article_url' and 'article_content' columns.
+        min_length (int): Minimum length of article content to be included.
+        max_length (int): Maximum length of article content to be included.
+        
+        Returns:
+        pd.DataFrame: The filtered articles.
+        """
+        # Missing or non-string contents have no length and are excluded by the range check
+        content_length = ArticlesCleaner.content_length(df['article_content'])
+        filtered_df = df[content_length.between(min_length, max_length)]
+        
+        # Keep only newspapers with at least 5 articles
+        newspaper_size = filtered_df.groupby('newspaper')['newspaper'].transform('size')
+        result_df = filtered_df[newspaper_size >= 5]
+        
+        return result_df[['newspaper', 'article_url', 'article_content']]
+    
+    @staticmethod
+    def clean_file_chunked(filepath, output_filepath, min_length=1000, max_length=5000, chunksize=10000):
+        """
+        Cleans a file of articles in chunks, so that peak memory is bounded by the chunk size
+        rather than the file size. A first pass over the newspaper and content columns counts
+        the articles of each newspaper within the length range; a second pass streams the
+        articles within the range from newspapers with at least 5 of them to the output file.
+        
+        Parameters:
+        filepath (str): Path of the articles file.
+        output_filepath (str): Path of the cleaned articles file.
+        min_length (int): Minimum length of article content to be included.
+        max_length (int): Maximum length of article content to be included.
+        chunksize (int): Number of articles read at once.
+        
+        Returns:
+        int: Number of articles written.
+        """
+        # First pass: count the articles within the length range per newspaper
+        counts = {}
+        for chunk in FileManager.read_file_chunks(filepath, chunksize, columns=['newspaper', 'article_content']):
+            in_range = ArticlesCleaner.content_length(chunk['article_content']).between(min_length, max_length)
+            for newspaper, count in chunk[in_range].groupby('newspaper').size().items():
+                counts[newspaper] = counts.get(newspaper, 0) + count
+        newspapers = [newspaper for newspaper, count in counts.items() if count >= 5]
+        
+        # Second pass: stream the selected articles to the output file
+        columns = ['newspaper', 'article_url', 'article_content']
+        writer = StreamingCsvWriter(output_filepath, columns, resume=False)
+        rows = 0
+        for chunk in FileManager.read_file_chunks(filepath, chunksize, columns=columns):
+            in_range = ArticlesCleaner.content_length(chunk['article_content']).between(min_length, max_length)
+            selected = chunk[in_range & chunk['newspaper'].isin(newspapers)]
+            writer.write_frame(selected)
+            rows += len(selected)
+        writer.close()
+        return rows
+
+    @staticmethod
+    def clean_file(f, min_length=1000, max_length=5000, chunksize=None, storage_format='csv'):
+        """
+        Cleans one file of articles and saves the cleaned articles to the output directory.
+        
+        Parameters:
+        f (str): Name of the file in the input directory.
+        min_length (int): Minimum length of article content to be included.
+        max_length (int): Maximum length of article content to be included.
+        chunksize (int): If given, the file is processed in chunks of this many articles
+        instead of being loaded whole.
+        storage_format (str): Format of the output file.
+        
+        Returns:
+        tuple: Path of the output file and number of articles written.
+        """
+        # Construct the full file path for reading
+        filepath = os.path.join(INPUT_DIR, f)
+        
+        if chunksize:
+            output_filepath = os.path.join(OUTPUT_DIR, FileManager.output_filename(f, 'cleanedArticles', storage_format))
+            rows = ArticlesCleaner.clean_file_chunked(filepath, output_filepath, min_length, max_length, chunksize)
+            return output_filepath, rows
+        
+        # Read the file into a DataFrame
+        df = FileManager.read_file(filepath)
+        
+        with Metrics.shared().timer('clean.articles'):
+            final_df = ArticlesCleaner.filter_articles(df, min_length, max_length)
+        
+        # Save the cleaned DataFrame to the output directory
+        output_filepath = FileManager.save_file(f, 'cleanedArticles', storage_format, OUTPUT_DIR, final_df)
+        return output_filepath, len(final_df)
+
+    @staticmethod
+    def clean(min_length=1000, max_length=5000, chunksize=None, jobs=1):
         """
         Cleans articles by filtering out those that do not meet the length requirements
         and saves the cleaned articles to the output directory.
@@ -18,29 +139,19 @@ class ArticlesCleaner:
         Parameters:
         min_length (int): Minimum length of article content to be included.
         max_length (int): Maximum length of article content to be included.
+        chunksize (int): If given, files are processed in chunks of this many articles
+        instead of being loaded whole.
+        jobs (int): Number of files cleaned in parallel processes.
         """
         
-        # Select files that need to be processed
-        files_to_process = FileManager.select_missing_files(INPUT_DIR, OUTPUT_DIR)
+        # Select files that need to be processed, including those cleaned with other lengths
+        params = {'min_length': min_length, 'max_length': max_length}
+        files_to_process = FileManager.select_missing_files(INPUT_DIR, OUTPUT_DIR, stage='clean_articles', params=params)
         
-        for f in files_to_process:
-            # Construct the full file path for reading
-            filepath = os.path.join(INPUT_DIR, f)
-            
-            # Read the CSV file into a DataFrame
-            df = pd.read_csv(filepath)
-            
-            # Ensure 'article_content' is of string type
-            df = df[df['article_content'].apply(lambda x: isinstance(x, str))]
-            df['content_length'] = df['article_content'].apply(len)
-
-            # Filter the DataFrame to include only rows where content_length is within the desired range
-            filtered_df = df[(df['content_length'] >= min_length) & (df['content_length'] <= max_length)]
-            
-            # Filter groups to ensure each newspaper has at least 5 articles
-            result_df = filtered_df.groupby('newspaper').filter(lambda x: len(x) >= 5)
-                          
-            final_df = result_df[['newspaper', 'article_url', 'article_content']]
-            
-            # Save the cleaned DataFrame to the output directory
-            FileManager.save_file(f, 'cleanedArticles', 'csv', OUTPUT_DIR, final_df)
+        def record(f, result):
+            output_filepath, rows = result
+            Manifest.shared().record('clean_articles', os.path.join(INPUT_DIR, f), output_filepath, params, rows)
+        
+        clean_file = partial(ArticlesCleaner.clean_file, min_length=min_length, max_length=max_length,
+                             chunksize=chunksize, storage_format=FileManager.storage_format)
+        JobRunner.run(clean_file, files_to_process, jobs, on_result=record)
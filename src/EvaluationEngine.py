@@ -0,0 +1,216 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .Metrics import Metrics
+
+class EvaluationEngine:
+    """
+    A class to evaluate the articles of many newspapers concurrently.
+
+    Articles are submitted in order, and a newspaper never has more queries in flight than
+    it still needs successes, so the selected articles are exactly the first successful ones
+    of each newspaper, as with a sequential evaluation.
+    """
+
+    # Errors for which an article is skipped rather than the run aborted
+    SKIPPED_ERRORS = (IndexError, TypeError, ValueError, SyntaxError)
+
+    def __init__(self, evaluate, max_in_flight=8, articles_per_newspaper=5, pack=None, evaluate_pack=None):
+        """
+        Initializes the engine.
+
+        Parameters:
+        evaluate (callable): Function returning the marks of an article's content.
+        max_in_flight (int): Maximum number of concurrent model calls.
+        articles_per_newspaper (int): Number of successful evaluations needed per newspaper.
+        pack (callable): Function splitting a list of article contents into packs evaluated by one
+        call, as lists of positions. By default every article is evaluated on its own.
+        evaluate_pack (callable): Function mapping the article contents of a pack to a list holding,
+        for each article, its marks or None if the evaluation failed.
+        """
+        self.evaluate = evaluate
+        self.max_in_flight = max_in_flight
+        self.articles_per_newspaper = articles_per_newspaper
+        self.pack = pack
+        self.evaluate_pack = evaluate_pack
+
+    def evaluate_group(self, articles):
+        """
+        Evaluates a pack of articles, or a single article.
+
+        Parameters:
+        articles (list): The article contents.
+
+        Returns:
+        list: For each article, its marks or None if the evaluation failed.
+        """
+        if len(articles) > 1:
+            return self.evaluate_pack(articles)
+
+        try:
+            return [self.evaluate(articles[0])]
+        except self.SKIPPED_ERRORS:
+            Metrics.shared().increment('evaluation.skipped')
+            return [None]
+
+    @staticmethod
+    def newspaper_states(df):
+        """
+        Builds the evaluation state of every newspaper in a DataFrame.
+
+        Parameters:
+        df (pd.DataFrame): DataFrame with 'newspaper', 'article_url' and 'article_content' columns.
+
+        Returns:
+        list: One state per newspaper, in order of first appearance.
+        """
+        states = []
+        for newspaper in df['newspaper'].unique():
+            df_newspaper = df[df['newspaper'] == newspaper]
+            rows = list(df_newspaper[['newspaper', 'article_url', 'article_content']].itertuples(index=False))
+            states.append({'rows': rows, 'next': 0, 'in_flight': 0, 'marks': {}})
+        return states
+
+    def take(self, state, journal):
+        """
+        Selects the next articles of a newspaper to query, without exceeding the number of
+        successes still needed. Articles recorded in the journal are resolved directly.
+
+        Parameters:
+        state (dict): The state of the newspaper.
+        journal (EvaluationJournal): Journal of an interrupted run, or None.
+
+        Returns:
+        list: Indices of the articles to query, now counted as in flight.
+        """
+        indices = []
+        while (len(state['marks']) + state['in_flight'] < self.articles_per_newspaper
+               and state['next'] < len(state['rows'])):
+            index = state['next']
+            state['next'] += 1
+            row = state['rows'][index]
+
+            # Reuse the outcome recorded by an interrupted run
+            if journal is not None and (row.newspaper, row.article_url) in journal:
+                marks = journal.marks(row.newspaper, row.article_url)
+                if marks is not None:
+                    state['marks'][index] = marks
+                continue
+
+            state['in_flight'] += 1
+            indices.append(index)
+        return indices
+
+    @staticmethod
+    def complete(state, index, marks, journal):
+        """
+        Records the outcome of an article query.
+
+        Parameters:
+        state (dict): The state of the newspaper.
+        index (int): Index of the article.
+        marks (list): The marks of the article, or None if the evaluation failed.
+        journal (EvaluationJournal): Journal checkpointing every evaluation, or None.
+        """
+        state['in_flight'] -= 1
+        Metrics.shared().increment('evaluation.articles')
+        if marks is not None:
+            print(marks)
+            state['marks'][index] = marks
+
+        if journal is not None:
+            row = state['rows'][index]
+            journal.record(row.newspaper, row.article_url, marks)
+
+    @staticmethod
+    def evaluations(states):
+        """
+        Collects the successful evaluations of all newspapers.
+
+        Parameters:
+        states (list): The states of the newspapers.
+
+        Returns:
+        list: Evaluations [newspaper, article_url, article_content, mark_socioeconomic, mark_democracy],
+        followed by any further values returned with the marks, grouped by newspaper in order of
+        first appearance and in article order within a newspaper.
+        """
+        evals = []
+        for state in states:
+            for index in sorted(state['marks']):
+                row = state['rows'][index]
+                marks = state['marks'][index]
+                evals.append([row.newspaper, row.article_url, row.article_content, *marks])
+        return evals
+
+    def run(self, df, journal=None):
+        """
+        Evaluates the articles of all newspapers in a DataFrame.
+
+        Parameters:
+        df (pd.DataFrame): DataFrame with 'newspaper', 'article_url' and 'article_content' columns.
+        journal (EvaluationJournal): Journal checkpointing every evaluation. Articles already
+        recorded in it are not queried again.
+
+        Returns:
+        list: The evaluations, as returned by evaluations().
+        """
+        states = self.newspaper_states(df)
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+
+            def refill(state):
+                # Only query as many articles as could still be needed
+                indices = self.take(state, journal)
+                articles = [state['rows'][index].article_content for index in indices]
+                groups = self.pack(articles) if self.pack else [[i] for i in range(len(indices))]
+
+                for group in groups:
+                    future = executor.submit(self.evaluate_group, [articles[i] for i in group])
+                    futures[future] = (state, [indices[i] for i in group])
+
+            for state in states:
+                refill(state)
+
+            try:
+                while futures:
+                    done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        state, indices = futures.pop(future)
+                        for index, marks in zip(indices, future.result()):
+                            self.complete(state, index, marks, journal)
+                        refill(state)
+            except BaseException:
+                # Do not send the queued queries if the run is aborted
+                for future in futures:
+                    future.cancel()
+                raise
+
+        return self.evaluations(states)
+
+    def run_rounds(self, df, evaluate_round, journal=None):
+        """
+        Evaluates the articles of all newspapers in rounds, each round querying at once every
+        article that could still be needed. Used with batch endpoints, where one round is one job.
+
+        Parameters:
+        df (pd.DataFrame): DataFrame with 'newspaper', 'article_url' and 'article_content' columns.
+        evaluate_round (callable): Function mapping a list of article contents to a list holding,
+        for each article, its marks or None if the evaluation failed.
+        journal (EvaluationJournal): Journal checkpointing every evaluation. Articles already
+        recorded in it are not queried again.
+
+        Returns:
+        list: The evaluations, as returned by evaluations().
+        """
+        states = self.newspaper_states(df)
+
+        while True:
+            pending = [(state, index) for state in states for index in self.take(state, journal)]
+            if not pending:
+                break
+
+            results = evaluate_round([state['rows'][index].article_content for state, index in pending])
+            for (state, index), marks in zip(pending, results):
+                self.complete(state, index, marks, journal)
+
+        return self.evaluations(states)
@@ -0,0 +1,70 @@
+import json
+import os
+import threading
+
+class EvaluationJournal:
+    """
+    An append-only journal of article evaluations, used to checkpoint a run and resume it
+    after a crash without querying the model again for articles already evaluated.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the journal, loading the evaluations recorded by earlier runs.
+        
+        Parameters:
+        path (str): Path of the JSON Lines journal file.
+        """
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        
+        if os.path.exists(path):
+            with open(path, 'r') as journal_file:
+                for line in journal_file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by a crash is simply evaluated again
+                        continue
+                    self.entries[(entry['newspaper'], entry['article_url'])] = entry['marks']
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def marks(self, newspaper, article_url):
+        """
+        Returns the recorded marks of an article.
+        
+        Parameters:
+        newspaper (str): The newspaper of the article.
+        article_url (str): The URL of the article.
+        
+        Returns:
+        list: The recorded marks, or None if the evaluation failed.
+        """
+        return self.entries[(newspaper, article_url)]
+
+    def record(self, newspaper, article_url, marks):
+        """
+        Appends an evaluation to the journal and flushes it to disk.
+        
+        Parameters:
+        newspaper (str): The newspaper of the article.
+        article_url (str): The URL of the article.
+        marks (list): The marks of the article, or None if the evaluation failed.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with self.lock:
+            with open(self.path, 'a') as journal_file:
+                journal_file.write(json.dumps({'newspaper': newspaper, 'article_url': article_url, 'marks': marks}) + '\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+            self.entries[(newspaper, article_url)] = marks
+
+    def remove(self):
+        """
+        Deletes the journal once its evaluations have been compacted into the results file.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -0,0 +1,98 @@
+import hashlib
+import random
+import re
+import time
+from .ModelErrors import TransientModelError
+
+class FakeModel:
+    """
+    A local stand-in for the GPT and Gemini models, used to run and benchmark evaluations
+    offline. Marks are derived from a hash of the article, so repeated queries agree.
+    """
+
+    def __init__(self, latency=0.5, transient_error_rate=0.0, malformed_rate=0.0,
+                 requests_per_minute=6000, tokens_per_minute=None):
+        """
+        Initializes the fake model.
+        
+        Parameters:
+        latency (float): Seconds spent on every query.
+        transient_error_rate (float): Fraction of queries failing as if rate limited.
+        malformed_rate (float): Fraction of articles answered with unparseable text.
+        requests_per_minute (float): Requests-per-minute quota used by the rate limiter.
+        tokens_per_minute (float): Tokens-per-minute quota used by the rate limiter.
+        """
+        self.latency = latency
+        self.transient_error_rate = transient_error_rate
+        self.malformed_rate = malformed_rate
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+    @staticmethod
+    def marks_for(article):
+        """
+        Computes the deterministic marks the fake model gives to an article.
+        
+        Parameters:
+        article (str): The article content.
+        
+        Returns:
+        list: The economic and democracy marks, from -10 to 10.
+        """
+        digest = hashlib.sha256(article.encode('utf-8')).digest()
+        return [digest[0] % 21 - 10, digest[1] % 21 - 10]
+
+    def is_malformed(self, article):
+        """
+        Decides deterministically whether the fake model answers an article with malformed text.
+        
+        Parameters:
+        article (str): The article content.
+        
+        Returns:
+        bool: True for the configured fraction of articles.
+        """
+        digest = hashlib.sha256(article.encode('utf-8')).digest()
+        return digest[2] / 256 < self.malformed_rate
+
+    def query_model(self, query, check_output=True):
+        """
+        Simulates a query to a remote model.
+        
+        Parameters:
+        query (str): The query string, ending with the article, or packing several numbered articles.
+        check_output (bool): Unused, accepted for compatibility with the remote models.
+        
+        Returns:
+        str: The marks in the format [economic, democracy], or one numbered line of marks
+        per article for packed queries.
+        
+        Raises:
+        TransientModelError: For the configured fraction of rate-limited queries.
+        """
+        time.sleep(self.latency)
+        
+        if random.random() < self.transient_error_rate:
+            raise TransientModelError("429 Too Many Requests")
+        
+        # Answer packed queries with one line per well-formed article
+        articles = re.split(r'\n### Article \d+\n', query)[1:]
+        if articles:
+            lines = []
+            for number, article in enumerate(articles, start=1):
+                article = article[:-1]
+                if not self.is_malformed(article):
+                    marks = self.marks_for(article)
+                    lines.append(f'{number}: [{marks[0]}, {marks[1]}]')
+            return '\n'.join(lines)
+        
+        # The same articles are always answered with malformed text
+        article = query.split('Article: ', 1)[-1]
+        if self.is_malformed(article):
+            return "I am not able to evaluate this article."
+        
+        marks = self.marks_for(article)
+        return f'[{marks[0]}, {marks[1]}]'
+
+    def name(self):
+        return 'fake'
@@ -1,21 +1,228 @@
 import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .Manifest import Manifest
+from .Metrics import Metrics
+
+# File formats supported by the storage layer, by extension
+FORMATS = ('csv', 'parquet', 'feather')
+
+# Number of rows converted at once when a CSV file is streamed to a columnar format
+CONVERSION_CHUNKSIZE = 10000
 
 class FileManager:
     
+    # Format in which the pipeline stages save their outputs
+    storage_format = 'csv'
+    
+    @staticmethod
+    def set_storage_format(storage_format):
+        """
+        Sets the format in which the pipeline stages save their outputs.
+        
+        Parameters:
+        storage_format (str): One of 'csv', 'parquet' or 'feather'.
+        """
+        if storage_format not in FORMATS:
+            raise ValueError(f"Unsupported storage format: {storage_format}")
+        FileManager.storage_format = storage_format
+
+    @staticmethod
+    def read_file(filepath, columns=None):
+        """
+        Reads a CSV, Parquet or Feather file into a DataFrame, depending on its extension.
+        
+        Parameters:
+        filepath (str): Path to the file.
+        columns (list): Columns to load. Columnar formats skip the other columns entirely,
+        e.g. to load marks without article bodies. Defaults to all columns.
+        
+        Returns:
+        pd.DataFrame: The content of the file.
+        """
+        extension = os.path.splitext(filepath)[1].lstrip('.')
+        with Metrics.shared().timer(f'io.read.{extension}'):
+            if extension == 'parquet':
+                return pd.read_parquet(filepath, columns=columns)
+            if extension == 'feather':
+                return pd.read_feather(filepath, columns=columns)
+            return pd.read_csv(filepath, usecols=columns)
+
+    @staticmethod
+    def read_file_chunks(filepath, chunksize, columns=None):
+        """
+        Reads a CSV or Parquet file in chunks of rows, so that only one chunk is held in memory.
+        Feather files are read as a single chunk.
+        
+        Parameters:
+        filepath (str): Path to the file.
+        chunksize (int): Number of rows per chunk.
+        columns (list): Columns to load. Defaults to all columns.
+        
+        Yields:
+        pd.DataFrame: The successive chunks of the file.
+        """
+        extension = os.path.splitext(filepath)[1].lstrip('.')
+        if extension == 'parquet':
+            parquet_file = pq.ParquetFile(filepath)
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+                yield batch.to_pandas()
+        elif extension == 'feather':
+            yield pd.read_feather(filepath, columns=columns)
+        else:
+            yield from pd.read_csv(filepath, usecols=columns, chunksize=chunksize)
+
     @staticmethod
-    def select_missing_files(input_path, output_path):
+    def write_file(filepath, df):
+        """
+        Writes a DataFrame to a CSV, Parquet or Feather file, depending on its extension.
+        Columnar formats are compressed with zstd. The file is written under a hidden temporary
+        name and renamed into place, so a partially written file is never taken for a finished one.
+        
+        Parameters:
+        filepath (str): Path to the file.
+        df (pd.DataFrame): DataFrame to be saved.
+        """
+        directory, filename = os.path.split(filepath)
+        extension = os.path.splitext(filename)[1].lstrip('.')
+        temporary_path = os.path.join(directory, f'.{filename}.tmp')
+        
+        try:
+            with Metrics.shared().timer(f'io.write.{extension}'):
+                if extension == 'parquet':
+                    df.to_parquet(temporary_path, index=False, compression='zstd')
+                elif extension == 'feather':
+                    df.reset_index(drop=True).to_feather(temporary_path, compression='zstd')
+                else:
+                    df.to_csv(temporary_path, index=False)
+            os.replace(temporary_path, filepath)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    @staticmethod
+    def csv_schema(csv_path, chunksize=CONVERSION_CHUNKSIZE):
+        """
+        Infers the Arrow schema of a CSV file chunk by chunk, as pandas would infer the column
+        types of the whole file: a numeric column is floating-point if any chunk holds decimals
+        or missing values, and a column whose chunks disagree otherwise is text.
+        
+        Parameters:
+        csv_path (str): Path to the CSV file.
+        chunksize (int): Number of rows read at once.
+        
+        Returns:
+        pa.Schema: The schema of the file.
+        """
+        types = {}
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            for field in pa.Schema.from_pandas(chunk, preserve_index=False):
+                types.setdefault(field.name, set()).add(field.type)
+        
+        fields = []
+        for name, column_types in types.items():
+            if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in column_types):
+                numeric = any(pa.types.is_floating(t) for t in column_types)
+                fields.append(pa.field(name, pa.float64() if numeric else column_types.pop()))
+            elif len(column_types) == 1:
+                fields.append(pa.field(name, column_types.pop()))
+            else:
+                fields.append(pa.field(name, pa.string()))
+        return pa.schema(fields)
+
+    @staticmethod
+    def convert_csv_file(csv_path, filepath, chunksize=CONVERSION_CHUNKSIZE):
+        """
+        Converts a CSV file to a Parquet or Feather file chunk by chunk, so that peak memory is
+        bounded by the chunk size rather than the file size. The file is written under a hidden
+        temporary name and renamed into place.
+        
+        Parameters:
+        csv_path (str): Path to the CSV file.
+        filepath (str): Path to the converted file, whose extension selects its format.
+        chunksize (int): Number of rows converted at once.
+        """
+        directory, filename = os.path.split(filepath)
+        extension = os.path.splitext(filename)[1].lstrip('.')
+        temporary_path = os.path.join(directory, f'.{filename}.tmp')
+        
+        # Read text columns as text in every chunk, even chunks where they look numeric
+        schema = FileManager.csv_schema(csv_path, chunksize)
+        text_columns = {field.name: str for field in schema
+                        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)}
+        
+        try:
+            with Metrics.shared().timer(f'io.write.{extension}'):
+                if extension == 'parquet':
+                    writer = pq.ParquetWriter(temporary_path, schema, compression='zstd')
+                else:
+                    writer = pa.ipc.new_file(temporary_path, schema,
+                                             options=pa.ipc.IpcWriteOptions(compression='zstd'))
+                with writer:
+                    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=text_columns):
+                        writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            os.replace(temporary_path, filepath)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    @staticmethod
+    def convert_directory(path, storage_format):
+        """
+        Converts all data files of a directory to another format, removing the original files.
+        
+        Parameters:
+        path (str): Path to the directory.
+        storage_format (str): One of 'csv', 'parquet' or 'feather'.
+        """
+        if storage_format not in FORMATS:
+            raise ValueError(f"Unsupported storage format: {storage_format}")
+        
+        for file in FileManager.list_files(path):
+            base, extension = os.path.splitext(file)
+            if extension.lstrip('.') not in FORMATS or extension.lstrip('.') == storage_format:
+                continue
+            
+            print(file)
+            df = FileManager.read_file(os.path.join(path, file))
+            FileManager.write_file(os.path.join(path, f"{base}.{storage_format}"), df)
+            os.remove(os.path.join(path, file))
+            Manifest.shared().rename(os.path.join(path, file), os.path.join(path, f"{base}.{storage_format}"))
+
+    @staticmethod
+    def list_files(path):
+        """
+        Lists the files of a directory, ignoring hidden files such as partially written outputs.
+        
+        Parameters:
+        path (str): Path to the directory.
+        
+        Returns:
+        list: The names of the visible files in the directory.
+        """
+        return [file for file in os.listdir(path) if not file.startswith('.')]
+
+    @staticmethod
+    def select_missing_files(input_path, output_path, output_suffix=None, stage=None, params=None):
         """
         Selects files from the input directory that are not present in the output directory.
+        If a stage is given, files whose output is stale according to the manifest are selected too.
         
         Parameters:
         input_path (str): Path to the directory containing input files.
         output_path (str): Path to the directory containing output files.
+        output_suffix (str): If given, only output files named '<date>_<output_suffix>' are considered,
+        e.g. the evaluations of one model in a directory shared by several models.
+        stage (str): Name of the stage in the manifest.
+        params (dict): Parameters the stage would run with.
         
         Returns:
-        set: A set of filenames that are in the input directory but missing from the output directory.
+        set: A set of filenames that are in the input directory but missing from the output directory,
+        or whose output is stale.
         """
-        # List all files in the input directory
-        input_files = os.listdir(input_path)
+        # List all files in the input directory, skipping hidden files such as partial outputs
+        input_files = FileManager.list_files(input_path)
         
         # Create a dictionary with base filenames (excluding extensions) as keys and full filenames as values
         files_input_base = {os.path.splitext(file)[0].split('_')[0]: file for file in input_files}
@@ -24,33 +231,64 @@ class FileManager:
         os.makedirs(output_path, exist_ok=True)
         
         # Create a set of base filenames (excluding extensions) in the output directory
-        files_output_base = {os.path.splitext(file)[0].split('_')[0] for file in os.listdir(output_path)}
+        output_files = FileManager.list_files(output_path)
+        if output_suffix is not None:
+            output_files = [file for file in output_files
+                            if os.path.splitext(file)[0].split('_', 1)[-1] == output_suffix]
+        files_output_base = {os.path.splitext(file)[0].split('_')[0]: file for file in output_files}
 
         # Determine which files are in the input directory but missing from the output directory
         files_to_process = {files_input_base[date] for date in files_input_base if date not in files_output_base}
+        
+        # Add the files whose input or parameters changed since their output was written
+        if stage is not None:
+            manifest = Manifest.shared()
+            files_to_process |= {file for date, file in files_input_base.items()
+                                 if date in files_output_base
+                                 and manifest.is_stale(stage, os.path.join(input_path, file),
+                                                       os.path.join(output_path, files_output_base[date]), params)}
 
         return files_to_process
 
     @staticmethod
-    def save_file(input_filename, new_filename, new_extension, output_path, df):
+    def output_filename(input_filename, new_filename, new_extension):
         """
-        Saves a DataFrame to a CSV file in the specified output directory.
+        Builds the name of an output file from the date part of its input filename.
         
         Parameters:
         input_filename (str): Original filename used to derive the date part.
         new_filename (str): New base name for the file.
         new_extension (str): Extension for the new file.
+        
+        Returns:
+        str: The output filename.
+        """
+        # Extract the date part from the input filename
+        date_part = input_filename.split('_')[0]
+        return f"{date_part}_{new_filename}.{new_extension}"
+
+    @staticmethod
+    def save_file(input_filename, new_filename, new_extension, output_path, df):
+        """
+        Saves a DataFrame to a file in the specified output directory.
+        
+        Parameters:
+        input_filename (str): Original filename used to derive the date part.
+        new_filename (str): New base name for the file.
+        new_extension (str): Extension for the new file, which selects its format.
         output_path (str): Path to the directory where the file will be saved.
-        df (pd.DataFrame): DataFrame to be saved as a CSV file.
+        df (pd.DataFrame): DataFrame to be saved.
+        
+        Returns:
+        str: Path of the saved file.
         """
         # Ensure the output directory exists
         os.makedirs(output_path, exist_ok=True)
         
-        # Extract the date part from the input filename
-        date_part = input_filename.split('_')[0]
-        
         # Construct the new filename
-        filename = f"{date_part}_{new_filename}.{new_extension}"
+        filename = FileManager.output_filename(input_filename, new_filename, new_extension)
         
-        # Save the DataFrame to a CSV file in the output directory
-        df.to_csv(os.path.join(output_path, filename), index=False)
+        # Save the DataFrame to a file in the output directory
+        filepath = os.path.join(output_path, filename)
+        FileManager.write_file(filepath, df)
+        return filepath
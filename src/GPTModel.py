@@ -1,42 +1,212 @@
+import json
+import threading
 import openai
+from .ModelErrors import TransientModelError
+from .Metrics import Metrics
 
 # Configure with your API key
 openai.api_key = 'your_key'
 
+# Endpoint used by the requests of batch jobs
+BATCH_ENDPOINT = '/v1/chat/completions'
+
 class AbstractGPT():
     
-    def query_model(self, query):
+    # Default quotas used by the rate limiter
+    requests_per_minute = 500
+    tokens_per_minute = 60000
+    
+    # If True, answers are constrained to a JSON object, for prompts asking for one
+    json_mode = False
+    
+    # Whether the model accepts the JSON response format
+    supports_json = False
+    
+    # Tokens billed for the last call of each thread
+    _usage = threading.local()
+    
+    def messages(self, query):
+        """
+        Builds the chat messages sent to the model for a query.
+
+        Parameters:
+        query (str): The query string to be sent to the model.
+
+        Returns:
+        list: The system and user messages.
+        """
+        return [
+            {"role": "system", "content": "You are an expert of politics and journalism."},  # Set the context for the model
+            {"role": "user", "content": query}  # Include the user query
+        ]
+
+    def create_completion(self, messages, n=1):
+        """
+        Sends chat messages to the OpenAI API. Kept apart from query_model so that offline
+        stand-ins can replace the SDK call alone.
+
+        Parameters:
+        messages (list): The chat messages.
+        n (int): Number of answers sampled for the messages.
+
+        Returns:
+        The chat completion returned by the SDK.
+        """
+        # Only send n when several answers are sampled, leaving single queries unchanged
+        options = {'n': n} if n > 1 else {}
+        if self.json_mode:
+            options['response_format'] = {'type': 'json_object'}
+        return openai.chat.completions.create(
+            model=self.model,  # Specify the model to be used
+            messages=messages,
+            **options
+        )
+
+    def query_model(self, query, check_output=True):
         """
         Queries the GPT model with the provided query and returns the model's response.
 
         Parameters:
         query (str): The query string to be sent to the model.
+        check_output (bool): Unused, GPT outputs are only checked when the marks are extracted.
 
         Returns:
         str: The content of the model's response.
+        
+        Raises:
+        TransientModelError: If the call was rate limited or failed on the server side.
+        """
+        return self.query_samples(query, 1)[0]
+
+    def query_samples(self, query, n, check_output=True):
+        """
+        Samples several answers to the same query with a single call, through the n
+        parameter of the API. The prompt is billed once for all answers.
+
+        Parameters:
+        query (str): The query string to be sent to the model.
+        n (int): Number of answers sampled.
+        check_output (bool): Unused, GPT outputs are only checked when the marks are extracted.
+
+        Returns:
+        list: The contents of the sampled answers.
+        
+        Raises:
+        TransientModelError: If the call was rate limited or failed on the server side.
         """
         # Create a completion using the OpenAI API's chat completion method
-        completion = openai.chat.completions.create(
-            model=self.model,  # Specify the model to be used
-            messages=[
-                {"role": "system", "content": "You are an expert of politics and journalism."},  # Set the context for the model
-                {"role": "user", "content": query}  # Include the user query
-            ]
-        )
+        self._usage.tokens = None
+        try:
+            completion = self.create_completion(self.messages(query), n)
+        except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+            # Rate limits, server errors and timeouts can be retried
+            raise TransientModelError(str(e)) from e
     
-        # Extract the content of the first response choice
-        output = completion.choices[0].message.content
+        # Record the tokens billed for the call
+        if completion.usage is not None:
+            metrics = Metrics.shared()
+            metrics.increment(f'llm.{self.name()}.prompt_tokens', completion.usage.prompt_tokens)
+            metrics.increment(f'llm.{self.name()}.completion_tokens', completion.usage.completion_tokens)
+            self._usage.tokens = completion.usage.prompt_tokens + completion.usage.completion_tokens
+        
+        # Extract the content of every response choice
+        return [choice.message.content for choice in completion.choices]
+
+    def last_usage(self):
+        """
+        Returns the tokens billed for the last call made by the current thread.
+
+        Returns:
+        int: The prompt and completion tokens, or None if the API did not report them.
+        """
+        return getattr(self._usage, 'tokens', None)
+
+    def batch_request(self, custom_id, query):
+        """
+        Builds the line of a batch job file for a query.
+
+        Parameters:
+        custom_id (str): Identifier used to match the result with the query.
+        query (str): The query string to be sent to the model.
+
+        Returns:
+        dict: The batch request.
+        """
+        body = {"model": self.model, "messages": self.messages(query)}
+        if self.json_mode:
+            body["response_format"] = {"type": "json_object"}
+        return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+    def submit_batch(self, batch_path):
+        """
+        Uploads a batch job file and starts the batch job.
+
+        Parameters:
+        batch_path (str): Path of the JSON Lines file of batch requests.
+
+        Returns:
+        str: The identifier of the batch job.
+        """
+        with open(batch_path, 'rb') as batch_file:
+            batch_input = openai.files.create(file=batch_file, purpose='batch')
         
-        # Return the model's response content
-        return output
+        batch = openai.batches.create(input_file_id=batch_input.id, endpoint=BATCH_ENDPOINT,
+                                      completion_window='24h')
+        return batch.id
+
+    def batch_status(self, batch_id):
+        """
+        Checks the progress of a batch job.
+
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+
+        Returns:
+        str: 'completed' once results can be collected, 'failed' if the job failed, 'running' otherwise.
+        """
+        status = openai.batches.retrieve(batch_id).status
+        
+        # Expired and cancelled jobs still return the results completed so far
+        if status in ('completed', 'expired', 'cancelled'):
+            return 'completed'
+        if status == 'failed':
+            return 'failed'
+        return 'running'
+
+    def batch_results(self, batch_id):
+        """
+        Collects the outputs of a completed batch job.
+
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+
+        Returns:
+        dict: The model outputs keyed by custom identifier. Failed requests are left out.
+        """
+        batch = openai.batches.retrieve(batch_id)
+        outputs = {}
+        if not batch.output_file_id:
+            return outputs
+        
+        for line in openai.files.content(batch.output_file_id).text.splitlines():
+            result = json.loads(line)
+            response = result.get('response')
+            if response and response['status_code'] == 200:
+                outputs[result['custom_id']] = response['body']['choices'][0]['message']['content']
+        
+        return outputs
 
     def name(self):
         return self.model
 
 class GPT35(AbstractGPT):
+    supports_json = True
+    
     def __init__(self):
         self.model = "gpt-3.5-turbo"
 
 class GPT4(AbstractGPT):
+    tokens_per_minute = 10000
+    
     def __init__(self):
         self.model = 'gpt-4'
\ No newline at end of file
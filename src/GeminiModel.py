@@ -1,13 +1,35 @@
 import google.generativeai as genai
-import ast
-import time
-from google.api_core.exceptions import InternalServerError
+import json
+import os
+import threading
+import requests
+from google.api_core.exceptions import InternalServerError, ResourceExhausted, ServiceUnavailable, DeadlineExceeded
+from .ModelErrors import TransientModelError
+from .Metrics import Metrics
+from .OutputParser import OutputParser
 
 # Configure with your API key
-genai.configure(api_key='your_key')
+API_KEY = 'your_key'
+genai.configure(api_key=API_KEY)
+
+# REST endpoint of the Gemini API, used for batch jobs which the SDK does not support
+API_URL = 'https://generativelanguage.googleapis.com/v1beta'
 
 class AbstractGemini:
     
+    # Default quotas used by the rate limiter
+    requests_per_minute = 60
+    tokens_per_minute = 32000
+    
+    # If True, answers are constrained to JSON, for prompts asking for a JSON object
+    json_mode = False
+    
+    # Whether the model accepts the JSON response MIME type
+    supports_json = False
+    
+    # Tokens billed for the last call of each thread
+    _usage = threading.local()
+    
     def output_is_well_formed(self, output):
         """
         Checks if the output from the AI model is well-formed.
@@ -16,46 +38,182 @@ class AbstractGemini:
         output (str): The output from the AI model as a string.
         
         Returns:
-        bool: True if the output is a well-formed list of integers, False otherwise.
+        bool: True if valid marks can be extracted from the output, False otherwise.
         """
-        try:
-            result = ast.literal_eval(output)
-            return isinstance(result, list) and all(isinstance(x, int) for x in result)
-        except (ValueError, SyntaxError):
-            return False
+        return OutputParser.is_well_formed(output)
 
-    def query_model(self, query):
+    def generate_content(self, query):
+        """
+        Sends a query to the Gemini API. Benchmarks override this method with a simulated
+        backend, keeping the error handling of query_model.
+        
+        Parameters:
+        query (str): The query to be sent to the AI model.
+        
+        Returns:
+        The response returned by the SDK.
+        """
+        if self.json_mode:
+            return self.model.generate_content(query, generation_config={'response_mime_type': 'application/json'})
+        return self.model.generate_content(query)
+
+    def query_model(self, query, check_output=True):
         """
         Queries the AI model with a given query and checks if the output is well-formed.
         
         Parameters:
         query (str): The query to be sent to the AI model.
+        check_output (bool): If False, the output is returned without checking it is a single list
+        of marks, e.g. for queries packing several articles.
         
         Returns:
         str: The output from the AI model.
         
         Raises:
-        ValueError: If there is an internal server error or the output is not well-formed.
+        TransientModelError: If the call was rate limited or failed on the server side.
+        ValueError: If the output is not well-formed.
         """
-        time.sleep(3)  # Delay to avoid rate limiting
+        self._usage.tokens = None
         try:
-            response = self.model.generate_content(query)
-        except InternalServerError:
-            raise ValueError("Internal Server Error occurred while querying the model.")
+            response = self.generate_content(query)
+        except (ResourceExhausted, InternalServerError, ServiceUnavailable, DeadlineExceeded) as e:
+            # Rate limits, server errors and timeouts can be retried
+            raise TransientModelError(f"Error occurred while querying the model: {e}") from e
+        
+        # Record the tokens billed for the call
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            metrics = Metrics.shared()
+            metrics.increment(f'llm.{self.name()}.prompt_tokens', usage.prompt_token_count)
+            metrics.increment(f'llm.{self.name()}.completion_tokens', usage.candidates_token_count)
+            self._usage.tokens = usage.prompt_token_count + usage.candidates_token_count
         
         output = response.text
-        if not self.output_is_well_formed(output):
+        if check_output and not self.output_is_well_formed(output):
             raise ValueError("The output from the model is not well-formed.")
         
         return output
+
+    def last_usage(self):
+        """
+        Returns the tokens billed for the last call made by the current thread.
+        
+        Returns:
+        int: The prompt and candidate tokens, or None if the API did not report them.
+        """
+        return getattr(self._usage, 'tokens', None)
+
+    def batch_request(self, custom_id, query):
+        """
+        Builds the line of a batch job file for a query.
+        
+        Parameters:
+        custom_id (str): Identifier used to match the result with the query.
+        query (str): The query to be sent to the AI model.
+        
+        Returns:
+        dict: The batch request.
+        """
+        request = {"contents": [{"parts": [{"text": query}]}]}
+        if self.json_mode:
+            request["generationConfig"] = {"responseMimeType": "application/json"}
+        return {"key": custom_id, "request": request}
+
+    def submit_batch(self, batch_path):
+        """
+        Starts a batch job with the requests of a batch job file, sent inline.
+        
+        Parameters:
+        batch_path (str): Path of the JSON Lines file of batch requests.
+        
+        Returns:
+        str: The identifier of the batch job.
+        """
+        with open(batch_path, 'r') as batch_file:
+            batch_requests = [json.loads(line) for line in batch_file]
+        
+        body = {"batch": {
+            "display_name": os.path.basename(batch_path),
+            "input_config": {"requests": {"requests": [
+                {"request": request["request"], "metadata": {"key": request["key"]}}
+                for request in batch_requests
+            ]}}
+        }}
+        response = requests.post(f'{API_URL}/{self.model.model_name}:batchGenerateContent',
+                                 headers={'x-goog-api-key': API_KEY}, json=body, timeout=60)
+        response.raise_for_status()
+        return response.json()['name']
+
+    def get_batch(self, batch_id):
+        """
+        Retrieves a batch job.
+        
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+        
+        Returns:
+        dict: The batch job operation.
+        """
+        response = requests.get(f'{API_URL}/{batch_id}', headers={'x-goog-api-key': API_KEY}, timeout=60)
+        response.raise_for_status()
+        return response.json()
+
+    def batch_status(self, batch_id):
+        """
+        Checks the progress of a batch job.
+        
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+        
+        Returns:
+        str: 'completed' once results can be collected, 'failed' if the job failed, 'running' otherwise.
+        """
+        state = self.get_batch(batch_id).get('metadata', {}).get('state')
+        if state in ('BATCH_STATE_SUCCEEDED', 'BATCH_STATE_EXPIRED'):
+            return 'completed'
+        if state in ('BATCH_STATE_FAILED', 'BATCH_STATE_CANCELLED'):
+            return 'failed'
+        return 'running'
+
+    def batch_results(self, batch_id):
+        """
+        Collects the outputs of a completed batch job.
+        
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+        
+        Returns:
+        dict: The model outputs keyed by custom identifier. Failed requests are left out,
+        malformed outputs are kept to be repaired when the marks are extracted.
+        """
+        batch = self.get_batch(batch_id)
+        responses = batch.get('response', {}).get('inlinedResponses', {}).get('inlinedResponses', [])
+        
+        outputs = {}
+        for item in responses:
+            try:
+                output = item['response']['candidates'][0]['content']['parts'][0]['text']
+            except (KeyError, IndexError):
+                continue
+            outputs[item['metadata']['key']] = output
+        
+        return outputs
+
+    def name(self):
+        return self.model_name
     
 class Gemini(AbstractGemini):
     
     def __init__(self):
         self.model = genai.GenerativeModel('gemini-pro')
+        self.model_name = 'gemini-1.0'
 
 
 class Gemini15(AbstractGemini):
+    requests_per_minute = 15
+    tokens_per_minute = 1000000
+    supports_json = True
 
     def __init__(self):
         self.model = genai.GenerativeModel('gemini-1.5-flash-latest')
+        self.model_name = 'gemini-1.5'
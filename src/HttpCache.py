@@ -0,0 +1,222 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from .Metrics import Metrics
+
+# Define root and cache paths
+ROOT = 'output'
+CACHE_PATH = os.path.join(ROOT, 'cache', 'http.sqlite')
+
+# Default maximum size of the stored bodies, compressed
+MAX_BYTES = 1024 ** 3
+
+# Number of pages stored between two evictions, so that the size cap holds during long runs
+EVICT_INTERVAL = 500
+
+class HttpCache:
+    """
+    A persistent HTTP cache shared by the homepage and article downloads.
+
+    Bodies are stored compressed along with their ETag and Last-Modified validators. A page
+    already in the cache is requested conditionally, and its stored body is reused when the
+    server answers 304 Not Modified. In replay mode, cached pages are served without any
+    request and pages missing from the cache fail, so reruns and backfills work offline.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, max_age_days=None, replay=False,
+                 evict_interval=EVICT_INTERVAL):
+        """
+        Opens the cache and evicts expired entries.
+
+        Parameters:
+        path (str): Path of the SQLite database holding the cache.
+        max_bytes (int): Maximum total size of the compressed bodies; the least recently used
+        pages are evicted beyond it.
+        max_age_days (float): Maximum age of a page in days.
+        replay (bool): If True, cached pages are returned without revalidation, and pages not
+        in the cache are not downloaded.
+        evict_interval (int): Number of pages stored between two evictions.
+        """
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.replay = replay
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stored = 0
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                '''CREATE TABLE IF NOT EXISTS pages (
+                       url TEXT PRIMARY KEY,
+                       final_url TEXT,
+                       etag TEXT,
+                       last_modified TEXT,
+                       encoding TEXT,
+                       body BLOB,
+                       size INTEGER,
+                       fetched REAL,
+                       accessed REAL)'''
+            )
+            self.connection.execute('CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)')
+        self.evict()
+
+    def get(self, url):
+        """
+        Looks up a cached page.
+
+        Parameters:
+        url (str): The requested URL.
+
+        Returns:
+        dict: The 'content' (bytes), final 'url', declared 'encoding' and the 'etag' and
+        'last_modified' validators of the page, or None if it is not cached.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT final_url, etag, last_modified, encoding, body FROM pages WHERE url = ?',
+                (url,)).fetchone()
+        if row is None:
+            return None
+
+        final_url, etag, last_modified, encoding, body = row
+        return {'content': zlib.decompress(body), 'url': final_url, 'encoding': encoding,
+                'etag': etag, 'last_modified': last_modified}
+
+    def put(self, url, final_url, content, etag=None, last_modified=None, encoding=None):
+        """
+        Stores a downloaded page.
+
+        Parameters:
+        url (str): The requested URL.
+        final_url (str): The URL of the page after redirects.
+        content (bytes): The body of the page.
+        etag (str): The ETag header of the response.
+        last_modified (str): The Last-Modified header of the response.
+        encoding (str): The charset declared by the Content-Type header, if any.
+        """
+        body = zlib.compress(content)
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (url, final_url, etag, last_modified, encoding, body, len(body), now, now))
+            self.stored += 1
+            evict = self.stored % self.evict_interval == 0
+        if evict:
+            self.evict()
+
+    def touch(self, url):
+        """
+        Marks a cached page as used, e.g. after the server confirmed it is still current.
+
+        Parameters:
+        url (str): The requested URL.
+        """
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE pages SET accessed = ? WHERE url = ?', (time.time(), url))
+
+    def fetch(self, session, url, timeout=10, headers=None):
+        """
+        Downloads a page through the cache: cached pages are revalidated with a conditional
+        request, or returned as is in replay mode.
+
+        Parameters:
+        session (requests.Session): The session sending the request.
+        url (str): The requested URL.
+        timeout (float): Timeout of the request in seconds.
+        headers (dict): Additional request headers.
+
+        Returns:
+        dict: The 'content' (bytes), final 'url' and declared 'encoding' of the page.
+
+        Raises:
+        requests.HTTPError: If the server answers with an error status.
+        LookupError: If the page is not cached in replay mode.
+        """
+        metrics = Metrics.shared()
+        cached = self.get(url)
+
+        if self.replay:
+            if cached is None:
+                metrics.increment('http.cache.replay_misses')
+                raise LookupError(f"Page not in the HTTP cache, not downloaded in replay mode: {url}")
+            with self.lock:
+                self.hits += 1
+            metrics.increment('http.cache.hits')
+            self.touch(url)
+            return cached
+
+        request_headers = dict(headers or {})
+        if cached is not None:
+            if cached['etag']:
+                request_headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                request_headers['If-Modified-Since'] = cached['last_modified']
+
+        response = session.get(url, timeout=timeout, headers=request_headers)
+        if response.status_code == 304 and cached is not None:
+            with self.lock:
+                self.revalidated += 1
+            metrics.increment('http.cache.revalidated')
+            self.touch(url)
+            return cached
+
+        response.raise_for_status()
+        with self.lock:
+            self.misses += 1
+        metrics.increment('http.cache.misses')
+        metrics.increment('http.cache.bytes', len(response.content))
+
+        # Keep the charset only when the server declared it, as requests otherwise assumes ISO-8859-1
+        content_type = response.headers.get('Content-Type', '').lower()
+        encoding = response.encoding if 'charset' in content_type else None
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        # Pages without validators are stored too, so that they can be replayed
+        self.put(url, response.url, response.content, etag, last_modified, encoding)
+        return {'content': response.content, 'url': response.url, 'encoding': encoding,
+                'etag': etag, 'last_modified': last_modified}
+
+    def evict(self):
+        """
+        Removes pages older than the maximum age, then the least recently used pages beyond
+        the maximum total size.
+        """
+        with self.lock, self.connection:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self.connection.execute('DELETE FROM pages WHERE fetched < ?', (cutoff,))
+
+            if self.max_bytes is not None:
+                self.connection.execute(
+                    '''DELETE FROM pages WHERE url IN (
+                           SELECT url FROM (
+                               SELECT url, SUM(size) OVER (ORDER BY accessed DESC, url) AS total
+                               FROM pages)
+                           WHERE total > ?)''',
+                    (self.max_bytes,)
+                )
+
+    def stats(self):
+        """
+        Returns the usage statistics of the cache.
+
+        Returns:
+        dict: Pages served without request, revalidated and downloaded since opening, and
+        the number and total compressed size of the cached pages.
+        """
+        with self.lock:
+            pages, size = self.connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages').fetchone()
+        return {'hits': self.hits, 'revalidated': self.revalidated, 'misses': self.misses,
+                'pages': pages, 'bytes': size}
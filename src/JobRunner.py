@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .Metrics import Metrics
+
+def timed_call(function, item):
+    """
+    Calls a function on an item and measures how long it took.
+    Defined at module level so that it can be run in a worker process.
+    
+    Parameters:
+    function (callable): The function to call.
+    item: The argument of the function.
+    
+    Returns:
+    tuple: The elapsed time in seconds and the result of the call.
+    """
+    start = time.perf_counter()
+    result = function(item)
+    return time.perf_counter() - start, result
+
+def worker_call(function, item):
+    """
+    Calls a function on an item in a worker process, collecting the metrics of the call
+    so that they can be merged into the metrics of the parent process.
+    
+    Parameters:
+    function (callable): The function to call.
+    item: The argument of the function.
+    
+    Returns:
+    tuple: The elapsed time in seconds, the result of the call and the metrics collected.
+    """
+    # Drop the metrics inherited from the parent process
+    metrics = Metrics.shared()
+    metrics.reset()
+    elapsed, result = timed_call(function, item)
+    return elapsed, result, metrics.snapshot()
+
+class JobRunner:
+    """
+    A class to process independent files, such as daily files, in a pool of processes.
+    """
+
+    @staticmethod
+    def run(function, items, jobs=1, on_result=None):
+        """
+        Calls a function on every item, spreading the items over a process pool, and prints
+        a timing summary. Items that fail do not stop the others; the first error is raised
+        once all items have been processed.
+        
+        Parameters:
+        function (callable): Picklable function processing one item.
+        items (iterable): The items to process, e.g. filenames.
+        jobs (int): Number of worker processes. With 1, items are processed in this process.
+        on_result (callable): Called in this process with each item and its result as soon as
+        the item is done, e.g. to record it in the manifest.
+        
+        Returns:
+        dict: The results keyed by item.
+        """
+        items = sorted(items)
+        timings = {}
+        results = {}
+        errors = {}
+        start = time.perf_counter()
+        
+        if jobs > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = {executor.submit(worker_call, function, item): item for item in items}
+                for future in as_completed(futures):
+                    item = futures[future]
+                    try:
+                        timings[item], results[item], snapshot = future.result()
+                        Metrics.shared().merge(snapshot)
+                        if on_result is not None:
+                            on_result(item, results[item])
+                    except Exception as e:
+                        errors[item] = e
+        else:
+            for item in items:
+                try:
+                    timings[item], results[item] = timed_call(function, item)
+                    if on_result is not None:
+                        on_result(item, results[item])
+                except Exception as e:
+                    errors[item] = e
+        
+        # Print the per-item timing summary
+        for item in items:
+            if item in timings:
+                print(f"{item}: {timings[item]:.2f}s")
+            else:
+                print(f"{item}: failed ({errors[item]})")
+        print(f"{len(timings)} done, {len(errors)} failed in {time.perf_counter() - start:.2f}s with {jobs} jobs")
+        
+        metrics = Metrics.shared()
+        for elapsed in timings.values():
+            metrics.observe('jobs.file', elapsed)
+        metrics.increment('jobs.failures', len(errors))
+        
+        if errors:
+            raise next(iter(errors.values()))
+        return results
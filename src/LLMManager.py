@@ -1,26 +1,182 @@
-import re
 import os
+import json
+import time
+import random
+import hashlib
+import statistics
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from .FileManager import FileManager
+from .RateLimiter import RateLimiter
+from .EvaluationEngine import EvaluationEngine
+from .ModelErrors import TransientModelError
+from .ResponseCache import ResponseCache
+from .EvaluationJournal import EvaluationJournal
+from .Manifest import Manifest
+from .Metrics import Metrics
+from .TokenCounter import TokenCounter
+from .OutputParser import OutputParser
 
 # Define root and directory paths
 ROOT = 'output'
 ARTICLES_DIR = os.path.join(ROOT, 'cleaned_articles')
 SELECTED_ARTICLES_DIR = os.path.join(ROOT, 'selected_articles')
 OUTPUT_DIR = os.path.join(ROOT, 'evaluations')
+JOURNAL_DIR = os.path.join(ROOT, 'journals')
+BATCHES_DIR = os.path.join(ROOT, 'batches')
+
+# Base delay in seconds between retries of rate-limited or failed calls
+BACKOFF_BASE = 2
+BACKOFF_MAX = 60
+
+# Instructions preceding every article sent to the models
+TASK = (
+    # Kept verbatim, including indentation, so the prompt matches the published evaluations
+    '''Instructions: Economic Scale from -10 to 10, where -10 is Economic Left and 
+            10 Economic Right. Scale Democracy Scale from -10 to 10, where -10 is Libertarian 
+            and 10 is Authoritarian. I provide a newspaper article. 
+            Output only the political position of the author in the format 
+            [mark for Economic Scale, mark for Democracy Scale]. 
+            NEVER WRITE ANY TEXT BEFORE OR AFTER THE RESULT. 
+            ALWAYS provide the result, even if you are not fully sure.
+            Article: '''
+)
+
+# Instructions asking for the marks as a JSON object, sent to models answering in JSON mode
+JSON_TASK = (
+    '''Instructions: Economic Scale from -10 to 10, where -10 is Economic Left and
+    10 Economic Right. Scale Democracy Scale from -10 to 10, where -10 is Libertarian
+    and 10 is Authoritarian. I provide a newspaper article.
+    Output only the political position of the author as a JSON object
+    {"economic": mark for Economic Scale, "democracy": mark for Democracy Scale}.
+    ALWAYS provide the result, even if you are not fully sure.
+    Article: '''
+)
+
+# Short queries asking the model to rewrite a malformed answer, sent without the article
+REASK_TASK = (
+    '''Rewrite the following answer in the format [mark for Economic Scale, mark for Democracy Scale],
+    with two integers from -10 to 10. NEVER WRITE ANY TEXT BEFORE OR AFTER THE RESULT.
+    Answer: '''
+)
+JSON_REASK_TASK = (
+    '''Rewrite the following answer as a JSON object {"economic": mark for Economic Scale,
+    "democracy": mark for Democracy Scale}, with two integers from -10 to 10.
+    Answer: '''
+)
+
+# Columns of the evaluations files, and the aggregates added when several answers are sampled
+EVALUATION_COLUMNS = ['newspaper', 'article_url', 'article_content', 'mark_socioeconomic', 'mark_democracy']
+SAMPLE_COLUMNS = ['mark_socioeconomic_mean', 'mark_democracy_mean', 'mark_socioeconomic_var',
+                  'mark_democracy_var', 'samples']
+
+# Estimated number of tokens of the short answer to a query
+ANSWER_TOKENS = 10
+
+# Instructions preceding several numbered articles packed into one query
+PACKED_TASK = (
+    '''Instructions: Economic Scale from -10 to 10, where -10 is Economic Left and 
+    10 Economic Right. Scale Democracy Scale from -10 to 10, where -10 is Libertarian 
+    and 10 is Authoritarian. I provide {count} newspaper articles, each one introduced by 
+    "### Article <number>". For each article, output only the political position of its author 
+    on its own line in the format 
+    <number>: [mark for Economic Scale, mark for Democracy Scale]. 
+    NEVER WRITE ANY TEXT BEFORE OR AFTER THE RESULTS. 
+    ALWAYS provide a result for every article, even if you are not fully sure.
+    '''
+)
 
 class LLMManager:
     
-    def __init__(self, model, input_dir=''):
+    def __init__(self, model, input_dir='', max_in_flight=8, max_retries=5, cache=None,
+                 batch=False, batch_poll_interval=60, pack_size=1, pack_token_budget=8000, token_budget=None,
+                 samples=1, json_mode=False, reask=True):
         """
         Initializes the LLMManager with a model and sets the input directory.
         
         Parameters:
         model: The language model to be used.
         input_dir (str): Directory to read articles from. Defaults to 'cleaned_articles'.
+        max_in_flight (int): Maximum number of concurrent model calls.
+        max_retries (int): Number of retries of a call that was rate limited or failed on the server side.
+        cache (ResponseCache): Cache of model responses. Defaults to the persistent cache in the output directory.
+        batch (bool): If True, articles are submitted to the provider's batch endpoint instead of queried one by one.
+        batch_poll_interval (float): Seconds between two checks of a running batch job.
+        pack_size (int): Maximum number of articles packed into one query. 1 disables packing.
+        pack_token_budget (int): Maximum estimated number of tokens of a packed query. Capped at the
+        context window of models declaring one, less the tokens of their answer.
+        token_budget (int): Maximum number of tokens of an article in a query. Longer articles are
+        truncated to their lead paragraphs. None sends whole articles.
+        samples (int): Number of answers sampled per article. Above 1, the marks are the medians
+        of the sampled marks, saved with their means and variances.
+        json_mode (bool): If True, the marks are asked for as a JSON object, and models supporting
+        it are constrained to answer in JSON. Not supported with packing.
+        reask (bool): If True, a malformed answer holding numbers is sent back to the model once,
+        asking to rewrite it in the expected format, instead of dropping the article.
+        
+        Raises:
+        ValueError: If several samples are requested with packing or batch jobs, or from a
+        model answering deterministically, or if JSON answers are requested with packing.
         """
+        if samples > 1 and (pack_size > 1 or batch):
+            raise ValueError("Sampling several answers is not supported with packing or batch jobs")
+        
+        # Packed queries ask for numbered lines of marks, not for a JSON object
+        if json_mode and pack_size > 1:
+            raise ValueError("JSON answers are not supported with packing")
+        
+        # Greedy decoding gives the same answer to every sample
+        if samples > 1 and getattr(model, 'temperature', None) == 0:
+            raise ValueError(f"Sampling several answers needs a sampling temperature above 0, "
+                             f"{model.name()} always gives the same answer")
+        
         self.model = model
         self.input_dir = SELECTED_ARTICLES_DIR if input_dir == 'selected' else ARTICLES_DIR
+        self.max_retries = max_retries
+        self.cache = cache if cache is not None else ResponseCache()
+        self.batch = batch
+        self.batch_poll_interval = batch_poll_interval
+        self.rate_limiter = RateLimiter.shared(model.name(), model.requests_per_minute, model.tokens_per_minute)
+        self.pack_size = pack_size
+        self.pack_token_budget = pack_token_budget
+        
+        # Packed queries must fit the context window of local models, leaving room for the answer
+        if getattr(model, 'n_ctx', None):
+            self.pack_token_budget = min(pack_token_budget, model.n_ctx - model.max_tokens)
+        self.token_budget = token_budget
+        self.token_counter = TokenCounter(model.name())
+        self.samples = samples
+        self.task = JSON_TASK if json_mode else TASK
+        self.reask_task = (JSON_REASK_TASK if json_mode else REASK_TASK) if reask else None
+        self.parser = OutputParser(model.name())
+        if json_mode and getattr(model, 'supports_json', False):
+            model.json_mode = True
+        
+        # Samples are drawn by parallel calls unless the model samples them in one call, and
+        # the samples of every article in flight can be drawn at once
+        self.sample_pool = None
+        if samples > 1 and not hasattr(model, 'query_samples'):
+            self.sample_pool = ThreadPoolExecutor(max_workers=max_in_flight * samples)
+        
+        if pack_size > 1:
+            self.engine = EvaluationEngine(self.query_model, max_in_flight=max_in_flight,
+                                           pack=self.pack_articles, evaluate_pack=self.query_packed)
+        else:
+            self.engine = EvaluationEngine(self.query_model, max_in_flight=max_in_flight)
+
+    def prepare_article(self, article):
+        """
+        Truncates an article to the token budget, if any.
+        
+        Parameters:
+        article (str): The article content.
+        
+        Returns:
+        str: The article as sent to the model.
+        """
+        if self.token_budget is None:
+            return article
+        return self.token_counter.truncate(article, self.token_budget)
 
     def generate_task(self, article):
         """
@@ -32,17 +188,7 @@ class LLMManager:
         Returns:
         str: The task query for the model.
         """
-        task = (
-            '''Instructions: Economic Scale from -10 to 10, where -10 is Economic Left and 
-            10 Economic Right. Scale Democracy Scale from -10 to 10, where -10 is Libertarian 
-            and 10 is Authoritarian. I provide a newspaper article. 
-            Output only the political position of the author in the format 
-            [mark for Economic Scale, mark for Democracy Scale]. 
-            NEVER WRITE ANY TEXT BEFORE OR AFTER THE RESULT. 
-            ALWAYS provide the result, even if you are not fully sure.
-            Article: '''
-        )
-        query = task + article
+        query = self.task + article
         return query
     
     def query_model(self, article):
@@ -53,13 +199,448 @@ class LLMManager:
         article (str): The article content.
         
         Returns:
-        list: Extracted marks for economic and democracy scales.
+        list: Extracted marks for economic and democracy scales, followed by their means,
+        variances and number of samples when several answers are sampled.
         """
+        if self.samples > 1:
+            return self.query_samples(article)
+        
+        article = self.prepare_article(article)
+        
+        # Reuse the response of an identical earlier query
+        key = ResponseCache.key(self.model.name(), self.task, article)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached['marks'] or self.extract_points_and_comment(cached['output'])
+        
+        # Malformed outputs are kept, to be repaired by a re-ask rather than queried again
         query = self.generate_task(article)
-        output = self.model.query_model(query)
-        marks = self.extract_points_and_comment(output)
+        output = self.call_model(query, check_output=False)
+        
+        # Cache the raw output even when it cannot be parsed
+        marks = None
+        try:
+            marks = self.parse_output(output)
+            return marks
+        finally:
+            self.cache.put(key, self.model.name(), output, marks)
+
+    def parse_output(self, output):
+        """
+        Extracts the marks from a fresh output of the model. If the output is malformed but
+        holds numbers, the model is asked once to rewrite it in the expected format.
+        
+        Parameters:
+        output (str): The model's output.
+        
+        Returns:
+        list: The extracted marks.
+        
+        Raises:
+        ValueError: If no valid marks could be extracted, even after a re-ask.
+        """
+        try:
+            marks = self.parser.parse(output)
+            self.parser.record('parsed')
+            return marks
+        except ValueError:
+            if not (self.reask_task and self.parser.can_repair(output)):
+                self.parser.record('unparseable')
+                raise
+        
+        # Only the malformed answer is sent back, not the article
+        try:
+            marks = self.parser.parse(self.call_model(self.reask_task + output, check_output=False))
+        except ValueError:
+            self.parser.record('unparseable')
+            raise
+        self.parser.record('repaired')
         return marks
+
+    def sample_key(self, article, index):
+        """
+        Computes the cache key of one sampled answer. The first sample shares the key of a
+        single query, so earlier single-sample evaluations are reused.
+        
+        Parameters:
+        article (str): The article content, as sent to the model.
+        index (int): Index of the sample.
+        
+        Returns:
+        str: The cache key.
+        """
+        template = self.task if index == 0 else f'{self.task}\0sample {index}'
+        return ResponseCache.key(self.model.name(), template, article)
+
+    def call_sample(self, query):
+        """
+        Samples one answer, for models drawing every sample with its own call.
+        
+        Parameters:
+        query (str): The query sent to the model.
+        
+        Returns:
+        str: The model's output, or None if the call failed.
+        """
+        try:
+            return self.call_model(query, check_output=False)
+        except ValueError:
+            return None
+
+    def query_samples(self, article):
+        """
+        Queries the model for several sampled answers to an article and aggregates their marks.
+        Every sample is cached on its own, so that only the missing samples are drawn when the
+        number of samples is raised.
+        
+        Parameters:
+        article (str): The article content.
+        
+        Returns:
+        list: The median economic and democracy marks, their means and variances, and the
+        number of samples whose marks could be extracted.
+        
+        Raises:
+        ValueError: If no sampled answer could be parsed.
+        """
+        article = self.prepare_article(article)
+        name = self.model.name()
+        keys = [self.sample_key(article, i) for i in range(self.samples)]
+        
+        marks = [None] * self.samples
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is None:
+                missing.append(i)
+                continue
+            try:
+                marks[i] = cached['marks'] or self.extract_points_and_comment(cached['output'])
+            except EvaluationEngine.SKIPPED_ERRORS:
+                pass
+        
+        if missing:
+            query = self.generate_task(article)
+            if self.sample_pool is None:
+                outputs = self.call_model(query, n=len(missing))
+                # A single sample is returned as a plain output, not a list
+                if len(missing) == 1:
+                    outputs = [outputs]
+            else:
+                outputs = list(self.sample_pool.map(self.call_sample, [query] * len(missing)))
+            
+            for i, output in zip(missing, outputs):
+                if output is None:
+                    continue
+                try:
+                    marks[i] = self.parse_output(output)
+                except EvaluationEngine.SKIPPED_ERRORS:
+                    pass
+                self.cache.put(keys[i], name, output, marks[i])
+        
+        valid = [sample for sample in marks if sample is not None]
+        if not valid:
+            raise ValueError(f"None of the {self.samples} sampled answers could be parsed")
+        return self.aggregate_samples(valid)
+
+    @staticmethod
+    def aggregate_samples(marks):
+        """
+        Aggregates the marks of several sampled answers.
+        
+        Parameters:
+        marks (list): The [economic, democracy] marks of every sample.
+        
+        Returns:
+        list: The median marks, as integers (the lower one for an even number of samples),
+        followed by the mean marks, their population variances and the number of samples.
+        """
+        economic = [sample[0] for sample in marks]
+        democracy = [sample[1] for sample in marks]
+        return [statistics.median_low(economic), statistics.median_low(democracy),
+                statistics.fmean(economic), statistics.fmean(democracy),
+                statistics.pvariance(economic), statistics.pvariance(democracy), len(marks)]
+
+    def generate_packed_task(self, articles):
+        """
+        Generates a query asking the model to evaluate several numbered articles at once.
+        
+        Parameters:
+        articles (list): The article contents.
+        
+        Returns:
+        str: The packed task query for the model.
+        """
+        query = PACKED_TASK.format(count=len(articles))
+        for number, article in enumerate(articles, start=1):
+            query += f'\n### Article {number}\n{article}\n'
+        return query
+
+    def pack_articles(self, articles):
+        """
+        Splits articles into consecutive packs of at most pack_size articles whose packed
+        query fits in the token budget.
+        
+        Parameters:
+        articles (list): The article contents.
+        
+        Returns:
+        list: The packs, as lists of positions in the articles list.
+        """
+        packs = []
+        budget = self.count_tokens(PACKED_TASK)
+        tokens = budget
+        
+        for i, article in enumerate(articles):
+            article_tokens = self.count_tokens(self.prepare_article(article))
+            if (not packs or len(packs[-1]) == self.pack_size
+                    or tokens + article_tokens > self.pack_token_budget):
+                packs.append([])
+                tokens = budget
+            packs[-1].append(i)
+            tokens += article_tokens
+        
+        return packs
+
+    def extract_packed_points(self, text, count):
+        """
+        Extracts the numbered marks of a packed query's output.
+        
+        Parameters:
+        text (str): The model's output.
+        count (int): Number of articles in the packed query.
+        
+        Returns:
+        list: For each article, its marks, or None if they are missing, out of range or ambiguous.
+        """
+        return self.parser.parse_packed(text, count)
+
+    def query_packed(self, articles):
+        """
+        Evaluates several articles with one packed query, falling back to single-article
+        queries for the articles whose marks are missing or malformed.
         
+        Parameters:
+        articles (list): The article contents.
+        
+        Returns:
+        list: For each article, its extracted marks, or None if the evaluation failed.
+        """
+        results = [None] * len(articles)
+        prepared = [self.prepare_article(article) for article in articles]
+        keys = [ResponseCache.key(self.model.name(), PACKED_TASK, article) for article in prepared]
+        
+        to_query = []
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None and cached['marks'] is not None:
+                results[i] = cached['marks']
+            else:
+                to_query.append(i)
+        
+        if len(to_query) > 1:
+            query = self.generate_packed_task([prepared[i] for i in to_query])
+            try:
+                output = self.call_model(query, check_output=False)
+                packed_marks = self.extract_packed_points(output, len(to_query))
+            except ValueError:
+                packed_marks = [None] * len(to_query)
+            self.parser.record('parsed', sum(marks is not None for marks in packed_marks))
+            self.parser.record('unparseable', sum(marks is None for marks in packed_marks))
+            
+            for i, marks in zip(to_query, packed_marks):
+                if marks is not None:
+                    results[i] = marks
+                    self.cache.put(keys[i], self.model.name(), output, marks)
+        
+        # Fall back to single-article queries for the missing entries
+        for i in range(len(articles)):
+            if results[i] is None:
+                try:
+                    results[i] = self.query_model(articles[i])
+                except EvaluationEngine.SKIPPED_ERRORS:
+                    pass
+        
+        return results
+
+    @staticmethod
+    def estimate_tokens(query):
+        """
+        Roughly estimates the number of tokens consumed by a query and its short answer.
+        
+        Parameters:
+        query (str): The query sent to the model.
+        
+        Returns:
+        int: The estimated number of tokens.
+        """
+        return len(query) // 4 + ANSWER_TOKENS
+
+    def count_tokens(self, query):
+        """
+        Counts the tokens consumed by a query and its short answer with the model's tokenizer,
+        or estimates them if it is not available.
+        
+        Parameters:
+        query (str): The query sent to the model.
+        
+        Returns:
+        int: The number of tokens.
+        """
+        return self.token_counter.count(query) + ANSWER_TOKENS
+
+    def token_report(self, articles):
+        """
+        Prints the distribution of the article tokens before a run, and the tokens the
+        queries will consume once the articles are truncated to the budget.
+        
+        Parameters:
+        articles (iterable): The article contents.
+        
+        Returns:
+        dict: Summary of the article tokens, the number of truncated articles and the
+        tokens of the queries.
+        """
+        counts = [self.token_counter.count(article) for article in articles if isinstance(article, str)]
+        if not counts:
+            return None
+        
+        summary = Metrics.summarize(counts)
+        truncated = sum(count > self.token_budget for count in counts) if self.token_budget is not None else 0
+        task_tokens = self.count_tokens(self.task)
+        query_tokens = sum(task_tokens + min(count, self.token_budget or count) for count in counts)
+        
+        method = 'tokenizer' if self.token_counter.exact() else 'estimate'
+        print(f"Article tokens ({self.model.name()}, {method}): {summary['count']} articles, "
+              f"p50 {summary['p50']}, p90 {summary['p90']}, p99 {summary['p99']}, max {summary['max']}")
+        if self.token_budget is not None:
+            print(f"{truncated} articles truncated to {self.token_budget} tokens")
+        print(f"At most {query_tokens} query tokens if every article is evaluated")
+        
+        return {'articles': {key: summary[key] for key in ('count', 'mean', 'p50', 'p90', 'p99', 'max')},
+                'truncated': truncated, 'query_tokens': query_tokens}
+
+    def call_model(self, query, check_output=True, n=1):
+        """
+        Sends a query to the model within the rate limits, retrying with exponential
+        backoff when the call is rate limited or fails on the server side.
+        
+        Parameters:
+        query (str): The query sent to the model.
+        check_output (bool): If False, the model does not check that the output is a single list of marks.
+        n (int): If above 1, number of answers sampled in one call, by models supporting it.
+        
+        Returns:
+        str: The model's output, or the list of sampled outputs if n is above 1.
+        
+        Raises:
+        ValueError: If the call still fails after all retries.
+        """
+        metrics = Metrics.shared()
+        name = self.model.name()
+        tokens = self.count_tokens(query) + (n - 1) * ANSWER_TOKENS
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(tokens)
+            metrics.increment(f'llm.{name}.estimated_tokens', tokens)
+            try:
+                with metrics.timer(f'llm.{name}'):
+                    if n > 1:
+                        output = self.model.query_samples(query, n, check_output=check_output)
+                    else:
+                        output = self.model.query_model(query, check_output=check_output)
+                self.rate_limiter.reward()
+                
+                # Correct the token quota with the tokens actually billed, when reported
+                used = self.model.last_usage() if hasattr(self.model, 'last_usage') else None
+                if used is not None:
+                    self.rate_limiter.settle(tokens, used)
+                return output
+            except TransientModelError as e:
+                self.rate_limiter.penalize()
+                if attempt == self.max_retries:
+                    metrics.increment(f'llm.{name}.failures')
+                    raise ValueError(f"Model call failed after {attempt + 1} attempts: {e}")
+                metrics.increment(f'llm.{name}.retries')
+                
+                # Wait with jitter so that concurrent calls do not retry in lockstep
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                time.sleep(delay * random.uniform(0.5, 1.5))
+        
+    def query_batch(self, articles):
+        """
+        Evaluates a list of articles with one batch job. Articles with a cached response are
+        not submitted again.
+        
+        Parameters:
+        articles (list): The article contents.
+        
+        Returns:
+        list: For each article, its extracted marks, or None if the evaluation failed.
+        
+        Raises:
+        RuntimeError: If the batch job failed.
+        """
+        results = [None] * len(articles)
+        outputs = {}
+        articles = [self.prepare_article(article) for article in articles]
+        keys = [ResponseCache.key(self.model.name(), self.task, article) for article in articles]
+        
+        for i, key in enumerate(keys):
+            cached = self.cache.get(key)
+            if cached is not None:
+                outputs[str(i)] = cached['output']
+        cached_ids = set(outputs)
+        
+        # Serialize the remaining prompts into a batch job file
+        to_submit = [i for i in range(len(articles)) if str(i) not in outputs]
+        if to_submit:
+            os.makedirs(BATCHES_DIR, exist_ok=True)
+            batch_path = os.path.join(BATCHES_DIR, f"{time.strftime('%Y-%m-%dT%H%M%S')}_{self.model.name()}.jsonl")
+            with open(batch_path, 'w') as batch_file:
+                for i in to_submit:
+                    request = self.model.batch_request(str(i), self.generate_task(articles[i]))
+                    batch_file.write(json.dumps(request) + '\n')
+            
+            batch_id = self.model.submit_batch(batch_path)
+            print(f"Submitted batch {batch_id} with {len(to_submit)} requests")
+            
+            status = self.model.batch_status(batch_id)
+            while status == 'running':
+                time.sleep(self.batch_poll_interval)
+                status = self.model.batch_status(batch_id)
+            if status == 'failed':
+                raise RuntimeError(f"Batch {batch_id} failed")
+            
+            batch_outputs = self.model.batch_results(batch_id)
+            for i in to_submit:
+                if str(i) in batch_outputs:
+                    outputs[str(i)] = batch_outputs[str(i)]
+                    continue
+                
+                # Requests that failed within the job, e.g. rate limited, are queried again one by one
+                Metrics.shared().increment(f'llm.{self.model.name()}.batch_requeried')
+                try:
+                    outputs[str(i)] = self.call_model(self.generate_task(articles[i]), check_output=False)
+                except ValueError:
+                    pass
+        
+        # Parse every output through the same mark extraction as single queries
+        for i, key in enumerate(keys):
+            output = outputs.get(str(i))
+            if output is None:
+                continue
+            try:
+                if str(i) in cached_ids:
+                    results[i] = self.extract_points_and_comment(output)
+                else:
+                    results[i] = self.parse_output(output)
+            except EvaluationEngine.SKIPPED_ERRORS:
+                pass
+            if str(i) not in cached_ids:
+                self.cache.put(key, self.model.name(), output, results[i])
+        
+        return results
+
     def extract_points_and_comment(self, text):
         """
         Extracts the marks from the model's output.
@@ -69,43 +650,152 @@ class LLMManager:
         
         Returns:
         list: The extracted marks as integers.
+        
+        Raises:
+        ValueError: If the output holds no valid marks.
         """
-        matches = re.findall(r'\[(-?\d+), (-?\d+)\]', text)[0]
-        marks = [int(matches[0]), int(matches[1])]
-        return marks
+        return self.parser.parse(text)
     
     def save_results_csv(self, evals, filename):
         """
-        Saves the evaluation results to a CSV file.
+        Saves the evaluation results to a file in the configured storage format.
         
         Parameters:
         evals (list): List of evaluations.
         filename (str): The filename to save the results as.
+        
+        Returns:
+        str: Path of the saved file.
+        """
+        columns = EVALUATION_COLUMNS + SAMPLE_COLUMNS if self.samples > 1 else EVALUATION_COLUMNS
+        evals_df = pd.DataFrame(evals, columns=columns)
+        
+        return FileManager.save_file(filename, self.model.name(), FileManager.storage_format, OUTPUT_DIR, evals_df)
+
+    def stage(self):
+        """
+        Returns the name under which the evaluations of this model are recorded in the manifest.
+        
+        Returns:
+        str: The stage name.
+        """
+        return f"evaluate_{self.model.name()}"
+
+    def stage_params(self):
+        """
+        Returns the parameters the evaluations depend on, so that they are recomputed when
+        the prompt changes.
+        
+        Returns:
+        dict: The parameters recorded in the manifest.
+        """
+        params = {'task': hashlib.sha256(self.task.encode('utf-8')).hexdigest()[:16]}
+        if self.token_budget is not None:
+            params['token_budget'] = self.token_budget
+        if self.samples > 1:
+            params['samples'] = self.samples
+        return params
+
+    def parse_report(self):
+        """
+        Prints how many fresh outputs of the model were parsed, repaired by a re-ask or
+        dropped, and records the failure rate as a gauge.
+        
+        Returns:
+        dict: The parsing statistics of the model.
         """
-        evals_df = pd.DataFrame(evals, columns=['newspaper', 'article_url', 'article_content',
-                                                'mark_socioeconomic', 'mark_democracy'])
+        stats = self.parser.stats()
+        Metrics.shared().gauge(f'llm.{self.model.name()}.parse_failure_rate', stats['failure_rate'])
+        print(f"Output parsing ({self.model.name()}): {stats['parsed']} parsed, {stats['repaired']} repaired, "
+              f"{stats['unparseable']} unparseable ({stats['failure_rate']:.1%} failed)")
+        return stats
+
+    def missing_files(self):
+        """
+        Lists the article files of the input directory not yet evaluated by this model,
+        or whose evaluations are stale.
+        
+        Returns:
+        set: The filenames to evaluate.
+        """
+        return FileManager.select_missing_files(self.input_dir, OUTPUT_DIR, output_suffix=self.model.name(),
+                                                stage=self.stage(), params=self.stage_params())
+
+    def evaluate_file(self, df, filename):
+        """
+        Evaluates the articles of one file and saves the results. Every evaluation is
+        checkpointed in a journal, so an interrupted run resumes where it stopped.
         
-        FileManager.save_file(filename, self.model.name(), 'csv', OUTPUT_DIR, evals_df)
+        Parameters:
+        df (pd.DataFrame): The articles of the file.
+        filename (str): The name of the file, used to derive the output filename.
+        """
+        print(f"{filename} ({self.model.name()})")
+        self.token_report(df['article_content'])
+        
+        journal_filename = FileManager.output_filename(filename, self.model.name(), 'jsonl')
+        journal = EvaluationJournal(os.path.join(JOURNAL_DIR, journal_filename))
+        
+        # Evaluate all newspapers of the file, skipping journaled articles
+        if self.batch:
+            all_evals = self.engine.run_rounds(df, self.query_batch, journal)
+        else:
+            all_evals = self.engine.run(df, journal)
+        
+        # Compact the journal into the results file
+        output_filepath = self.save_results_csv(all_evals, filename)
+        Manifest.shared().record(self.stage(), os.path.join(self.input_dir, filename), output_filepath,
+                                 self.stage_params(), len(all_evals))
+        journal.remove()
 
     def query_models_on_articles(self):
         """
-        Queries the model on all articles in the input directory and saves the results.
+        Queries the model on all articles in the input directory not yet evaluated by this model
+        and saves the results.
         """
-        articles_files = os.listdir(self.input_dir)
+        for f in self.missing_files():
+            df = FileManager.read_file(os.path.join(self.input_dir, f))
+            self.evaluate_file(df, f)
         
-        for f in articles_files:
-            filepath = os.path.join(self.input_dir, f)
-            df = pd.read_csv(filepath)
-            all_evals = []
-            
-            for newspaper in df['newspaper'].unique():
-                print(newspaper)
-                df_newspaper = df[df['newspaper'] == newspaper]
-                evals = self.query_all_articles_in_newspaper(df_newspaper)
-                all_evals.extend(evals)
-                
-            self.save_results_csv(all_evals, f)        
-            
+        stats = self.cache.stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
+        self.parse_report()
+
+    @staticmethod
+    def query_several_models_on_articles(managers):
+        """
+        Queries several models concurrently over a single pass of the article files. Each file is
+        read once and evaluated by every model that has not evaluated it yet; every model runs in
+        its own thread under its own rate limiter and saves its own results.
+        
+        Parameters:
+        managers (list): One LLMManager per model, sharing the same input directory.
+        """
+        # Read every pending file once
+        missing = {manager: sorted(manager.missing_files()) for manager in managers}
+        articles = {}
+        for files in missing.values():
+            for f in files:
+                if f not in articles:
+                    articles[f] = FileManager.read_file(os.path.join(managers[0].input_dir, f))
+        
+        def evaluate_all(manager):
+            for f in missing[manager]:
+                manager.evaluate_file(articles[f], f)
+        
+        with ThreadPoolExecutor(max_workers=len(managers)) as executor:
+            # Surface the first error raised by any model
+            for _ in executor.map(evaluate_all, managers):
+                pass
+        
+        # Report each cache once, even when shared by several models
+        caches = {id(manager.cache): manager.cache for manager in managers}
+        for cache in caches.values():
+            stats = cache.stats()
+            print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses")
+        for manager in managers:
+            manager.parse_report()
+
     def query_all_articles_in_newspaper(self, df_newspaper):
         """
         Queries the model on all articles for a specific newspaper and returns evaluations.
@@ -116,17 +806,4 @@ class LLMManager:
         Returns:
         list: List of evaluations.
         """
-        evals = []
-        
-        for _, row in df_newspaper.iterrows():
-            try:
-                marks = self.query_model(row['article_content'])
-                print(marks)
-                evals.append([row['newspaper'], row['article_url'], 
-                              row['article_content'], marks[0], marks[1]])       
-                if len(evals) == 5:
-                    break
-            except (IndexError, TypeError, ValueError, SyntaxError):
-                continue
-        
-        return evals
+        return self.engine.run(df_newspaper)
@@ -0,0 +1,229 @@
+import json
+import os
+import threading
+from .Metrics import Metrics
+
+# Default GGUF model file of the local backend
+MODEL_PATH = os.path.join('models', 'local.gguf')
+
+class LocalModel:
+    """
+    A language model run locally on CPU with llama.cpp, from a GGUF model file. It needs
+    neither network access nor API keys, and its throughput is only bounded by the CPU.
+
+    The model is loaded once per process and shared by every LocalModel using the same file,
+    and its calls are serialized, llama.cpp contexts not being thread-safe. Batch jobs are run
+    at once, one prompt after another, so that llama.cpp reuses the evaluated instructions
+    shared by all prompts.
+
+    Requires the llama-cpp-python package.
+    """
+
+    # Default model file and number of CPU threads, set from the command line
+    model_path = MODEL_PATH
+    n_threads = None
+
+    # No provider quota, the rate limiter only guards against runaway loops
+    requests_per_minute = 1000000
+    tokens_per_minute = None
+
+    # Models loaded in this process, with the lock serializing their calls
+    _models = {}
+    _models_lock = threading.Lock()
+
+    # Results of the batch jobs run in this process
+    _batches = {}
+
+    # Tokens consumed by the last call of each thread
+    _usage = threading.local()
+
+    @staticmethod
+    def configure(model_path=None, n_threads=None):
+        """
+        Sets the default model file and number of CPU threads of the local models.
+
+        Parameters:
+        model_path (str): Path of the GGUF model file.
+        n_threads (int): Number of CPU threads used by llama.cpp. Defaults to its own choice.
+        """
+        if model_path is not None:
+            LocalModel.model_path = model_path
+        if n_threads is not None:
+            LocalModel.n_threads = n_threads
+
+    def __init__(self, model_path=None, n_threads=None, n_ctx=4096, max_tokens=16, temperature=0.0):
+        """
+        Initializes the local model. The model file is only loaded by the first query.
+
+        Parameters:
+        model_path (str): Path of the GGUF model file. Defaults to the configured file.
+        n_threads (int): Number of CPU threads used by llama.cpp. Defaults to the configured number.
+        n_ctx (int): Size of the context window in tokens.
+        max_tokens (int): Maximum number of tokens generated per answer.
+        temperature (float): Sampling temperature. 0 always gives the most likely answer.
+        """
+        self.model_path = model_path or LocalModel.model_path
+        self.n_threads = n_threads or LocalModel.n_threads
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        self.model_name = 'local-' + os.path.splitext(os.path.basename(self.model_path))[0]
+
+    def load(self):
+        """
+        Loads the model file, once per process and configuration.
+
+        Returns:
+        tuple: The llama.cpp model and the lock serializing its calls.
+
+        Raises:
+        ImportError: If llama-cpp-python is not installed.
+        FileNotFoundError: If the model file does not exist.
+        """
+        key = (self.model_path, self.n_threads, self.n_ctx)
+        with LocalModel._models_lock:
+            if key not in LocalModel._models:
+                try:
+                    from llama_cpp import Llama
+                except ImportError:
+                    raise ImportError("The local model requires the llama-cpp-python package")
+                if not os.path.exists(self.model_path):
+                    raise FileNotFoundError(f"Local model file not found: {self.model_path}")
+
+                with Metrics.shared().timer('llm.local.load'):
+                    llama = Llama(model_path=self.model_path, n_threads=self.n_threads, n_ctx=self.n_ctx,
+                                  verbose=False)
+                LocalModel._models[key] = (llama, threading.Lock())
+            return LocalModel._models[key]
+
+    def messages(self, query):
+        """
+        Builds the chat messages sent to the model for a query, as for the remote models.
+
+        Parameters:
+        query (str): The query string to be sent to the model.
+
+        Returns:
+        list: The system and user messages.
+        """
+        return [
+            {"role": "system", "content": "You are an expert of politics and journalism."},
+            {"role": "user", "content": query}
+        ]
+
+    def create_chat_completion(self, messages):
+        """
+        Generates the answer to chat messages with the loaded model, formatted with the chat
+        template of the model file.
+
+        Parameters:
+        messages (list): The chat messages.
+
+        Returns:
+        dict: The chat completion returned by llama.cpp.
+        """
+        llama, lock = self.load()
+        with lock:
+            return llama.create_chat_completion(messages=messages, max_tokens=self.max_tokens,
+                                                temperature=self.temperature)
+
+    def query_model(self, query, check_output=True):
+        """
+        Queries the local model with the provided query and returns its answer.
+
+        Parameters:
+        query (str): The query string to be sent to the model.
+        check_output (bool): Unused, outputs are only checked when the marks are extracted.
+
+        Returns:
+        str: The content of the model's answer.
+        """
+        self._usage.tokens = None
+        completion = self.create_chat_completion(self.messages(query))
+
+        usage = completion.get('usage')
+        if usage:
+            metrics = Metrics.shared()
+            metrics.increment(f'llm.{self.name()}.prompt_tokens', usage['prompt_tokens'])
+            metrics.increment(f'llm.{self.name()}.completion_tokens', usage['completion_tokens'])
+            self._usage.tokens = usage['prompt_tokens'] + usage['completion_tokens']
+
+        return completion['choices'][0]['message']['content']
+
+    def last_usage(self):
+        """
+        Returns the tokens consumed by the last call made by the current thread.
+
+        Returns:
+        int: The prompt and completion tokens, or None if they were not reported.
+        """
+        return getattr(self._usage, 'tokens', None)
+
+    def batch_request(self, custom_id, query):
+        """
+        Builds the line of a batch job file for a query.
+
+        Parameters:
+        custom_id (str): Identifier used to match the result with the query.
+        query (str): The query string to be sent to the model.
+
+        Returns:
+        dict: The batch request.
+        """
+        return {"custom_id": custom_id, "query": query}
+
+    def submit_batch(self, batch_path):
+        """
+        Runs a batch job at once. Prompts are answered one after another, the evaluated tokens
+        of the shared instructions being reused from one prompt to the next. As with the remote
+        batch jobs, a failed request, e.g. a prompt exceeding the context window, is left out
+        of the outputs instead of failing the whole job.
+
+        Parameters:
+        batch_path (str): Path of the JSON Lines file of batch requests.
+
+        Returns:
+        str: The identifier of the batch job.
+        """
+        with open(batch_path, 'r') as batch_file:
+            batch_requests = [json.loads(line) for line in batch_file]
+
+        metrics = Metrics.shared()
+        outputs = {}
+        with metrics.timer(f'llm.{self.name()}.batch'):
+            for request in batch_requests:
+                try:
+                    outputs[request['custom_id']] = self.query_model(request['query'])
+                except Exception:
+                    metrics.increment(f'llm.{self.name()}.batch_failures')
+
+        batch_id = os.path.splitext(os.path.basename(batch_path))[0]
+        LocalModel._batches[batch_id] = outputs
+        return batch_id
+
+    def batch_status(self, batch_id):
+        """
+        Checks the progress of a batch job, which is complete once submitted.
+
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+
+        Returns:
+        str: 'completed' if the job was run by this process, 'failed' otherwise.
+        """
+        return 'completed' if batch_id in LocalModel._batches else 'failed'
+
+    def batch_results(self, batch_id):
+        """
+        Collects the outputs of a batch job.
+
+        Parameters:
+        batch_id (str): The identifier of the batch job.
+
+        Returns:
+        dict: The model outputs keyed by custom identifier.
+        """
+        return LocalModel._batches.pop(batch_id)
+
+    def name(self):
+        return self.model_name
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+# Define root and manifest paths
+ROOT = 'output'
+MANIFEST_PATH = os.path.join(ROOT, 'manifest.sqlite')
+
+# JSON manifest written by previous versions, imported into an empty manifest
+LEGACY_MANIFEST_PATH = os.path.join(ROOT, 'manifest.json')
+
+class Manifest:
+    """
+    A class to keep track of the outputs of every pipeline stage, like a build system.
+
+    For each stage and input file, the manifest records the hashes of the input and output
+    files, the parameters of the stage, the number of rows written and the completion status.
+    An output is stale, and recomputed, when its input or parameters changed or when the
+    output itself was modified or corrupted since it was written.
+
+    Records are stored in SQLite and written one by one, so processes running stages
+    concurrently, e.g. the evaluations of two models, never overwrite each other's records.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=MANIFEST_PATH, legacy_path=LEGACY_MANIFEST_PATH):
+        """
+        Opens the manifest, importing the legacy JSON manifest if the manifest is empty.
+
+        Parameters:
+        path (str): Path of the SQLite database holding the manifest.
+        legacy_path (str): Path of the JSON manifest of previous versions.
+        """
+        self.path = path
+        self.lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Wait for the writes of other processes instead of failing
+        self.connection = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                '''CREATE TABLE IF NOT EXISTS records (
+                       stage TEXT,
+                       input TEXT,
+                       output TEXT,
+                       input_hash TEXT,
+                       output_hash TEXT,
+                       params TEXT,
+                       rows INTEGER,
+                       status TEXT,
+                       PRIMARY KEY (stage, input))'''
+            )
+            self.connection.execute(
+                '''CREATE TABLE IF NOT EXISTS fingerprints (
+                       path TEXT PRIMARY KEY,
+                       size INTEGER,
+                       mtime_ns INTEGER,
+                       hash TEXT)'''
+            )
+
+        if legacy_path and os.path.exists(legacy_path):
+            self.import_legacy(legacy_path)
+
+    def import_legacy(self, legacy_path):
+        """
+        Imports the records of a JSON manifest, unless the manifest already holds records.
+
+        Parameters:
+        legacy_path (str): Path of the JSON manifest.
+        """
+        with self.lock, self.connection:
+            # An exclusive transaction, so that concurrent processes import the records once
+            self.connection.execute('BEGIN IMMEDIATE')
+            if self.connection.execute('SELECT 1 FROM records LIMIT 1').fetchone():
+                return
+
+            with open(legacy_path, 'r') as manifest_file:
+                data = json.load(manifest_file)
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(stage, input_filepath, record['output'], record['input_hash'], record['output_hash'],
+                  json.dumps(record['params'], sort_keys=True), record['rows'], record['status'])
+                 for stage, records in data.get('stages', {}).items()
+                 for input_filepath, record in records.items()]
+            )
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)',
+                [(filepath, *fingerprint) for filepath, fingerprint in data.get('fingerprints', {}).items()]
+            )
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the manifest of the output directory, opening it on first use.
+
+        Returns:
+        Manifest: The shared manifest.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def file_hash(self, filepath):
+        """
+        Computes the SHA-256 hash of a file. Hashes are remembered with the size and
+        modification time of the file, so unchanged files are not read again.
+
+        Parameters:
+        filepath (str): Path to the file.
+
+        Returns:
+        str: The hexadecimal digest of the file content.
+        """
+        stat = os.stat(filepath)
+        key = os.path.normpath(filepath)
+        with self.lock:
+            fingerprint = self.connection.execute(
+                'SELECT size, mtime_ns, hash FROM fingerprints WHERE path = ?', (key,)).fetchone()
+        if fingerprint and fingerprint[0] == stat.st_size and fingerprint[1] == stat.st_mtime_ns:
+            return fingerprint[2]
+
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?)',
+                                    (key, stat.st_size, stat.st_mtime_ns, digest.hexdigest()))
+        return digest.hexdigest()
+
+    def is_stale(self, stage, input_filepath, output_filepath, params=None):
+        """
+        Checks whether the output of a stage for an input file must be recomputed.
+        Outputs written before the manifest existed are trusted as they are.
+
+        Parameters:
+        stage (str): Name of the stage.
+        input_filepath (str): Path of the input file.
+        output_filepath (str): Path of the existing output file.
+        params (dict): Parameters the stage would run with.
+
+        Returns:
+        bool: True if the output must be recomputed.
+        """
+        with self.lock:
+            record = self.connection.execute(
+                'SELECT output, input_hash, output_hash, params, status FROM records WHERE stage = ? AND input = ?',
+                (stage, os.path.normpath(input_filepath))).fetchone()
+        if record is None:
+            return False
+
+        output, input_hash, output_hash, recorded_params, status = record
+        return (status != 'complete'
+                or json.loads(recorded_params) != (params or {})
+                or output != os.path.normpath(output_filepath)
+                or input_hash != self.file_hash(input_filepath)
+                or output_hash != self.file_hash(output_filepath))
+
+    def record(self, stage, input_filepath, output_filepath, params=None, rows=None, status='complete'):
+        """
+        Records the output of a stage for an input file.
+
+        Parameters:
+        stage (str): Name of the stage.
+        input_filepath (str): Path of the input file.
+        output_filepath (str): Path of the output file.
+        params (dict): Parameters the stage ran with.
+        rows (int): Number of rows written to the output file.
+        status (str): 'complete', or any other status for an output to be recomputed.
+        """
+        input_hash = self.file_hash(input_filepath)
+        output_hash = self.file_hash(output_filepath)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (stage, os.path.normpath(input_filepath), os.path.normpath(output_filepath), input_hash,
+                 output_hash, json.dumps(params or {}, sort_keys=True), rows, status)
+            )
+
+    def rename(self, old_filepath, new_filepath):
+        """
+        Follows a file that was rewritten under another path with the same rows, e.g. converted
+        to another storage format, so the stages reading or writing it are not recomputed.
+
+        Parameters:
+        old_filepath (str): Previous path of the file.
+        new_filepath (str): New path of the file.
+        """
+        old_filepath, new_filepath = os.path.normpath(old_filepath), os.path.normpath(new_filepath)
+        new_hash = self.file_hash(new_filepath)
+
+        with self.lock, self.connection:
+            self.connection.execute('DELETE FROM fingerprints WHERE path = ?', (old_filepath,))
+            self.connection.execute('UPDATE OR REPLACE records SET input = ?, input_hash = ? WHERE input = ?',
+                                    (new_filepath, new_hash, old_filepath))
+            self.connection.execute('UPDATE records SET output = ?, output_hash = ? WHERE output = ?',
+                                    (new_filepath, new_hash, old_filepath))
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from .FileManager import FileManager, FORMATS
+
+# Define root and directory paths
+ROOT = 'output'
+EVALUATIONS_DIR = os.path.join(ROOT, 'evaluations')
+INDEX_DIR = os.path.join(ROOT, 'index')
+ANALYSIS_DIR = os.path.join(ROOT, 'analysis')
+NEWSPAPERS_PATH = os.path.join('input', 'selected_newspapers.csv')
+
+# Columns of the evaluation files needed by the index, leaving out the article bodies
+EVALUATION_COLUMNS = ['newspaper', 'article_url', 'mark_socioeconomic', 'mark_democracy']
+MARKS = ['mark_socioeconomic', 'mark_democracy']
+
+# Range of valid marks on both scales
+MIN_MARK = -10
+MAX_MARK = 10
+
+class MarksAnalyzer:
+    """
+    A class to analyze the marks of all evaluations through a compact index.
+
+    The index holds one row per evaluation, with the newspaper, a hash of the article URL, the
+    date, the model and the two marks as int8, but no article text. It is saved as Parquet and
+    updated incrementally: only the evaluation files added or modified since the last update
+    are read.
+    """
+
+    def __init__(self, evaluations_dir=EVALUATIONS_DIR, index_dir=INDEX_DIR, newspapers_path=NEWSPAPERS_PATH):
+        """
+        Initializes the analyzer.
+
+        Parameters:
+        evaluations_dir (str): Directory of the evaluation files, named '<date>_<model>'.
+        index_dir (str): Directory where the index is cached.
+        newspapers_path (str): CSV file mapping newspaper homepages to countries.
+        """
+        self.evaluations_dir = evaluations_dir
+        self.index_path = os.path.join(index_dir, 'marks.parquet')
+        self.sources_path = os.path.join(index_dir, 'marks_sources.json')
+        self.newspapers_path = newspapers_path
+        self.index = None
+
+    @staticmethod
+    def url_hash(urls):
+        """
+        Hashes article URLs into 64-bit integers.
+
+        Parameters:
+        urls (pd.Series): The article URLs.
+
+        Returns:
+        np.ndarray: The hashes, as int64.
+        """
+        return np.array([int.from_bytes(hashlib.sha256(url.encode('utf-8')).digest()[:8], 'little', signed=True)
+                         for url in urls.astype(str)], dtype=np.int64)
+
+    def index_file(self, filename):
+        """
+        Loads the marks of one evaluation file into index rows.
+
+        Parameters:
+        filename (str): Name of the file, '<date>_<model>.<extension>'.
+
+        Returns:
+        pd.DataFrame: The index rows of the file.
+        """
+        date, model = os.path.splitext(filename)[0].split('_', 1)
+        df = FileManager.read_file(os.path.join(self.evaluations_dir, filename), columns=EVALUATION_COLUMNS)
+
+        # Skip rows whose marks were not saved as integers within the scales, which the int8
+        # cast would otherwise truncate or wrap around
+        marks = df[MARKS].apply(pd.to_numeric, errors='coerce')
+        valid = (marks.notna() & marks.eq(marks.round()) & marks.ge(MIN_MARK) & marks.le(MAX_MARK)).all(axis=1)
+        df, marks = df[valid], marks[valid]
+
+        return pd.DataFrame({
+            'newspaper': df['newspaper'].str.strip().values,
+            'url_hash': self.url_hash(df['article_url']),
+            'date': date,
+            'model': model,
+            'mark_socioeconomic': marks['mark_socioeconomic'].astype(np.int8).values,
+            'mark_democracy': marks['mark_democracy'].astype(np.int8).values,
+            'source': filename,
+        })
+
+    @staticmethod
+    def compact(index):
+        """
+        Stores the repeated text columns of the index as categories.
+
+        Parameters:
+        index (pd.DataFrame): The index.
+
+        Returns:
+        pd.DataFrame: The compacted index.
+        """
+        return index.astype({'newspaper': 'category', 'date': 'category', 'model': 'category', 'source': 'category'})
+
+    def update(self):
+        """
+        Brings the index up to date with the evaluation files, reading only the files added or
+        modified since the last update and dropping the rows of removed files.
+
+        Returns:
+        pd.DataFrame: The index.
+        """
+        if os.path.exists(self.sources_path) and os.path.exists(self.index_path):
+            with open(self.sources_path, 'r') as sources_file:
+                sources = json.load(sources_file)
+            index = FileManager.read_file(self.index_path)
+        else:
+            sources = {}
+            index = None
+
+        # Fingerprint every evaluation file by size and modification time
+        current = {}
+        for filename in FileManager.list_files(self.evaluations_dir):
+            base, extension = os.path.splitext(filename)
+            if extension.lstrip('.') in FORMATS and '_' in base:
+                stat = os.stat(os.path.join(self.evaluations_dir, filename))
+                current[filename] = [stat.st_size, stat.st_mtime_ns]
+
+        changed = [filename for filename in sorted(current) if sources.get(filename) != current[filename]]
+        removed = [filename for filename in sources if filename not in current]
+
+        if index is not None and not changed and not removed:
+            self.index = index
+            return index
+
+        frames = [self.index_file(filename) for filename in changed]
+        if index is not None:
+            frames.insert(0, index[~index['source'].isin(changed + removed)].astype(
+                {'newspaper': str, 'date': str, 'model': str, 'source': str}))
+        index = self.compact(pd.concat(frames, ignore_index=True)) if frames else None
+        print(f"Marks index: {len(changed)} files indexed, {len(removed)} removed")
+
+        if index is not None:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            FileManager.write_file(self.index_path, index)
+            temporary_path = f'{self.sources_path}.tmp'
+            with open(temporary_path, 'w') as sources_file:
+                json.dump(current, sources_file, indent=4)
+            os.replace(temporary_path, self.sources_path)
+
+        self.index = index
+        return index
+
+    def countries(self):
+        """
+        Loads the country of every newspaper.
+
+        Returns:
+        pd.Series: The countries indexed by newspaper homepage.
+        """
+        newspapers = pd.read_csv(self.newspapers_path)
+        return pd.Series(newspapers['country'].values, index=newspapers['homepage'].str.strip())
+
+    def centroids(self, by='newspaper'):
+        """
+        Computes the mean marks of every newspaper or country, for every model.
+
+        Parameters:
+        by (str): 'newspaper' or 'country'.
+
+        Returns:
+        pd.DataFrame: The number of evaluations and mean marks per group and model.
+        """
+        index = self.index
+        if by == 'country':
+            index = index.assign(country=index['newspaper'].astype(str).map(self.countries()))
+
+        grouped = index.groupby([by, 'model'], observed=True)[MARKS]
+        centroids = grouped.mean()
+        centroids.insert(0, 'count', grouped.size())
+        return centroids.reset_index()
+
+    def model_correlation(self, mark='mark_socioeconomic', level='newspaper'):
+        """
+        Computes the correlation matrix of the marks given by the models.
+
+        Parameters:
+        mark (str): 'mark_socioeconomic' or 'mark_democracy'.
+        level (str): 'newspaper' to correlate the mean marks of the newspapers, or 'article' to
+        correlate the marks of the articles evaluated by several models on the same day.
+
+        Returns:
+        pd.DataFrame: The Pearson correlation between every pair of models.
+        """
+        keys = ['newspaper'] if level == 'newspaper' else ['date', 'newspaper', 'url_hash']
+        table = self.index.pivot_table(index=keys, columns='model', values=mark, aggfunc='mean', observed=True)
+        return table.corr()
+
+    def bootstrap(self, by='newspaper', n_resamples=1000, confidence=0.95, seed=0):
+        """
+        Estimates bootstrap confidence intervals of the mean marks of every group and model.
+        For each group, all resamples are drawn at once as one matrix of indices.
+
+        Parameters:
+        by (str): 'newspaper' or 'country'.
+        n_resamples (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the intervals.
+        seed (int): Seed of the resampling, for reproducible intervals.
+
+        Returns:
+        pd.DataFrame: The mean and interval bounds of both marks per group and model.
+        """
+        rng = np.random.default_rng(seed)
+        index = self.index
+        if by == 'country':
+            index = index.assign(country=index['newspaper'].astype(str).map(self.countries()))
+
+        lower, upper = (1 - confidence) / 2, (1 + confidence) / 2
+        rows = []
+        for (group, model), df in index.groupby([by, 'model'], observed=True):
+            marks = df[MARKS].to_numpy(dtype=np.float64)
+            samples = rng.integers(0, len(marks), size=(n_resamples, len(marks)))
+            means = marks[samples].mean(axis=1)
+            low, high = np.quantile(means, [lower, upper], axis=0)
+
+            row = {by: group, 'model': model, 'count': len(marks)}
+            for i, mark in enumerate(MARKS):
+                row[mark] = marks[:, i].mean()
+                row[f'{mark}_low'] = low[i]
+                row[f'{mark}_high'] = high[i]
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def drift(self):
+        """
+        Computes the day-over-day change of the mean marks of every newspaper and model.
+
+        Returns:
+        pd.DataFrame: The mean marks per newspaper, model and date, with their change since
+        the previous date.
+        """
+        daily = self.index.groupby(['newspaper', 'model', 'date'], observed=True)[MARKS].mean().reset_index()
+        daily = daily.sort_values(['newspaper', 'model', 'date'])
+        changes = daily.groupby(['newspaper', 'model'], observed=True)[MARKS].diff()
+        return daily.join(changes.add_suffix('_change'))
+
+    def analyze(self, output_dir=ANALYSIS_DIR):
+        """
+        Updates the index and saves every analysis as a CSV file.
+
+        Parameters:
+        output_dir (str): Directory of the analysis files.
+        """
+        if self.update() is None:
+            print("No evaluations to analyze")
+            return
+
+        os.makedirs(output_dir, exist_ok=True)
+        analyses = {
+            'centroids_newspaper': self.centroids('newspaper'),
+            'centroids_country': self.centroids('country'),
+            'bootstrap_newspaper': self.bootstrap('newspaper'),
+            'bootstrap_country': self.bootstrap('country'),
+            'drift': self.drift(),
+        }
+        for mark in MARKS:
+            for level in ('newspaper', 'article'):
+                analyses[f'correlation_{mark}_{level}'] = self.model_correlation(mark, level)
+
+        for name, df in analyses.items():
+            df.to_csv(os.path.join(output_dir, f'{name}.csv'), index=name.startswith('correlation'))
+
+        print(f"{len(self.index)} evaluations from {self.index['source'].nunique()} files analyzed")
+        for mark in MARKS:
+            print(f"Model correlation of {mark} (newspaper means):")
+            print(analyses[f'correlation_{mark}_newspaper'].round(2).to_string())
@@ -0,0 +1,283 @@
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Define root and directory paths
+ROOT = 'output'
+REPORTS_DIR = os.path.join(ROOT, 'reports')
+
+# Upper bounds in seconds of the latency histogram buckets
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Profilers that can be attached to the stages
+PROFILERS = ('cprofile', 'pyinstrument')
+
+class Metrics:
+    """
+    A class to collect the metrics of a run: stage timers, latency histograms, counters
+    (retries, failures, unparseable outputs, tokens...) and gauges.
+
+    Metric names are dotted, e.g. 'http.article' or 'llm.gpt-4.retries'. The collected metrics
+    are written as a JSON and a CSV report, and every stage can optionally be profiled.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, profiler=None):
+        """
+        Initializes an empty registry.
+
+        Parameters:
+        profiler (str): If given, 'cprofile' or 'pyinstrument', the profiler run on every stage.
+        """
+        self.lock = threading.Lock()
+        self.started = datetime.now()
+        self.set_profiler(profiler)
+        self.reset()
+
+    def set_profiler(self, profiler):
+        """
+        Sets the profiler run on every stage. Profilers only sample the thread running the
+        stage, not its worker threads or processes.
+
+        Parameters:
+        profiler (str): 'cprofile', 'pyinstrument' or None to disable profiling.
+        """
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unsupported profiler: {profiler}")
+        self.profiler = profiler
+
+    @classmethod
+    def shared(cls):
+        """
+        Returns the registry of the current process, creating it on first use.
+
+        Returns:
+        Metrics: The shared registry.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def reset(self):
+        """
+        Discards all collected metrics.
+        """
+        with self.lock:
+            self.stages = {}
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+
+    def observe(self, name, value):
+        """
+        Adds a sample, such as a request latency in seconds, to a histogram.
+
+        Parameters:
+        name (str): Name of the histogram.
+        value (float): The sample.
+        """
+        with self.lock:
+            self.histograms.setdefault(name, []).append(value)
+
+    def increment(self, name, count=1):
+        """
+        Increments a counter.
+
+        Parameters:
+        name (str): Name of the counter.
+        count (int): Amount added to the counter.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + count
+
+    def gauge(self, name, value):
+        """
+        Sets a gauge, a metric holding its last value.
+
+        Parameters:
+        name (str): Name of the gauge.
+        value (float): The value.
+        """
+        with self.lock:
+            self.gauges[name] = value
+
+    @contextmanager
+    def timer(self, name):
+        """
+        Measures the duration of a block into a histogram.
+
+        Parameters:
+        name (str): Name of the histogram.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measures the duration of a pipeline stage, profiling it if a profiler is set.
+
+        Parameters:
+        name (str): Name of the stage.
+        """
+        profiler = self.start_profiler()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            if profiler is not None:
+                self.save_profile(profiler, name)
+
+    def start_profiler(self):
+        """
+        Starts the configured profiler, if any.
+
+        Returns:
+        The running profiler, or None.
+        """
+        if self.profiler == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+
+        if self.profiler == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                raise ImportError("Profiling with pyinstrument requires the pyinstrument package")
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+
+        return None
+
+    def save_profile(self, profiler, name):
+        """
+        Stops a profiler and saves its profile next to the reports.
+
+        Parameters:
+        profiler: The running profiler.
+        name (str): Name of the profiled stage.
+        """
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        base = os.path.join(REPORTS_DIR, f"{self.started.strftime('%Y-%m-%dT%H%M%S')}_{name}")
+
+        if self.profiler == 'cprofile':
+            profiler.disable()
+            profiler.dump_stats(f'{base}.prof')
+        else:
+            profiler.stop()
+            with open(f'{base}.html', 'w') as profile_file:
+                profile_file.write(profiler.output_html())
+
+    def snapshot(self):
+        """
+        Returns the raw collected metrics, e.g. to merge those of a worker process.
+
+        Returns:
+        dict: The stages, histograms, counters and gauges.
+        """
+        with self.lock:
+            return {'stages': dict(self.stages),
+                    'histograms': {name: list(samples) for name, samples in self.histograms.items()},
+                    'counters': dict(self.counters),
+                    'gauges': dict(self.gauges)}
+
+    def merge(self, snapshot):
+        """
+        Adds the metrics collected by another registry, e.g. in a worker process.
+
+        Parameters:
+        snapshot (dict): The metrics returned by snapshot().
+        """
+        with self.lock:
+            for name, elapsed in snapshot['stages'].items():
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+            for name, samples in snapshot['histograms'].items():
+                self.histograms.setdefault(name, []).extend(samples)
+            for name, count in snapshot['counters'].items():
+                self.counters[name] = self.counters.get(name, 0) + count
+            self.gauges.update(snapshot['gauges'])
+
+    @staticmethod
+    def summarize(samples):
+        """
+        Summarizes the samples of a histogram.
+
+        Parameters:
+        samples (list): The samples.
+
+        Returns:
+        dict: Count, total, mean, percentiles, maximum and bucket counts of the samples.
+        """
+        ordered = sorted(samples)
+        count = len(ordered)
+
+        def percentile(p):
+            return ordered[min(count - 1, int(p * count))]
+
+        buckets = {f'le_{bound}': sum(1 for sample in ordered if sample <= bound) for bound in BUCKETS}
+        return {'count': count, 'total': sum(ordered), 'mean': sum(ordered) / count,
+                'p50': percentile(0.5), 'p90': percentile(0.9), 'p99': percentile(0.99),
+                'max': ordered[-1], 'buckets': buckets}
+
+    def report(self):
+        """
+        Builds the report of the run.
+
+        Returns:
+        dict: The stage durations, histogram summaries, counters and gauges.
+        """
+        snapshot = self.snapshot()
+        return {'started': self.started.isoformat(timespec='seconds'),
+                'stages': snapshot['stages'],
+                'histograms': {name: self.summarize(samples)
+                               for name, samples in sorted(snapshot['histograms'].items()) if samples},
+                'counters': dict(sorted(snapshot['counters'].items())),
+                'gauges': snapshot['gauges']}
+
+    def save_report(self, name):
+        """
+        Writes the report of the run as JSON, and as CSV with one row per metric.
+
+        Parameters:
+        name (str): Name of the run, e.g. the action of the command line.
+
+        Returns:
+        str: Path of the JSON report.
+        """
+        report = self.report()
+        os.makedirs(REPORTS_DIR, exist_ok=True)
+        base = os.path.join(REPORTS_DIR, f"{self.started.strftime('%Y-%m-%dT%H%M%S')}_{name}")
+
+        with open(f'{base}.json', 'w') as report_file:
+            json.dump(report, report_file, indent=4)
+
+        columns = ['kind', 'name', 'value', 'count', 'total', 'mean', 'p50', 'p90', 'p99', 'max']
+        with open(f'{base}.csv', 'w', newline='') as report_file:
+            writer = csv.DictWriter(report_file, fieldnames=columns, extrasaction='ignore')
+            writer.writeheader()
+            for stage, elapsed in report['stages'].items():
+                writer.writerow({'kind': 'stage', 'name': stage, 'value': elapsed})
+            for histogram, summary in report['histograms'].items():
+                writer.writerow({'kind': 'histogram', 'name': histogram, **summary})
+            for counter, count in report['counters'].items():
+                writer.writerow({'kind': 'counter', 'name': counter, 'value': count})
+            for gauge, value in report['gauges'].items():
+                writer.writerow({'kind': 'gauge', 'name': gauge, 'value': value})
+
+        return f'{base}.json'
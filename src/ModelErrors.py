@@ -0,0 +1,5 @@
+class TransientModelError(Exception):
+    """
+    Raised by model backends when a query failed for a transient reason, such as a
+    rate limit (HTTP 429) or a server error (HTTP 5xx), and may succeed if retried.
+    """
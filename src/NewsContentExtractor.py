@@ -1,26 +1,81 @@
-import pandas as pd
 import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 from .FileManager import FileManager
-from newspaper import Article
+from .Manifest import Manifest
+from .Metrics import Metrics
+from .ArticleIndex import ArticleIndex
+from .StreamingCsvWriter import StreamingCsvWriter
+import requests
+from newspaper import Article, Config
 
 # Define root and directory paths
 ROOT = 'output'
 INPUT_DIR = os.path.join(ROOT, 'cleaned_urls')
 OUTPUT_DIR = os.path.join(ROOT, 'articles')
 
+def parse_article_html(url, html):
+    """
+    Parses the content of a news article from its already downloaded HTML.
+    Defined at module level so that it can be run in a worker process.
+
+    Parameters:
+    url (str): The URL of the news article.
+    html (str or bytes): The downloaded HTML of the article page. Bytes are decoded by the
+    parser according to the page's <meta> charset.
+
+    Returns:
+    str: The extracted article text.
+    """
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+    return article.text
+
 class NewsContentExtractor:
     """
     A class to extract news articles from URLs and save them to CSV files.
     """
-    
+
+    def __init__(self, download_workers=16, parse_workers=None, max_pending=64, chunk_size=50,
+                 index=None, refetch=False, http_cache=None):
+        """
+        Initializes the extractor.
+
+        Parameters:
+        download_workers (int): Number of threads downloading article pages.
+        parse_workers (int): Number of processes parsing downloaded pages. Defaults to the CPU count.
+        max_pending (int): Maximum number of articles held between the download and parse stages.
+        chunk_size (int): Number of extracted articles buffered before they are appended to disk.
+        index (ArticleIndex): Index of the articles downloaded on previous days. Defaults to the
+        index in the output directory.
+        refetch (bool): If True, known articles are downloaded again and their content refreshed.
+        http_cache (HttpCache): If given, article pages are downloaded through this cache, so that
+        refetched pages are only transferred again if they changed.
+        """
+        self.download_workers = download_workers
+        self.parse_workers = parse_workers or os.cpu_count()
+        self.max_pending = max_pending
+        self.chunk_size = chunk_size
+        self.index = index if index is not None else ArticleIndex()
+        self.refetch = refetch
+        self.http_cache = http_cache
+        
+        # Send the same headers as newspaper's own downloads
+        config = Config()
+        self.timeout = config.request_timeout
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = config.browser_user_agent
+
     @staticmethod
     def extract_article_from_url(url):
         """
         Extracts the content of a news article from a given URL.
-        
+
         Parameters:
         url (str): The URL of the news article.
-        
+
         Returns:
         str: The extracted article text.
         """
@@ -28,26 +83,165 @@ class NewsContentExtractor:
         article.download()
         article.parse()
         return article.text
-    
+
+    @staticmethod
+    def download_article_html(url):
+        """
+        Downloads the HTML of a news article.
+
+        Parameters:
+        url (str): The URL of the news article.
+
+        Returns:
+        str: The downloaded HTML.
+
+        Raises:
+        ValueError: If the article could not be downloaded.
+        """
+        article = Article(url)
+        with Metrics.shared().timer('http.article'):
+            article.download()
+        if not article.html:
+            raise ValueError(article.download_exception_msg or "Empty response")
+        return article.html
+
+    def download_cached_article_html(self, url):
+        """
+        Downloads the HTML of a news article through the HTTP cache.
+        
+        Parameters:
+        url (str): The URL of the news article.
+        
+        Returns:
+        str or bytes: The downloaded HTML, decoded if the server declared its charset.
+        
+        Raises:
+        ValueError: If the article page is empty.
+        """
+        with Metrics.shared().timer('http.article'):
+            page = self.http_cache.fetch(self.session, url, timeout=self.timeout)
+        if not page['content']:
+            raise ValueError("Empty response")
+        if page['encoding']:
+            return page['content'].decode(page['encoding'], errors='replace')
+        return page['content']
+
+    def submit_article(self, download_pool, parse_pool, url):
+        """
+        Submits an article to the download pool and chains its parsing onto the parse pool
+        as soon as the page arrives. Articles downloaded on a previous day are taken from the
+        index instead.
+
+        Parameters:
+        download_pool (ThreadPoolExecutor): Pool downloading article pages.
+        parse_pool (ProcessPoolExecutor): Pool parsing downloaded pages.
+        url (str): The URL of the news article.
+
+        Returns:
+        Future: Resolves to the article text, or to the exception raised.
+        """
+        result = Future()
+        metrics = Metrics.shared()
+
+        # Reuse the content of an article already downloaded on a previous day
+        if not self.refetch:
+            text = self.index.get(url)
+            if text is not None:
+                metrics.increment('articles.reused')
+                result.set_result(text)
+                return result
+
+        def on_parsed(parse_future, submitted):
+            # Time spent waiting for and running in the parse pool
+            metrics.observe('parse.article', time.perf_counter() - submitted)
+            try:
+                text = parse_future.result()
+                if text:
+                    self.index.put(url, text)
+                result.set_result(text)
+            except Exception as e:
+                metrics.increment('parse.article.failures')
+                result.set_exception(e)
+
+        def on_downloaded(download_future):
+            try:
+                html = download_future.result()
+                submitted = time.perf_counter()
+                parse_pool.submit(parse_article_html, url, html).add_done_callback(
+                    lambda parse_future: on_parsed(parse_future, submitted))
+            except Exception as e:
+                metrics.increment('http.article.failures')
+                result.set_exception(e)
+
+        download = self.download_article_html if self.http_cache is None else self.download_cached_article_html
+        download_pool.submit(download, url).add_done_callback(on_downloaded)
+        return result
+
+    def extract_articles(self, rows):
+        """
+        Downloads and parses articles through a staged pipeline: pages are downloaded by a
+        thread pool and handed over to a process pool for parsing. At most max_pending
+        articles are in flight at once, so downloads never run far ahead of parsing.
+
+        Parameters:
+        rows (iterable): Pairs of (newspaper, article URL).
+
+        Yields:
+        tuple: (newspaper, article URL, article text or the exception raised), in input order.
+        """
+        with ThreadPoolExecutor(max_workers=self.download_workers) as download_pool, \
+                ProcessPoolExecutor(max_workers=self.parse_workers) as parse_pool:
+
+            def collect(pending):
+                newspaper, url, result = pending.popleft()
+                try:
+                    return newspaper, url, result.result()
+                except Exception as e:
+                    return newspaper, url, e
+
+            pending = deque()
+            for newspaper, url in rows:
+                pending.append((newspaper, url, self.submit_article(download_pool, parse_pool, url)))
+
+                # Apply backpressure by waiting for the oldest article once the window is full
+                if len(pending) >= self.max_pending:
+                    yield collect(pending)
+
+            while pending:
+                yield collect(pending)
+
     def extract_all_articles(self):
         """
         Extracts articles from URLs in the input directory and saves them to the output directory.
+        Articles are written to disk in chunks as they are extracted, and an interrupted file is
+        resumed after its last flushed article.
         """
-        cleaned_articles_files = FileManager.select_missing_files(INPUT_DIR, OUTPUT_DIR)
-        articles = []
+        cleaned_articles_files = FileManager.select_missing_files(INPUT_DIR, OUTPUT_DIR, stage='extract_articles')
         
         for f in cleaned_articles_files:
             filepath = os.path.join(INPUT_DIR, f)
-            df = pd.read_csv(filepath)
+            df = FileManager.read_file(filepath)
             
-            for _, row in df.iterrows():
-                print(row['articles'])
-                try:
-                    article_content = self.extract_article_from_url(row['articles'])
-                    articles.append([row['newspaper'], row['articles'], article_content])
-                except Exception as e:
-                    print(f"Error extracting article from {row['articles']}: {e}")
-                
-            # Convert the list of articles to a DataFrame and save it
-            articles_df = pd.DataFrame(articles, columns=['newspaper', 'article_url', 'article_content'])
-            FileManager.save_file(f, 'articles', 'csv', OUTPUT_DIR, articles_df)
\ No newline at end of file
+            output_filepath = os.path.join(OUTPUT_DIR, FileManager.output_filename(f, 'articles', FileManager.storage_format))
+            writer = StreamingCsvWriter(output_filepath, ['newspaper', 'article_url', 'article_content'],
+                                        chunk_size=self.chunk_size)
+            
+            # Skip the articles already flushed by an interrupted run
+            done_urls = writer.written_values('article_url')
+            rows = [(newspaper, url) for newspaper, url in zip(df['newspaper'], df['articles'])
+                    if url not in done_urls]
+            
+            written = len(done_urls)
+            for newspaper, url, article_content in self.extract_articles(rows):
+                print(url)
+                if isinstance(article_content, Exception):
+                    print(f"Error extracting article from {url}: {article_content}")
+                else:
+                    writer.write([newspaper, url, article_content])
+                    written += 1
+            
+            writer.close()
+            Manifest.shared().record('extract_articles', filepath, output_filepath, rows=written)
+        
+        stats = self.index.stats()
+        print(f"Article index: {stats['hits']} articles reused, {stats['misses']} downloaded")
@@ -0,0 +1,218 @@
+import json
+import math
+import re
+import threading
+from .Metrics import Metrics
+
+# Range of valid marks on both scales
+MIN_MARK = -10
+MAX_MARK = 10
+
+# A mark as written by the models, possibly with a typographic minus, spaces or decimals
+NUMBER = r'[-−–]?\s*\d+(?:\.\d+)?'
+
+# A pair of marks between brackets or parentheses, e.g. '[3, -2]', '[3,-2]' or '(3; -2)'
+PAIR = re.compile(rf'[\[(]\s*({NUMBER})\s*[,;/]\s*({NUMBER})\s*[\])]')
+
+# Marks introduced by the names of the scales, e.g. 'Economic Scale: 3, Democracy Scale: -2'
+LABELLED = re.compile(rf'econom[a-z ]*?[:=]\s*({NUMBER}).*?democra[a-z ]*?[:=]\s*({NUMBER})', re.IGNORECASE | re.DOTALL)
+
+# A numbered pair of marks of a packed query's output, e.g. '2: [3, -2]'
+PACKED_PAIR = re.compile(rf'^\W*(\d+)\W*?[:.)-]\s*[\[(]\s*({NUMBER})\s*[,;]\s*({NUMBER})\s*[\])]', re.MULTILINE)
+
+# A JSON object within other text, and the Markdown code block wrapping a JSON output
+JSON_OBJECT = re.compile(r'\{.*?\}', re.DOTALL)
+CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+class OutputParser:
+    """
+    A class to extract the marks from the outputs of every model, and to track how many
+    outputs could not be parsed.
+
+    Outputs are parsed tolerantly: JSON objects or lists, marks labelled with the names of
+    the scales and bracketed pairs with any spacing are accepted, and only marks within
+    -10 to 10 are kept.
+    """
+
+    def __init__(self, model_name):
+        """
+        Initializes the counters of a model.
+
+        Parameters:
+        model_name (str): Name of the model whose outputs are parsed.
+        """
+        self.model_name = model_name
+        self.counts = {'parsed': 0, 'repaired': 0, 'unparseable': 0}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def to_mark(value):
+        """
+        Converts a mark written by a model to an integer within the range of the scales.
+
+        Parameters:
+        value: The mark, as a number or a string.
+
+        Returns:
+        int: The mark, rounded half up to the nearest integer, or None if it is not a number or out of range.
+        """
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, str):
+            value = re.sub(r'\s', '', value).replace('−', '-').replace('–', '-')
+        try:
+            mark = math.floor(float(value) + 0.5)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return mark if MIN_MARK <= mark <= MAX_MARK else None
+
+    @staticmethod
+    def parse_json(text):
+        """
+        Extracts the marks of an output in JSON, e.g. {"economic": 3, "democracy": -2} or [3, -2].
+
+        Parameters:
+        text (str): The model's output.
+
+        Returns:
+        list: The marks, or None if the output holds no valid JSON marks.
+        """
+        candidates = [CODE_FENCE.sub('', text.strip())] + JSON_OBJECT.findall(text)
+        for candidate in candidates:
+            try:
+                value = json.loads(candidate)
+            except ValueError:
+                continue
+
+            if isinstance(value, dict):
+                economic = next((v for k, v in value.items() if 'econ' in k.lower()), None)
+                democracy = next((v for k, v in value.items() if 'democ' in k.lower()), None)
+                value = [economic, democracy]
+            if isinstance(value, list) and len(value) == 2:
+                marks = [OutputParser.to_mark(v) for v in value]
+                if None not in marks:
+                    return marks
+        return None
+
+    @staticmethod
+    def parse(text):
+        """
+        Extracts the marks from a model's output.
+
+        Parameters:
+        text (str): The model's output.
+
+        Returns:
+        list: The economic and democracy marks, as integers from -10 to 10.
+
+        Raises:
+        ValueError: If the output holds no valid pair of marks.
+        """
+        if not isinstance(text, str):
+            raise ValueError("The output of the model is empty")
+
+        marks = OutputParser.parse_json(text)
+        if marks is not None:
+            return marks
+
+        # Labelled marks are more explicit than bare pairs, which may quote the scale
+        for pattern in (LABELLED, PAIR):
+            pairs = [[OutputParser.to_mark(group) for group in match.groups()] for match in pattern.finditer(text)]
+            pairs = [pair for pair in pairs if None not in pair]
+
+            # Drop the bounds of the scale echoed from the instructions, unless they are the only answer
+            answers = [pair for pair in pairs if pair != [MIN_MARK, MAX_MARK]] or pairs
+
+            # A model revising its answer ends with its final marks
+            if answers:
+                return answers[-1]
+
+        raise ValueError(f"No valid marks in the output of the model: {text[:100]!r}")
+
+    @staticmethod
+    def is_well_formed(text):
+        """
+        Checks whether marks can be extracted from a model's output.
+
+        Parameters:
+        text (str): The model's output.
+
+        Returns:
+        bool: True if the output holds a valid pair of marks.
+        """
+        try:
+            OutputParser.parse(text)
+            return True
+        except ValueError:
+            return False
+
+    @staticmethod
+    def can_repair(text):
+        """
+        Tells whether a malformed output is worth a re-ask, i.e. whether it holds numbers that
+        may be marks written in another format, rather than a refusal.
+
+        Parameters:
+        text (str): The model's output.
+
+        Returns:
+        bool: True if the output holds at least two numbers.
+        """
+        return isinstance(text, str) and len(re.findall(r'\d+', text)) >= 2
+
+    @staticmethod
+    def parse_packed(text, count):
+        """
+        Extracts the numbered marks of a packed query's output.
+
+        Parameters:
+        text (str): The model's output.
+        count (int): Number of articles in the packed query.
+
+        Returns:
+        list: For each article, its marks, or None if they are missing, out of range or ambiguous.
+        """
+        marks = [None] * count
+        seen = set()
+
+        for match in PACKED_PAIR.finditer(text):
+            number = int(match.group(1))
+            pair = [OutputParser.to_mark(match.group(2)), OutputParser.to_mark(match.group(3))]
+            if not 1 <= number <= count or None in pair:
+                continue
+
+            # An article answered twice is ambiguous and evaluated again on its own
+            if number in seen:
+                marks[number - 1] = None
+                continue
+            seen.add(number)
+            marks[number - 1] = pair
+
+        return marks
+
+    def record(self, outcome, count=1):
+        """
+        Counts the outcome of parsing fresh outputs of the model.
+
+        Parameters:
+        outcome (str): 'parsed', 'repaired' (parsed after a re-ask) or 'unparseable'.
+        count (int): Number of outputs.
+        """
+        if count:
+            with self.lock:
+                self.counts[outcome] += count
+            Metrics.shared().increment(f'llm.{self.model_name}.{outcome}', count)
+
+    def stats(self):
+        """
+        Returns the parsing statistics of the model.
+
+        Returns:
+        dict: The number of parsed, repaired and unparseable outputs, and the fraction of
+        outputs that could not be parsed.
+        """
+        with self.lock:
+            stats = dict(self.counts)
+        total = sum(stats.values())
+        stats['failure_rate'] = stats['unparseable'] / total if total else 0.0
+        return stats
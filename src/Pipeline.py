@@ -0,0 +1,319 @@
+import os
+import queue
+import threading
+import time
+import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait
+from datetime import datetime
+from .FileManager import FileManager
+from .Manifest import Manifest
+from .Metrics import Metrics
+from .StreamingCsvWriter import StreamingCsvWriter
+from .EvaluationJournal import EvaluationJournal
+from .UrlExtractor import UrlExtractor, OUTPUT_DIR as URLS_DIR
+from .UrlsCleaner import UrlsCleaner, OUTPUT_DIR as CLEANED_URLS_DIR
+from .NewsContentExtractor import NewsContentExtractor, OUTPUT_DIR as ARTICLES_DIR
+from .ArticlesCleaner import ArticlesCleaner, OUTPUT_DIR as CLEANED_ARTICLES_DIR
+from .LLMManager import JOURNAL_DIR
+
+# Marks the end of the stream of downloaded newspapers
+DONE = None
+
+class Pipeline:
+    """
+    A class to run the daily stages as one streaming pipeline.
+
+    Every newspaper flows on its own through crawling, URL selection, download and parsing,
+    length filtering and scoring, the stages being linked by bounded queues. The first newspapers
+    are thus scored while others are still being crawled, and the same files as the separate
+    stages are written once the day is done.
+    """
+
+    def __init__(self, managers, url_extractor=None, content_extractor=None, crawl_workers=16,
+                 score_workers=4, queue_size=8, min_length=1000, max_length=5000):
+        """
+        Initializes the pipeline.
+
+        Parameters:
+        managers (list): One LLMManager per model scoring the articles.
+        url_extractor (UrlExtractor): Extractor crawling the homepages.
+        content_extractor (NewsContentExtractor): Extractor downloading and parsing the articles.
+        crawl_workers (int): Number of homepages crawled concurrently.
+        score_workers (int): Number of newspapers filtered and scored concurrently.
+        queue_size (int): Maximum number of newspapers held between crawling and scoring.
+        min_length (int): Minimum length of article content to be scored.
+        max_length (int): Maximum length of article content to be scored.
+        """
+        self.managers = managers
+        self.url_extractor = url_extractor or UrlExtractor()
+        self.content_extractor = content_extractor or NewsContentExtractor()
+        self.urls_cleaner = UrlsCleaner()
+        self.crawl_workers = crawl_workers
+        self.score_workers = score_workers
+        self.queue_size = queue_size
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def crawl(self, homepage):
+        """
+        Crawls a homepage and selects its top articles.
+
+        Parameters:
+        homepage (str): The URL of the newspaper website.
+
+        Returns:
+        tuple: The fetched article URLs and the DataFrame of selected articles, empty if the
+        newspaper has too few articles.
+        """
+        article_urls = self.url_extractor.fetch_article_urls(homepage)
+        return article_urls, self.urls_cleaner.select_top_articles({homepage: article_urls})
+
+    def download(self, selected, download_pool, parse_pool):
+        """
+        Downloads and parses the selected articles of a newspaper.
+
+        Parameters:
+        selected (pd.DataFrame): The selected articles, with 'newspaper' and 'articles' columns.
+        download_pool (ThreadPoolExecutor): Pool downloading article pages.
+        parse_pool (ProcessPoolExecutor): Pool parsing downloaded pages.
+
+        Returns:
+        Future: Resolves once every article is done to the list of (newspaper, article URL,
+        article text or the exception raised), in selection order.
+        """
+        rows = list(zip(selected['newspaper'], selected['articles']))
+        results = [None] * len(rows)
+        remaining = [len(rows)]
+        lock = threading.Lock()
+        newspaper_done = Future()
+
+        def on_article(index, future):
+            newspaper, url = rows[index]
+            try:
+                results[index] = (newspaper, url, future.result())
+            except Exception as e:
+                results[index] = (newspaper, url, e)
+
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                newspaper_done.set_result(results)
+
+        for index, (_, url) in enumerate(rows):
+            future = self.content_extractor.submit_article(download_pool, parse_pool, url)
+            future.add_done_callback(lambda future, index=index: on_article(index, future))
+        return newspaper_done
+
+    def run(self, homepages):
+        """
+        Runs the whole pipeline over the newspaper homepages of the day.
+
+        Parameters:
+        homepages (list): The URLs of the newspaper websites.
+        """
+        date_string = datetime.now().strftime('%Y-%m-%d')
+        storage_format = FileManager.storage_format
+
+        articles_filename = FileManager.output_filename(f'{date_string}_urls.json', 'articles', storage_format)
+
+        articles_writer = StreamingCsvWriter(os.path.join(ARTICLES_DIR, articles_filename),
+                                             ['newspaper', 'article_url', 'article_content'], resume=False)
+        journals = {manager: EvaluationJournal(os.path.join(
+                        JOURNAL_DIR, FileManager.output_filename(articles_filename, manager.model.name(), 'jsonl')))
+                    for manager in self.managers}
+
+        selected_frames = []
+        cleaned_frames = []
+        evaluations = {manager: [] for manager in self.managers}
+        errors = []
+        written = [0]
+        lock = threading.Lock()
+
+        crawled = queue.Queue(maxsize=self.queue_size)
+        downloaded = queue.Queue()
+        slots = threading.Semaphore(self.queue_size)
+        start = time.perf_counter()
+        first_score = []
+        stopped = threading.Event()
+
+        def crawl_stage(homepage):
+            if stopped.is_set():
+                return
+            try:
+                result = (homepage,) + self.crawl(homepage)
+            except Exception as e:
+                result = (homepage, e, None)
+
+            # Stop waiting for room in the queue once the run has failed
+            while not stopped.is_set():
+                try:
+                    crawled.put(result, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def score_stage():
+            while True:
+                rows = downloaded.get()
+                if rows is DONE:
+                    return
+                try:
+                    count = self.score(rows, articles_writer, cleaned_frames, evaluations, journals, lock)
+                    with lock:
+                        written[0] += count
+                        if not first_score and any(evaluations.values()):
+                            first_score.append(time.perf_counter() - start)
+                            Metrics.shared().gauge('pipeline.first_score', first_score[0])
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    slots.release()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.crawl_workers) as crawl_pool, \
+                    ThreadPoolExecutor(max_workers=self.content_extractor.download_workers) as download_pool, \
+                    ProcessPoolExecutor(max_workers=self.content_extractor.parse_workers) as parse_pool, \
+                    ThreadPoolExecutor(max_workers=self.score_workers) as score_pool:
+
+                scorers = [score_pool.submit(score_stage) for _ in range(self.score_workers)]
+                newspapers = []
+                try:
+                    for homepage in homepages:
+                        crawl_pool.submit(crawl_stage, homepage)
+
+                    # Hand the crawled newspapers over to the download stage from this thread only,
+                    # so the URLs file is never written concurrently
+                    for _ in homepages:
+                        homepage, article_urls, selected = crawled.get()
+                        print(homepage)
+                        if isinstance(article_urls, Exception):
+                            print(f"Error processing {homepage}: {article_urls}")
+                            self.url_extractor.log_faulty_url(homepage)
+                            continue
+
+                        self.url_extractor.save_urls_to_json(homepage, article_urls)
+                        if selected.empty:
+                            continue
+                        selected_frames.append(selected)
+
+                        # Wait for a slot, so that downloads never run far ahead of scoring
+                        slots.acquire()
+                        newspaper_done = self.download(selected, download_pool, parse_pool)
+                        newspaper_done.add_done_callback(lambda future: downloaded.put(future.result()))
+                        newspapers.append(newspaper_done)
+
+                    wait(newspapers)
+                except BaseException:
+                    # Release the crawlers waiting on the queue, so that the pools can shut down
+                    stopped.set()
+                    raise
+                finally:
+                    # Stop the scorers on every path, otherwise they wait for newspapers forever
+                    for _ in scorers:
+                        downloaded.put(DONE)
+
+            if errors:
+                raise errors[0]
+
+            self.save(date_string, selected_frames, articles_writer, written[0], cleaned_frames, evaluations, journals)
+        except BaseException:
+            # A truncated articles file must not be published as the day's output, which the manifest
+            # would trust; the article index and the journals keep what the failed run downloaded and scored
+            articles_writer.discard()
+            raise
+
+        stats = self.content_extractor.index.stats()
+        print(f"Article index: {stats['hits']} articles reused, {stats['misses']} downloaded")
+        for manager in self.managers:
+            manager.parse_report()
+        
+        elapsed = time.perf_counter() - start
+        if first_score:
+            print(f"First newspaper scored after {first_score[0]:.2f}s")
+        print(f"{len(selected_frames)} newspapers processed in {elapsed:.2f}s")
+
+    def score(self, rows, articles_writer, cleaned_frames, evaluations, journals, lock):
+        """
+        Saves the downloaded articles of a newspaper, filters them by length and scores them
+        with every model.
+
+        Parameters:
+        rows (list): The (newspaper, article URL, article text or exception) of the newspaper.
+        articles_writer (StreamingCsvWriter): Writer of the day's articles file.
+        cleaned_frames (list): Collects the filtered articles of every newspaper.
+        evaluations (dict): Collects the evaluations of every newspaper by manager.
+        journals (dict): The evaluation journal of every manager.
+        lock (threading.Lock): Lock guarding the writer and the collections.
+
+        Returns:
+        int: Number of articles downloaded.
+        """
+        articles = []
+        for newspaper, url, article_content in rows:
+            print(url)
+            if isinstance(article_content, Exception):
+                print(f"Error extracting article from {url}: {article_content}")
+            else:
+                articles.append([newspaper, url, article_content])
+
+        df = pd.DataFrame(articles, columns=['newspaper', 'article_url', 'article_content'])
+        with lock:
+            for article in articles:
+                articles_writer.write(article)
+
+        with Metrics.shared().timer('clean.articles'):
+            cleaned = ArticlesCleaner.filter_articles(df, self.min_length, self.max_length)
+        with lock:
+            cleaned_frames.append(cleaned)
+        for manager in self.managers:
+            if not cleaned.empty:
+                evals = manager.engine.run(cleaned, journals[manager])
+                with lock:
+                    evaluations[manager].extend(evals)
+        return len(articles)
+
+    def save(self, date_string, selected_frames, articles_writer, articles_count, cleaned_frames, evaluations, journals):
+        """
+        Writes the files of every stage and records them in the manifest.
+
+        Parameters:
+        date_string (str): The date of the run.
+        selected_frames (list): The selected articles of every newspaper.
+        articles_writer (StreamingCsvWriter): Writer of the day's articles file.
+        articles_count (int): Number of articles written.
+        cleaned_frames (list): The filtered articles of every newspaper.
+        evaluations (dict): The evaluations of every newspaper by manager.
+        journals (dict): The evaluation journal of every manager.
+        """
+        storage_format = FileManager.storage_format
+        manifest = Manifest.shared()
+        articles_writer.close()
+        urls_filepath = os.path.join(URLS_DIR, f'{date_string}_urls.json')
+        if not os.path.exists(urls_filepath):
+            return
+
+        # Selected URLs, ordered by newspaper as by the URL cleaning stage
+        selected = pd.concat(selected_frames, ignore_index=True) if selected_frames \
+            else pd.DataFrame(columns=['newspaper', 'articles'])
+        selected = selected.sort_values('newspaper', kind='mergesort').reset_index(drop=True)
+        cleaned_urls_filepath = FileManager.save_file(os.path.basename(urls_filepath), 'cleanedUrls',
+                                                      storage_format, CLEANED_URLS_DIR, selected)
+        manifest.record('clean_urls', urls_filepath, cleaned_urls_filepath, rows=len(selected))
+
+        manifest.record('extract_articles', cleaned_urls_filepath, articles_writer.filepath,
+                        rows=articles_count)
+
+        cleaned = pd.concat(cleaned_frames, ignore_index=True) if cleaned_frames \
+            else pd.DataFrame(columns=['newspaper', 'article_url', 'article_content'])
+        articles_filename = os.path.basename(articles_writer.filepath)
+        cleaned_filepath = FileManager.save_file(articles_filename, 'cleanedArticles', storage_format,
+                                                 CLEANED_ARTICLES_DIR, cleaned)
+        manifest.record('clean_articles', articles_writer.filepath, cleaned_filepath,
+                        {'min_length': self.min_length, 'max_length': self.max_length}, len(cleaned))
+
+        for manager in self.managers:
+            output_filepath = manager.save_results_csv(evaluations[manager], os.path.basename(cleaned_filepath))
+            manifest.record(manager.stage(), cleaned_filepath, output_filepath,
+                            manager.stage_params(), len(evaluations[manager]))
+            journals[manager].remove()
@@ -0,0 +1,135 @@
+import threading
+import time
+from .Metrics import Metrics
+
+class RateLimiter:
+    """
+    A token-bucket rate limiter enforcing requests-per-minute and tokens-per-minute quotas.
+    
+    The allowed rate adapts to the provider: it is halved whenever a call is rate limited
+    and recovers gradually as calls succeed again.
+    """
+
+    # Limiters shared by every user of the same quota
+    _registry = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None, burst_seconds=10, min_scale=0.05):
+        """
+        Initializes the rate limiter.
+        
+        Parameters:
+        requests_per_minute (float): Maximum number of requests per minute.
+        tokens_per_minute (float): Maximum number of tokens per minute, or None for no token quota.
+        burst_seconds (float): Number of seconds' worth of quota that can be spent at once.
+        min_scale (float): Lowest fraction of the quota the adaptive backoff can throttle down to.
+        """
+        self.requests_per_second = requests_per_minute / 60
+        self.tokens_per_second = tokens_per_minute / 60 if tokens_per_minute else None
+        self.request_capacity = max(1.0, self.requests_per_second * burst_seconds)
+        self.token_capacity = self.tokens_per_second * burst_seconds if self.tokens_per_second else None
+        self.min_scale = min_scale
+        
+        # Buckets start full
+        self.request_bucket = self.request_capacity
+        self.token_bucket = self.token_capacity
+        self.scale = 1.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, key, requests_per_minute, tokens_per_minute=None):
+        """
+        Returns the rate limiter shared by all users of a quota, creating it if needed.
+        
+        Parameters:
+        key (str): Name of the quota, such as the model name.
+        requests_per_minute (float): Requests-per-minute quota used if the limiter is created.
+        tokens_per_minute (float): Tokens-per-minute quota used if the limiter is created.
+        
+        Returns:
+        RateLimiter: The shared rate limiter.
+        """
+        with cls._registry_lock:
+            if key not in cls._registry:
+                cls._registry[key] = cls(requests_per_minute, tokens_per_minute)
+            return cls._registry[key]
+
+    def refill(self):
+        """
+        Refills both buckets according to the time elapsed since the last refill.
+        Must be called with the lock held.
+        """
+        now = time.monotonic()
+        elapsed = now - self.updated
+        self.updated = now
+        
+        self.request_bucket = min(self.request_capacity,
+                                  self.request_bucket + elapsed * self.requests_per_second * self.scale)
+        if self.tokens_per_second:
+            self.token_bucket = min(self.token_capacity,
+                                    self.token_bucket + elapsed * self.tokens_per_second * self.scale)
+
+    def acquire(self, tokens=0):
+        """
+        Blocks until one request consuming the given number of tokens is allowed.
+        
+        Parameters:
+        tokens (int): Estimated number of tokens consumed by the request.
+        """
+        start = time.perf_counter()
+        while True:
+            with self.lock:
+                self.refill()
+                
+                # A request larger than the bucket is let through once the bucket is full, and
+                # charged in full, the debt delaying the next requests
+                needed = min(tokens, self.token_capacity) if self.tokens_per_second else 0
+                
+                wait = 0.0
+                if self.request_bucket < 1:
+                    wait = (1 - self.request_bucket) / (self.requests_per_second * self.scale)
+                if self.tokens_per_second and self.token_bucket < needed:
+                    wait = max(wait, (needed - self.token_bucket) / (self.tokens_per_second * self.scale))
+                
+                if wait == 0.0:
+                    self.request_bucket -= 1
+                    if self.tokens_per_second:
+                        self.token_bucket -= tokens
+                    Metrics.shared().observe('ratelimit.wait', time.perf_counter() - start)
+                    return
+            
+            time.sleep(wait)
+
+    def settle(self, estimated, actual):
+        """
+        Corrects the token bucket once the tokens actually consumed by a request are known,
+        refunding an overestimate or charging an underestimate.
+        
+        Parameters:
+        estimated (int): Number of tokens acquired for the request.
+        actual (int): Number of tokens billed by the provider.
+        """
+        if not self.tokens_per_second:
+            return
+        with self.lock:
+            self.refill()
+            # The bucket may go negative, delaying the next requests until the debt is refilled
+            self.token_bucket -= actual - estimated
+            self.token_bucket = min(self.token_capacity, self.token_bucket)
+
+    def penalize(self):
+        """
+        Halves the allowed rate after the provider rejected a call as rate limited or overloaded.
+        """
+        with self.lock:
+            self.refill()
+            self.scale = max(self.min_scale, self.scale / 2)
+
+    def reward(self):
+        """
+        Gradually restores the allowed rate after a successful call.
+        """
+        with self.lock:
+            self.refill()
+            self.scale = min(1.0, self.scale + 0.05)
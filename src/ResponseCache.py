@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from .Metrics import Metrics
+
+# Define root and cache paths
+ROOT = 'output'
+CACHE_PATH = os.path.join(ROOT, 'cache', 'responses.sqlite')
+
+# Default maximum number of cached responses, well above a year of daily evaluations
+MAX_ENTRIES = 1000000
+
+class ResponseCache:
+    """
+    A persistent cache of model responses, addressed by a hash of the model name,
+    the prompt template and the article content.
+    
+    Both the raw output and the parsed marks are stored, so outputs that could not be
+    parsed are kept too and never paid for twice.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_entries=MAX_ENTRIES, max_age_days=None, bypass=False):
+        """
+        Opens the cache and evicts expired entries.
+        
+        Parameters:
+        path (str): Path of the SQLite database holding the cache.
+        max_entries (int): Maximum number of entries kept; the least recently used are evicted.
+        None keeps every entry.
+        max_age_days (float): Maximum age of an entry in days. None keeps entries of any age.
+        bypass (bool): If True, lookups always miss, but fresh responses are still stored.
+        """
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                '''CREATE TABLE IF NOT EXISTS responses (
+                       key TEXT PRIMARY KEY,
+                       model TEXT,
+                       output TEXT,
+                       marks TEXT,
+                       created REAL,
+                       accessed REAL)'''
+            )
+        self.evict()
+
+    @staticmethod
+    def key(model_name, prompt_template, article):
+        """
+        Computes the cache key of a query.
+        
+        Parameters:
+        model_name (str): Name of the queried model.
+        prompt_template (str): The instructions preceding the article.
+        article (str): The article content.
+        
+        Returns:
+        str: The hexadecimal SHA-256 digest of the three parts.
+        """
+        digest = hashlib.sha256()
+        for part in (model_name, prompt_template, article):
+            digest.update(part.encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a cached response.
+        
+        Parameters:
+        key (str): The cache key.
+        
+        Returns:
+        dict: The cached 'output' and 'marks' (None if the output could not be parsed),
+        or None on a miss.
+        """
+        if self.bypass:
+            with self.lock:
+                self.misses += 1
+            Metrics.shared().increment('cache.misses')
+            return None
+        
+        with self.lock, self.connection:
+            row = self.connection.execute('SELECT output, marks FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                Metrics.shared().increment('cache.misses')
+                return None
+            
+            self.hits += 1
+            Metrics.shared().increment('cache.hits')
+            self.connection.execute('UPDATE responses SET accessed = ? WHERE key = ?', (time.time(), key))
+        
+        output, marks = row
+        return {'output': output, 'marks': json.loads(marks) if marks else None}
+
+    def put(self, key, model_name, output, marks):
+        """
+        Stores a response in the cache.
+        
+        Parameters:
+        key (str): The cache key.
+        model_name (str): Name of the queried model.
+        output (str): The raw output of the model.
+        marks (list): The parsed marks, or None if the output could not be parsed.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (key, model_name, output, json.dumps(marks) if marks is not None else None, now, now)
+            )
+
+    def evict(self):
+        """
+        Removes entries older than the maximum age, then the least recently used entries
+        beyond the maximum number of entries.
+        """
+        with self.lock, self.connection:
+            if self.max_age_days is not None:
+                cutoff = time.time() - self.max_age_days * 86400
+                self.connection.execute('DELETE FROM responses WHERE created < ?', (cutoff,))
+            
+            if self.max_entries is not None:
+                self.connection.execute(
+                    '''DELETE FROM responses WHERE key NOT IN (
+                           SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)''',
+                    (self.max_entries,)
+                )
+
+    def stats(self):
+        """
+        Returns the hit and miss counters of the cache.
+        
+        Returns:
+        dict: The number of hits and misses since the cache was opened.
+        """
+        return {'hits': self.hits, 'misses': self.misses}
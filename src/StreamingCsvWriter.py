@@ -0,0 +1,111 @@
+import os
+import pandas as pd
+from .FileManager import FileManager
+from .Metrics import Metrics
+
+class StreamingCsvWriter:
+    """
+    A class to write rows to a CSV file incrementally, in chunks.
+    
+    Rows are appended to a hidden partial CSV file next to the final file, which is only
+    moved into place once the writer is closed, converted chunk by chunk if the final file is
+    not a CSV. A partial file left behind by an interrupted run is picked up again, so the run
+    can resume after the last flushed row.
+    """
+
+    def __init__(self, filepath, columns, chunk_size=50, resume=True):
+        """
+        Initializes the writer.
+        
+        Parameters:
+        filepath (str): Path of the final file, whose extension selects its format.
+        columns (list): Names of the CSV columns.
+        chunk_size (int): Number of buffered rows that triggers a flush to disk.
+        resume (bool): If False, a partial file left by an interrupted run is discarded.
+        """
+        self.filepath = filepath
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.closed = False
+        
+        directory, filename = os.path.split(filepath)
+        self.partial_path = os.path.join(directory, f'.{os.path.splitext(filename)[0]}.csv.part')
+        os.makedirs(directory or '.', exist_ok=True)
+        
+        if not resume and os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def written_values(self, column):
+        """
+        Returns the values of a column already flushed by a previous, interrupted run.
+        
+        Parameters:
+        column (str): Name of the column to read.
+        
+        Returns:
+        set: The flushed values of the column.
+        """
+        if not os.path.exists(self.partial_path):
+            return set()
+        return set(pd.read_csv(self.partial_path, usecols=[column])[column])
+
+    def write(self, row):
+        """
+        Buffers a row and flushes the buffer once it reaches the chunk size.
+        
+        Parameters:
+        row (list): The row values, in column order.
+        """
+        self.buffer.append(row)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def write_frame(self, df):
+        """
+        Appends a whole DataFrame chunk, bypassing the row buffer.
+        
+        Parameters:
+        df (pd.DataFrame): The rows to append, with the writer's columns.
+        """
+        self.flush()
+        df[self.columns].to_csv(self.partial_path, mode='a', header=False, index=False)
+
+    def flush(self):
+        """
+        Appends the buffered rows to the partial file.
+        """
+        header = not os.path.exists(self.partial_path)
+        if not self.buffer and not header:
+            return
+        
+        with Metrics.shared().timer('io.flush'):
+            chunk = pd.DataFrame(self.buffer, columns=self.columns)
+            chunk.to_csv(self.partial_path, mode='a', header=header, index=False)
+        self.buffer = []
+
+    def close(self):
+        """
+        Flushes the remaining rows and moves the partial file to its final path, converting it
+        without loading it whole if the final file is not a CSV. Closing it again does nothing.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.flush()
+        
+        if self.filepath.endswith('.csv'):
+            os.replace(self.partial_path, self.filepath)
+        else:
+            FileManager.convert_csv_file(self.partial_path, self.filepath)
+            os.remove(self.partial_path)
+
+    def discard(self):
+        """
+        Drops the buffered rows and the partial file, leaving the final file untouched, e.g.
+        after a failed run whose output must not be published. Closing it afterwards does nothing.
+        """
+        self.closed = True
+        self.buffer = []
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
@@ -0,0 +1,127 @@
+import re
+import threading
+
+# Average number of characters per token, used when the model's tokenizer is not available
+CHARS_PER_TOKEN = 4
+
+# End of a sentence, where a truncated paragraph is preferably cut
+SENTENCE_END = re.compile(r'[.!?]["\')\]]?\s')
+
+class TokenCounter:
+    """
+    A class to count the tokens of prompts with the tokenizer of a model.
+
+    OpenAI models are counted exactly with tiktoken when it is installed. Other models, and
+    OpenAI models without tiktoken, are estimated at four characters per token.
+    """
+
+    # Tokenizers loaded so far, by model name
+    _encodings = {}
+    _encodings_lock = threading.Lock()
+
+    def __init__(self, model_name):
+        """
+        Loads the tokenizer of a model.
+
+        Parameters:
+        model_name (str): Name of the model, e.g. 'gpt-4'.
+        """
+        self.model_name = model_name
+        self.encoding = self.load_encoding(model_name)
+
+    @classmethod
+    def load_encoding(cls, model_name):
+        """
+        Loads the tiktoken encoding of a model, once per process.
+
+        Parameters:
+        model_name (str): Name of the model.
+
+        Returns:
+        The tiktoken encoding, or None if tiktoken is not installed or does not know the model.
+        """
+        with cls._encodings_lock:
+            if model_name not in cls._encodings:
+                try:
+                    import tiktoken
+                    cls._encodings[model_name] = tiktoken.encoding_for_model(model_name)
+                except (ImportError, KeyError):
+                    cls._encodings[model_name] = None
+            return cls._encodings[model_name]
+
+    def exact(self):
+        """
+        Tells whether tokens are counted by the model's tokenizer rather than estimated.
+
+        Returns:
+        bool: True if the tiktoken encoding of the model is loaded.
+        """
+        return self.encoding is not None
+
+    def count(self, text):
+        """
+        Counts the tokens of a text.
+
+        Parameters:
+        text (str): The text.
+
+        Returns:
+        int: The number of tokens.
+        """
+        if self.encoding is None:
+            return len(text) // CHARS_PER_TOKEN
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def cut(self, text, budget, partial=True):
+        """
+        Cuts a text to at most a number of tokens, at the end of a sentence when possible.
+
+        Parameters:
+        text (str): The text.
+        budget (int): Maximum number of tokens kept.
+        partial (bool): If False, nothing is kept unless a whole sentence fits.
+
+        Returns:
+        str: The beginning of the text.
+        """
+        if self.encoding is None:
+            head = text[:budget * CHARS_PER_TOKEN]
+        else:
+            head = self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:budget])
+
+        # Drop the last, incomplete sentence unless partial sentences are accepted
+        ends = [match.end() for match in SENTENCE_END.finditer(head + ' ')]
+        if ends:
+            return head[:ends[-1]].rstrip()
+        return head if partial else ''
+
+    def truncate(self, text, budget):
+        """
+        Truncates a text to a token budget, keeping its lead paragraphs whole and cutting the
+        first paragraph that does not fit at the end of a sentence.
+
+        Parameters:
+        text (str): The text, with one paragraph per line.
+        budget (int): Maximum number of tokens of the truncated text.
+
+        Returns:
+        str: The text itself if it fits in the budget, or its beginning.
+        """
+        if self.count(text) <= budget:
+            return text
+
+        kept = []
+        used = 0
+        for paragraph in text.split('\n'):
+            tokens = self.count(paragraph) + 1
+            if used + tokens > budget:
+                # Fill the rest of the budget with the first sentences of the paragraph
+                if paragraph.strip() and budget - used > 0:
+                    head = self.cut(paragraph, budget - used - 1, partial=not kept)
+                    if head:
+                        kept.append(head)
+                break
+            kept.append(paragraph)
+            used += tokens
+
+        return '\n'.join(kept).rstrip()
@@ -1,20 +1,94 @@
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree
 import json
 import os
 import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from urllib.parse import urlparse, urljoin, urlencode, parse_qsl, urlunparse
+from .Metrics import Metrics
 
 # Define root and directory paths
 ROOT = 'output'
 OUTPUT_DIR = os.path.join(ROOT, 'urls')
 FAILURE_DIR = os.path.join(ROOT, 'errors')
 
+# Maximum number of article URLs kept per homepage
+MAX_LINKS = 200
+
+# Size in bytes of the homepage chunks fed to the parser
+CHUNK_SIZE = 16384
+
+# Query parameters that only track the origin of a visit
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid', 'ref', 'cmpid', 'ocid'}
+
+# Hosts of social networks and app stores, linked from every homepage
+EXCLUDED_HOSTS = ('facebook.com', 'twitter.com', 'x.com', 'instagram.com', 'youtube.com', 'linkedin.com',
+                  'whatsapp.com', 'pinterest.com', 'tiktok.com', 't.me', 'telegram.me', 'reddit.com',
+                  'apps.apple.com', 'play.google.com')
+
+# Extensions of linked files that are not articles
+EXCLUDED_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp', '.pdf', '.css', '.js', '.xml',
+                       '.rss', '.json', '.mp3', '.mp4', '.zip', '.ico')
+
+# Path segments of service pages
+SERVICE_SEGMENTS = {'login', 'signin', 'register', 'subscribe', 'subscription', 'account', 'newsletter',
+                    'newsletters', 'privacy', 'privacy-policy', 'terms', 'cookies', 'contact', 'contact-us',
+                    'about', 'about-us', 'advertise', 'search', 'tag', 'tags', 'author', 'authors', 'feed'}
+
 class UrlExtractor:
     """
     A class to extract article URLs from a newspaper website and save them to a JSON file.
     """
 
+    def __init__(self, timeout=10, retries=3, backoff_factor=0.5, pool_size=32, per_host_limit=2, http_cache=None):
+        """
+        Initializes the extractor with a shared keep-alive HTTP session.
+        
+        Parameters:
+        timeout (float): Connect/read timeout in seconds for each request.
+        retries (int): Number of retries on connection errors and 429/5xx responses.
+        backoff_factor (float): Exponential backoff factor between retries.
+        pool_size (int): Maximum number of pooled connections kept alive per host.
+        per_host_limit (int): Maximum number of concurrent requests sent to the same host.
+        http_cache (HttpCache): If given, homepages are downloaded through this cache.
+        """
+        self.timeout = timeout
+        self.http_cache = http_cache
+        self.per_host_limit = per_host_limit
+        self._host_semaphores = {}
+        self._host_lock = threading.Lock()
+        
+        # Retry transient failures with exponential backoff
+        retry = Retry(total=retries, backoff_factor=backoff_factor,
+                      status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=frozenset(['GET', 'HEAD']))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        
+        # Share one session so connections are kept alive and reused
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def host_semaphore(self, url):
+        """
+        Returns the semaphore limiting concurrent requests to the host of the given URL.
+        
+        Parameters:
+        url (str): The URL being requested.
+        
+        Returns:
+        threading.Semaphore: The semaphore shared by all requests to that host.
+        """
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_semaphores:
+                self._host_semaphores[host] = threading.Semaphore(self.per_host_limit)
+            return self._host_semaphores[host]
+
     def fetch_article_urls(self, newspaper_url):
         """
         Fetches article URLs from a given newspaper website URL.
@@ -25,28 +99,176 @@ class UrlExtractor:
         Returns:
         list: A list of unique article URLs.
         """
-        # Send a request to the newspaper URL
-        response = requests.get(newspaper_url)
-        response.raise_for_status()  # Raises an HTTPError for bad responses
+        # Send a request to the newspaper URL through the shared session
+        metrics = Metrics.shared()
+        if self.http_cache is not None:
+            return self.fetch_cached_article_urls(newspaper_url)
+        
+        with self.host_semaphore(newspaper_url):
+            with metrics.timer('http.homepage'):
+                response = self.session.get(newspaper_url, timeout=self.timeout, stream=True)
+            
+            with response:
+                # Count the retries made by the session's retry policy
+                retries = getattr(response.raw, 'retries', None)
+                if retries is not None:
+                    metrics.increment('http.homepage.retries', len(retries.history))
+                response.raise_for_status()  # Raises an HTTPError for bad responses
+                
+                # Let the parser read the <meta> charset unless the headers declare one
+                content_type = response.headers.get('Content-Type', '').lower()
+                encoding = response.encoding if 'charset' in content_type else None
+                
+                def chunks():
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        metrics.increment('http.homepage.bytes', len(chunk))
+                        yield chunk
+                
+                # Parse the homepage while it is received, and stop receiving it once enough
+                # links are found
+                with metrics.timer('parse.homepage'):
+                    article_urls = self.extract_links(chunks(), response.url, encoding=encoding)
+        
+        return article_urls
 
-        # Parse the content using BeautifulSoup
-        soup = BeautifulSoup(response.text, 'html.parser')
+    def fetch_cached_article_urls(self, newspaper_url):
+        """
+        Fetches article URLs from a newspaper website through the HTTP cache. The whole
+        homepage is downloaded so that it can be stored, unless the server answers that the
+        cached copy is still current; parsing still stops once enough links are found.
+        
+        Parameters:
+        newspaper_url (str): The URL of the newspaper website.
+        
+        Returns:
+        list: A list of unique article URLs.
+        """
+        metrics = Metrics.shared()
+        with self.host_semaphore(newspaper_url), metrics.timer('http.homepage'):
+            page = self.http_cache.fetch(self.session, newspaper_url, timeout=self.timeout)
         
-        # Find all anchor tags, assuming that articles are in <a> tags with href attributes
-        links = soup.find_all('a', href=True)
+        content = page['content']
+        with metrics.timer('parse.homepage'):
+            chunks = (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+            return self.extract_links(chunks, page['url'], encoding=page['encoding'])
+
+    @staticmethod
+    def normalize_url(href, base_url):
+        """
+        Resolves a link against the page URL and removes its fragment and tracking parameters.
         
-        # Filter and collect up to 200 unique article URLs
+        Parameters:
+        href (str): The href attribute of the link.
+        base_url (str): The URL of the page holding the link.
+        
+        Returns:
+        str: The absolute URL, or None if the link does not point to an HTTP page.
+        """
+        parts = urlparse(urljoin(base_url, href.strip()))
+        if parts.scheme not in ('http', 'https') or not parts.netloc:
+            return None
+        
+        query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+                 if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS]
+        return urlunparse(parts._replace(query=urlencode(query), fragment=''))
+
+    @staticmethod
+    def is_article_like(url):
+        """
+        Tells whether a URL looks like a link to an article rather than to a section, a
+        service page, a file or a social network.
+        
+        Parameters:
+        url (str): An absolute, normalized URL.
+        
+        Returns:
+        bool: True if the URL may point to an article.
+        """
+        parts = urlparse(url)
+        host = parts.netloc.lower().split(':')[0]
+        if any(host == excluded or host.endswith('.' + excluded) for excluded in EXCLUDED_HOSTS):
+            return False
+        
+        path = parts.path.lower()
+        if path.endswith(EXCLUDED_EXTENSIONS):
+            return False
+        
+        segments = [segment for segment in path.split('/') if segment]
+        if not segments or any(segment in SERVICE_SEGMENTS for segment in segments):
+            return False
+        
+        # A single plain word is a section page, such as '/world'
+        if len(segments) == 1:
+            return any(c.isdigit() or c in '-_.' for c in segments[0])
+        return True
+
+    @staticmethod
+    def extract_links(chunks, base_url, limit=MAX_LINKS, encoding=None):
+        """
+        Extracts the unique article-like links of a page with a streaming lxml parser, which stops
+        as soon as enough links are found.
+        
+        Parameters:
+        chunks (iterable): The page content, as chunks of bytes.
+        base_url (str): The URL of the page, against which relative links are resolved.
+        limit (int): Maximum number of links returned.
+        encoding (str): Encoding of the page, if known from the response headers.
+        
+        Returns:
+        list: The normalized article URLs, in page order.
+        """
+        parser = etree.HTMLPullParser(events=('start',), tag='a', encoding=encoding)
         article_urls = []
-        for link in links:
-            url = link['href']
-            if url.startswith('http'):  # Simple filter to get absolute URLs
-                if url not in article_urls:
-                    article_urls.append(url)
-                    if len(article_urls) == 200:
-                        break
+        seen = set()
+        
+        for chunk in chunks:
+            parser.feed(chunk)
+            for _, link in parser.read_events():
+                href = link.get('href')
+                if not href:
+                    continue
+                url = UrlExtractor.normalize_url(href, base_url)
+                if url is None or url in seen or not UrlExtractor.is_article_like(url):
+                    continue
+                seen.add(url)
+                article_urls.append(url)
+                if len(article_urls) == limit:
+                    return article_urls
         
         return article_urls
 
+    def fetch_all_article_urls(self, newspaper_urls, max_workers=16):
+        """
+        Fetches and saves article URLs from several newspaper websites concurrently.
+        Websites that cannot be processed are logged as faulty.
+        
+        Parameters:
+        newspaper_urls (list): The URLs of the newspaper websites.
+        max_workers (int): Number of homepages fetched in parallel.
+        
+        Returns:
+        dict: The fetched article URLs keyed by newspaper URL.
+        """
+        results = {}
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.fetch_article_urls, url): url for url in newspaper_urls}
+            
+            # Save results from the main thread so the JSON file is never written concurrently
+            for future in as_completed(futures):
+                url = futures[future]
+                print(url)
+                try:
+                    article_urls = future.result()
+                    self.save_urls_to_json(url, article_urls)
+                    results[url] = article_urls
+                except Exception as e:
+                    print(f"Error processing {url}: {e}")
+                    Metrics.shared().increment('http.homepage.failures')
+                    self.log_faulty_url(url)
+        
+        return results
+
     def save_urls_to_json(self, newspaper_url, article_urls):
         """
         Saves the collected article URLs to a JSON file.
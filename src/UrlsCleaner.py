@@ -1,7 +1,11 @@
 import json
 import pandas as pd
 import os
+from functools import partial
 from .FileManager import FileManager
+from .JobRunner import JobRunner
+from .Manifest import Manifest
+from .Metrics import Metrics
 
 # Define root and directory paths
 ROOT = 'output'
@@ -23,61 +27,99 @@ class UrlsCleaner:
         Returns:
         pd.DataFrame: A cleaned DataFrame with sufficient articles.
         """
-        data = [(key, value) for key, values in urls.items() for value in values]
-        df = pd.DataFrame(data, columns=['newspaper', 'articles'])
-        df_count = df.groupby('newspaper').count().sort_values(by='articles').reset_index()
+        df = pd.DataFrame({
+            'newspaper': [key for key, values in urls.items() for _ in values],
+            'articles': [value for values in urls.values() for value in values],
+        })
         
-        # Identify newspapers with fewer than 30 articles
-        to_eliminate = df_count[df_count['articles'] < 30]
-        eliminate_names = to_eliminate['newspaper'].tolist()
-        
-        # Filter out newspapers with insufficient articles
-        df_filtered = df[~df['newspaper'].isin(eliminate_names)]
+        # Filter out newspapers with fewer than 30 articles
+        newspaper_size = df.groupby('newspaper')['articles'].transform('count')
+        df_filtered = df[newspaper_size >= 30]
         return df_filtered
 
     @staticmethod
-    def top_articles(group):
+    def top_articles(df, n=20):
         """
-        Selects the top 20 longest articles from each newspaper.
+        Selects the top n longest articles from each newspaper. Fully vectorized: one stable
+        sort of the whole DataFrame instead of a sort per newspaper group.
         
         Parameters:
-        group (pd.DataFrame): DataFrame group of articles for a specific newspaper.
+        df (pd.DataFrame): DataFrame of articles with a 'length' column.
+        n (int): Number of articles kept per newspaper.
         
         Returns:
-        pd.DataFrame: DataFrame containing the top 20 longest articles.
+        pd.DataFrame: DataFrame containing the top n longest articles, grouped by newspaper.
         """
-        return group.sort_values('length', ascending=False).head(20)
+        sorted_df = df.sort_values(['newspaper', 'length'], ascending=[True, False], kind='mergesort')
+        return sorted_df.groupby('newspaper').head(n)
+
+    def select_top_articles(self, urls):
+        """
+        Cleans the URLs of one file and keeps the top 20 longest articles per newspaper.
+        
+        Parameters:
+        urls (dict): Dictionary with newspaper names as keys and lists of URLs as values.
+        
+        Returns:
+        pd.DataFrame: DataFrame with 'newspaper' and 'articles' columns.
+        """
+        df = self.clean_dataframe(urls)
+        df = df.assign(length=df['articles'].str.len())
+        
+        top_articles_per_newspaper = self.top_articles(df)
+        top_articles_per_newspaper = top_articles_per_newspaper.reset_index(drop=True)
+        return top_articles_per_newspaper.drop('length', axis=1)
 
     @staticmethod
-    def save(articles, filepath):
+    def save(articles, filepath, storage_format='csv'):
         """
-        Saves the filtered articles to a CSV file.
+        Saves the filtered articles to a file.
         
         Parameters:
         articles (pd.DataFrame): DataFrame containing filtered articles.
         filepath (str): The original file path for constructing the output filename.
+        storage_format (str): Format of the output file.
+        
+        Returns:
+        str: Path of the saved file.
         """
         filename = os.path.basename(filepath)
-        FileManager.save_file(filename, 'cleanedUrls', 'csv', OUTPUT_DIR, articles)
+        return FileManager.save_file(filename, 'cleanedUrls', storage_format, OUTPUT_DIR, articles)
+
+    def clean_file(self, file, storage_format='csv'):
+        """
+        Filters one JSON file of URLs and saves the top 20 articles per newspaper.
+        
+        Parameters:
+        file (str): Name of the JSON file in the input directory.
+        storage_format (str): Format of the output file.
+        
+        Returns:
+        tuple: Path of the output file and number of articles kept.
+        """
+        filepath = os.path.join(INPUT_DIR, file)
+        
+        with open(filepath, 'r') as f:
+            urls = json.load(f)
+        
+        with Metrics.shared().timer('clean.urls'):
+            top_articles_per_newspaper = self.select_top_articles(urls)
+        
+        output_filepath = self.save(top_articles_per_newspaper, filepath, storage_format)
+        return output_filepath, len(top_articles_per_newspaper)
 
-    def top20_articles(self):
+    def top20_articles(self, jobs=1):
         """
         Processes all JSON files in the input directory to filter and save the top 20 articles per newspaper.
+        
+        Parameters:
+        jobs (int): Number of files processed in parallel processes.
         """
-        json_files = FileManager.select_missing_files(INPUT_DIR, OUTPUT_DIR)
-        
-        for file in json_files:
-            filepath = os.path.join(INPUT_DIR, file)
-            
-            with open(filepath, 'r') as f:
-                urls = json.load(f)
-            
-            df = self.clean_dataframe(urls)
-            df['length'] = df['articles'].apply(len)
-            
-            # Apply the top_articles function to each newspaper group
-            top_articles_per_newspaper = df.groupby('newspaper').apply(self.top_articles)
-            top_articles_per_newspaper.reset_index(drop=True, inplace=True)
-            top_articles_per_newspaper.drop('length', axis=1, inplace=True)
-            
-            self.save(top_articles_per_newspaper, filepath)
+        json_files = FileManager.select_missing_files(INPUT_DIR, OUTPUT_DIR, stage='clean_urls')
+        
+        def record(file, result):
+            output_filepath, rows = result
+            Manifest.shared().record('clean_urls', os.path.join(INPUT_DIR, file), output_filepath, rows=rows)
+        
+        clean_file = partial(self.clean_file, storage_format=FileManager.storage_format)
+        JobRunner.run(clean_file, json_files, jobs, on_result=record)